@@ -1,8 +1,21 @@
 import numpy as np
 from pyrat.geometry import Interval
-from pyrat.model import tank6eq, Model
+from pyrat.model import tank6eq, genetic_model, Model
 from pyrat.util.functional import performance_counter, performance_counter_start
 
+
+def benchmark_codegen(f, var_dims, order: int, repeat: int = 1000):
+    xs = [np.random.rand(d) + 0.5 for d in var_dims]
+    for codegen in ["lambdify", "cse"]:
+        m = Model(f, var_dims, codegen=codegen)
+        time_start = performance_counter_start()
+        m.evaluate(xs, "numpy", order, 0)  # derive and compile
+        time_start = performance_counter(time_start, codegen + " compile")
+        for _ in range(repeat):
+            m.evaluate(xs, "numpy", order, 0)
+        performance_counter(time_start, codegen + " evaluate x" + str(repeat))
+
+
 if __name__ == '__main__':
     m = Model(tank6eq, [6, 1])
 
@@ -20,3 +33,8 @@ if __name__ == '__main__':
     int_derivative_3 = m.evaluate((x, u), 'interval', 0, 1)
 
     performance_counter(time_start, 'sym_derivative')
+
+    # common subexpressions eliminated evaluators against the ones of lambdify
+    benchmark_codegen(tank6eq, [6, 1], 2)
+    benchmark_codegen(tank6eq, [6, 1], 3)
+    benchmark_codegen(genetic_model, [9, 1], 3)
@@ -4,5 +4,9 @@ from .hscc2005 import HSCC2005
 from .alk2011hscc import ALK2011HSCC
 from .althoff2013hscc import ALTHOFF2013HSCC
 from .scs2022 import SCS2022
+from .specification import Specification
+from .reach_result import ReachResult
+from . import sinks, batch
 
-__all__ = ["ASB2008CDC", "HSCC2005", "ALK2011HSCC", "ALTHOFF2013HSCC", "XSE2016CAV", "SCS2022"]
+__all__ = ["ASB2008CDC", "HSCC2005", "ALK2011HSCC", "ALTHOFF2013HSCC", "XSE2016CAV", "SCS2022",
+           "Specification", "ReachResult"]
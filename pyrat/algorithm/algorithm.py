@@ -1,8 +1,13 @@
 from __future__ import annotations
 
+import time
 from abc import ABC
 
+import numpy as np
+
 from pyrat.geometry import Geometry
+from pyrat.util.functional.stats import Stats
+from .specification import Specification
 
 
 class Algorithm:
@@ -14,13 +19,74 @@ class Algorithm:
         step_idx: int = 0  # index of current step
         r0: [Geometry.Base] = []  # but for some algorithms, this maybe only one set
         u: Geometry.Base = None
+        specs: [Specification] = None  # checked against time interval sets of each step
+        spec_report: Specification.Report = None  # result of checking the specs
+        stats: Stats = None  # collects the timings and the state of each step if given
 
         def _validate_time_related(self):
             assert 0 <= self.t_start <= self.t_end
             assert 0 < self.step <= self.t_end - self.t_start
             self.steps_num = round((self.t_end - self.t_start) / self.step)
             self.step_idx = 0
+            self.spec_report = Specification.Report()
             return True
 
         def validation(self, dim: int):
             raise NotImplemented
+
+    @staticmethod
+    def sink(sinks, step_idx: int, time_interval, ti, tp):
+        """
+        pass the sets of one step through the sinks in order
+        :param sinks: callables taking (step_idx, time_interval, ti, tp) and returning
+                      the (ti, tp) to keep, or None to drop the sets of this step
+        :return: the sets kept, or (None, None) if dropped by any sink
+        """
+        for s in sinks:
+            kept = s(step_idx, time_interval, ti, tp)
+            if kept is None:
+                return None, None
+            ti, tp = kept
+        return ti, tp
+
+    @staticmethod
+    def record(stats, step_idx: int, time_interval, start: float, sets, iters=()):
+        """
+        add the record of one step to the stats
+        :param stats: stats to record to
+        :param step_idx: index of the step
+        :param time_interval: time interval of the step
+        :param start: value of time.perf_counter() when the step started
+        :param sets: time point sets at the end of the step
+        :param iters: iterations taken to bound the linearization error of each set
+        """
+        sets = sets if isinstance(sets, list) else [sets]
+        stats.step(
+            step_idx=step_idx,
+            t_start=float(time_interval[0]),
+            t_end=float(time_interval[-1]),
+            duration=time.perf_counter() - start,
+            sets=len(sets),
+            iterations=int(np.sum(iters)),
+            gens=int(sum(s.gen_num for s in sets)),
+        )
+
+    @staticmethod
+    def collect(steps, r0, t_start: float):
+        """
+        gather the sets yielded step by step by reach_iter or the like
+        :param steps: generator of (step_idx, time_interval, ti_sets, tp_sets)
+        :param r0: sets at the start time
+        :param t_start: start time
+        :return: time interval sets, time point sets, time intervals and time points
+        """
+        # init containers for storing the results
+        ti_set, ti_time, tp_set, tp_time = [], [], [r0], [t_start]
+
+        for step_idx, time_interval, next_ti, next_tp in steps:
+            ti_set.append(next_ti)
+            ti_time.append(time_interval)
+            tp_set.append(next_tp)
+            tp_time.append(time_interval[-1])
+
+        return ti_set, tp_set, np.vstack(ti_time), np.array(tp_time)
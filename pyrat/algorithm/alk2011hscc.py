@@ -8,18 +8,43 @@ conference on Hybrid systems: computation and control (pp. 93-102).
 
 from __future__ import annotations
 
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
 from dataclasses import dataclass
+from numbers import Real
 
 import numpy as np
 from scipy.linalg import expm
+from scipy.special import factorial
 
 from pyrat.dynamic_system import LinSys
 from pyrat.geometry import Geometry, Zonotope, Interval
 from pyrat.geometry.operation import cvt2
+from pyrat.util.functional.stats import timed
 from .algorithm import Algorithm
+from .specification import Specification
 
 
 class ALK2011HSCC:
+    CACHE_SIZE = 16  # max number of precomputations kept for reuse by reach
+    __cache = OrderedDict()
+    __cache_lock = threading.Lock()
+    __CACHED = (
+        "taylor_powers",
+        "taylor_err",
+        "taylor_f",
+        "taylor_input_f",
+        "taylor_v",
+        "taylor_rv",
+        "taylor_r_trans",
+        "taylor_input_corr",
+        "taylor_ea_int",
+        "taylor_ea_t",
+        "is_rv",
+    )
+
     @dataclass
     class Options(Algorithm.Options):
         u_trans: np.ndarray = None
@@ -39,7 +64,9 @@ class ALK2011HSCC:
         origin_contained = None
 
         def validation(self, dim: int):
-            # TODO
+            assert self._validate_time_related()
+            i = np.arange(1, self.taylor_terms + 2)
+            self.factors = np.power(self.step, i) / factorial(i)
             return True
 
     @staticmethod
@@ -47,7 +74,8 @@ class ALK2011HSCC:
         xa_abs = abs(sys.xa)
         xa_power = [sys.xa]
         xa_power_abs = [xa_abs]
-        m = np.eye(sys.dim, dtype=float)
+        # leading axes of the state matrix, if any, index a batch of systems
+        m = np.eye(sys.dim, dtype=float) + np.zeros_like(xa_abs, dtype=float)
 
         for i in range(opt.taylor_terms):
             xa_power.append(xa_power[i] @ sys.xa)
@@ -63,16 +91,16 @@ class ALK2011HSCC:
     @classmethod
     def compute_time_interval_err(cls, sys: LinSys, opt: Options):
         # initialize asum
-        asum_pos = np.zeros((sys.dim, sys.dim), dtype=float)
-        asum_neg = np.zeros((sys.dim, sys.dim), dtype=float)
+        asum_pos = np.zeros_like(sys.xa, dtype=float)
+        asum_neg = np.zeros_like(sys.xa, dtype=float)
 
         for i in range(1, opt.taylor_terms):
             # compute factor
             exp1, exp2 = -(i + 1) / i, -1 / i
             factor = ((i + 1) ** exp1 - (i + 1) ** exp2) * opt.factors[i]
             # init apos, aneg
-            apos = np.zeros((sys.dim, sys.dim), dtype=float)
-            aneg = np.zeros((sys.dim, sys.dim), dtype=float)
+            apos = np.zeros_like(sys.xa, dtype=float)
+            aneg = np.zeros_like(sys.xa, dtype=float)
             # obtain positive and negative parts
             pos_ind = opt.taylor_powers[i] > 0
             neg_ind = opt.taylor_powers[i] < 0
@@ -89,16 +117,16 @@ class ALK2011HSCC:
     @classmethod
     def input_time_interval_err(cls, sys: LinSys, opt: Options):
         # initialize asum
-        asum_pos = np.zeros((sys.dim, sys.dim), dtype=float)
-        asum_neg = np.zeros((sys.dim, sys.dim), dtype=float)
+        asum_pos = np.zeros_like(sys.xa, dtype=float)
+        asum_neg = np.zeros_like(sys.xa, dtype=float)
 
         for i in range(1, opt.taylor_terms + 1):
             # compute factor
             exp1, exp2 = -(i + 1) / i, -1 / i
             factor = ((i + 1) ** exp1 - (i + 1) ** exp2) * opt.factors[i]
             # init apos, aneg
-            apos = np.zeros((sys.dim, sys.dim), dtype=float)
-            aneg = np.zeros((sys.dim, sys.dim), dtype=float)
+            apos = np.zeros_like(sys.xa, dtype=float)
+            aneg = np.zeros_like(sys.xa, dtype=float)
             # obtain positive and negative parts
             pos_ind = opt.taylor_powers[i - 1] > 0
             neg_ind = opt.taylor_powers[i - 1] < 0
@@ -120,7 +148,7 @@ class ALK2011HSCC:
         v = opt.u if sys.ub is None else sys.ub @ opt.u
         # compute vTrans
         opt.is_rv = True
-        if np.all(v.c == 0) and v.z.shape[1] == 1:
+        if np.all(v.c == 0) and v.gen_num == 0:
             opt.is_rv = False
         v_trans = opt.u_trans if sys.ub is None else sys.ub @ opt.u
 
@@ -132,7 +160,7 @@ class ALK2011HSCC:
             # compute higher order terms
             for i in range(opt.taylor_terms):
                 v_sum += opt.taylor_powers[i] @ (opt.factors[i + 1] * v)
-                a_sum += opt.taylor_powers[i] * opt.factors[i + 1]
+                a_sum = a_sum + opt.taylor_powers[i] * opt.factors[i + 1]
 
             # compute overall solution
             input_solv = v_sum + opt.taylor_err * opt.step * v
@@ -142,7 +170,7 @@ class ALK2011HSCC:
             # compute higher order terms
             for i in range(opt.taylor_terms):
                 # compute sum
-                a_sum += opt.taylor_powers[i] * opt.factors[i + 1]
+                a_sum = a_sum + opt.taylor_powers[i] * opt.factors[i + 1]
 
         # compute solution due to constant input
         ea_int = a_sum + opt.taylor_err * opt.step
@@ -198,12 +226,75 @@ class ALK2011HSCC:
         # final result
         return rhom + rv
 
+    @staticmethod
+    def _cache_key(sys: LinSys, opt: Options):
+        def _key(x):
+            if x is None or isinstance(x, Real):
+                return x
+            if isinstance(x, np.ndarray):
+                return x.shape, x.dtype.str, x.tobytes()
+            # input sets are keyed on their center and generators
+            return type(x).__name__, _key(x.c), _key(x.gen)
+
+        return (
+            _key(sys.xa),
+            _key(sys.ub),
+            opt.step,
+            opt.taylor_terms,
+            opt.origin_contained,
+            _key(opt.u),
+            _key(opt.u_trans),
+        )
+
     @classmethod
-    def reach_one_step(cls, sys: LinSys, r: Zonotope, opt: Options):
+    @timed("pre_compute")
+    def pre_compute(cls, sys: LinSys, opt: Options):
+        """
+        compute the state independent terms of one step
+        :param sys: linear system
+        :param opt: options, the computed terms are written to it
+        """
         cls.exponential(sys, opt)
         cls.compute_time_interval_err(sys, opt)
         cls.input_solution(sys, opt)
         opt.taylor_ea_t = expm(sys.xa * opt.step)
+
+    @classmethod
+    def pre_compute_reused(cls, sys: LinSys, opt: Options):
+        """
+        same as pre_compute, but reuse the terms computed by an earlier run if the
+        system, step size, taylor terms and input set are all the same, only for
+        the time invariant systems of reach, the linearized systems of the nonlinear
+        algorithms change every step and a batch of systems is too large to keep
+        :param sys: linear system
+        :param opt: options, the computed terms are written to it
+        """
+        if np.ndim(sys.xa) > 2 or cls.CACHE_SIZE <= 0:
+            return cls.pre_compute(sys, opt)
+        key = cls._cache_key(sys, opt)
+        with cls.__cache_lock:
+            terms = cls.__cache.get(key)
+            if terms is not None:
+                cls.__cache.move_to_end(key)
+        if terms is None:
+            cls.pre_compute(sys, opt)
+            terms = {name: getattr(opt, name) for name in cls.__CACHED}
+            with cls.__cache_lock:
+                cls.__cache[key] = terms
+                while len(cls.__cache) > cls.CACHE_SIZE:
+                    cls.__cache.popitem(last=False)
+        else:
+            for name, value in terms.items():
+                setattr(opt, name, value)
+
+    @classmethod
+    def clear_cache(cls):
+        with cls.__cache_lock:
+            cls.__cache.clear()
+
+    @classmethod
+    @timed("propagate")
+    def propagate(cls, sys: LinSys, r: Zonotope, opt: Options):
         r_hom_tp = opt.taylor_ea_t @ r + opt.taylor_r_trans
         r_hom = (
                 r.enclose(r_hom_tp)
@@ -217,18 +308,44 @@ class ALK2011HSCC:
         return r_hom + rv, r_hom_tp + rv
 
     @classmethod
-    def reach(cls, sys: LinSys, opt: Options):
+    def reach_one_step(cls, sys: LinSys, r: Zonotope, opt: Options):
+        cls.pre_compute(sys, opt)
+        return cls.propagate(sys, r, opt)
+
+    @classmethod
+    def reach_iter(cls, sys: LinSys, opt: Options, sinks=()):
+        """
+        compute the reachable sets step by step, only the sets of the latest step are
+        held, so memory use does not grow with the number of steps
+        :param sys: linear system
+        :param opt: options
+        :param sinks: callables to write, reduce or drop the sets of each step
+        :return: generator of (step_idx, time_interval, ti_set, tp_set)
+        """
         assert opt.validation(sys.dim)
-        # init containers for storing the results
         time_pts = np.linspace(opt.t_start, opt.t_end, opt.steps_num)
-        ti_set, ti_time, tp_set, tp_time = [], [], [opt.r0], [time_pts[0]]
+        # system is time invariant, so terms of one step hold for all steps
+        with opt.stats or nullcontext():
+            cls.pre_compute_reused(sys, opt)
+        r = opt.r0
 
         while opt.step_idx < opt.steps_num - 1:
-            next_ti, next_tp = cls.reach_one_step(sys, tp_set[-1], opt)
+            start = time.perf_counter()
+            with opt.stats or nullcontext():
+                next_ti, r = cls.propagate(sys, r, opt)
             opt.step_idx += 1
-            ti_set.append(next_ti)
-            ti_time.append(time_pts[opt.step_idx - 1: opt.step_idx + 1])
-            tp_set.append(next_tp)
-            tp_time.append(time_pts[opt.step_idx])
+            time_interval = time_pts[opt.step_idx - 1: opt.step_idx + 1]
+            if opt.stats is not None:
+                Algorithm.record(opt.stats, opt.step_idx, time_interval, start, r)
+            stop = opt.specs is not None and Specification.monitor(
+                opt.specs, opt.step_idx, next_ti, opt.spec_report
+            )
+            ti, tp = Algorithm.sink(sinks, opt.step_idx, time_interval, next_ti, r)
+            yield opt.step_idx, time_interval, ti, tp
+            if stop:
+                return
 
-        return ti_set, tp_set, np.vstack(ti_time), np.array(tp_time)
+    @classmethod
+    def reach(cls, sys: LinSys, opt: Options, sinks=()):
+        steps = cls.reach_iter(sys, opt, sinks)
+        return Algorithm.collect(steps, opt.r0, opt.t_start)
@@ -8,43 +8,35 @@ Althoff, M. (2013, April). Reachability analysis of nonlinear systems using cons
 
 from __future__ import annotations
 
+import copy
+
 import numpy as np
-from scipy.special import factorial
 from pyrat.dynamic_system import NonLinSys
 from pyrat.geometry import Geometry, Zonotope, Interval
 from pyrat.geometry.operation import cvt2
+from pyrat.util.functional.stats import Stats, timed
 from .algorithm import Algorithm
 from .alk2011hscc import ALK2011HSCC
 from .asb2008cdc import ASB2008CDC
 
 
 class ALTHOFF2013HSCC:
-    class Options(Algorithm.Options):
-        taylor_terms: int = 4
+    class Options(ASB2008CDC.StepOptions):
         tensor_order: int = 3
-        u_trans: np.ndarray = None
-        max_err: np.ndarray = None
-        lin_err_x = None
-        lin_err_u = None
-        lin_err_f0 = None
 
         def _validate_misc(self, dim: int):
-            assert self.tensor_order == 2 or self.tensor_order == 3
-            self.max_err = (
-                np.full(dim, np.inf) if self.max_err is None else self.max_err
-            )
-            i = np.arange(1, self.taylor_terms + 2)
-            self.factors = np.power(self.step, i) / factorial(i)
             assert 3 <= self.tensor_order <= 7
             return True
 
         def validation(self, dim: int):
             assert self._validate_time_related()
             # assert self._validate_inputs()
+            assert self._validate_steps(dim)
             assert self._validate_misc(dim)
             return True
 
     @classmethod
+    @timed("pre_stat_err")
     def pre_stat_err(cls, sys: NonLinSys, r_delta: Zonotope, opt: Options):
         r_red = cvt2(r_delta, Geometry.TYPE.ZONOTOPE).reduce(
             Zonotope.REDUCE_METHOD, Zonotope.ERROR_ORDER
@@ -73,6 +65,7 @@ class ALTHOFF2013HSCC:
         return [hx, hu], z_delta, err_stat, t, ind3, zd3
 
     @classmethod
+    @timed("abstract_err")
     def abstract_err(cls, sys, opt, r_all, r_diff, h, zd, verr_stat, t, ind3, zd3):
         # compute interval of reachable set
         dx = cvt2(r_all, Geometry.TYPE.INTERVAL)
@@ -123,10 +116,11 @@ class ALTHOFF2013HSCC:
         r_ti, r_tp = ALK2011HSCC.reach_one_step(lin_sys, r_delta, lin_opt)
         r_diff = ALK2011HSCC.delta_reach(lin_sys, r_delta, lin_opt)
         h, zd, err_stat, t, ind3, zd3 = cls.pre_stat_err(sys, r_delta, opt)
-        perf_ind_cur, perf_ind = np.inf, 0
+        perf_ind_cur, perf_ind, iters = np.inf, 0, 0
         applied_err, abstract_err, v_err_dyn, v_err_stat = None, err, None, None
 
         while perf_ind_cur > 1 and perf_ind <= 1:
+            iters += 1
             applied_err = 1.1 * abstract_err
             v_err = Zonotope(0 * applied_err, np.diag(applied_err))
             r_all_err = ALK2011HSCC.error_solution(v_err, lin_opt)
@@ -159,42 +153,61 @@ class ALTHOFF2013HSCC:
         # linearization error
         dim_for_split = []
         if perf_ind > 1:
-            raise NotImplementedError  # TODO
+            dim_for_split = [cls.select_split_dim(sys, r, opt)]
         # store the linearization error
+        stats = Stats.active()
+        if stats is not None:
+            stats.add("gens_before_reduce", r_ti.gen_num + r_tp.gen_num)
         r_ti = r_ti.reduce(Zonotope.REDUCE_METHOD, Zonotope.ORDER)
         r_tp = r_tp.reduce(Zonotope.REDUCE_METHOD, Zonotope.ORDER)
-        return r_ti, r_tp, abstract_err, dim_for_split
+        if stats is not None:
+            stats.add("gens_after_reduce", r_ti.gen_num + r_tp.gen_num)
+        return r_ti, r_tp, abstract_err, dim_for_split, iters
 
     @classmethod
-    def reach_one_step(cls, sys: NonLinSys, r0, err, opt: Options):
-        r_ti, r_tp = [], []
-        for i in range(len(r0)):
-            temp_r_ti, temp_r_tp, abst_err, dims = cls.poly_reach(
-                sys, r0[i], err[i], opt
-            )
-            # check if initial set has to be split
-            if len(dims) <= 0:
-                r_ti.append(temp_r_ti)
-                r_tp.append(temp_r_tp)
-            else:
-                raise NotImplementedError  # TODO
+    def select_split_dim(cls, sys: NonLinSys, r: Zonotope, opt: Options):
+        """
+        select the dimension whose split reduces the linearization error the most
+        :param sys: nonlinear system
+        :param r: set to split
+        :param opt: options
+        :return: index of the dimension to split along
+        """
+        # linearization overwrites the linearization point stored in the options
+        opt = copy.copy(opt)
+        perf_ind = np.full(r.shape, np.inf)
+        for dim in range(r.shape):
+            if np.all(r.gen[dim] == 0):
+                continue
+            halves_perf_ind = []
+            for half in r.split(dim):
+                lin_sys, lin_opt = ASB2008CDC.linearize(sys, half, opt)
+                r_delta = half - opt.lin_err_x
+                ALK2011HSCC.reach_one_step(lin_sys, r_delta, lin_opt)
+                r_diff = ALK2011HSCC.delta_reach(lin_sys, r_delta, lin_opt)
+                h, zd, err_stat, t, ind3, zd3 = cls.pre_stat_err(sys, r_delta, opt)
+                r_max = r_delta + cvt2(r_diff, Geometry.TYPE.ZONOTOPE)
+                true_err, _, _ = cls.abstract_err(
+                    sys, opt, r_max, r_diff, h, zd, err_stat, t, ind3, zd3
+                )
+                halves_perf_ind.append(np.max(true_err / opt.max_err))
+            perf_ind[dim] = max(halves_perf_ind)
+        return int(np.argmin(perf_ind))
 
-        return r_ti, r_tp
+    @classmethod
+    @timed("reach_one_step")
+    def reach_one_step(cls, sys: NonLinSys, r0, err, opt: Options, executor=None):
+        return ASB2008CDC.drain(sys, cls.poly_reach, r0, err, opt, executor)
 
     @classmethod
-    def reach(cls, sys: NonLinSys, opt: Options):
+    def reach_iter(cls, sys: NonLinSys, opt: Options, sinks=()):
         assert opt.validation(sys.dim)
-        # init containers for storing the results
-        time_pts = np.linspace(opt.t_start, opt.t_end, opt.steps_num)
-        ti_set, ti_time, tp_set, tp_time = [], [], [opt.r0], [time_pts[0]]
-        err = [[np.zeros(r.shape) for r in opt.r0]]
-
-        while opt.step_idx < opt.steps_num - 1:
-            next_ti, next_tp = cls.reach_one_step(sys, tp_set[-1], err[-1], opt)
-            opt.step_idx += 1
-            ti_set.append(next_ti)
-            ti_time.append(time_pts[opt.step_idx - 1 : opt.step_idx + 1])
-            tp_set.append(next_tp)
-            tp_time.append(time_pts[opt.step_idx])
-
-        return ti_set, tp_set, np.vstack(ti_time), np.array(tp_time)
+        err = [np.zeros(r.shape) for r in opt.r0]
+        yield from ASB2008CDC.step_loop(
+            sys, cls.reach_one_step, opt.r0, err, opt, sinks
+        )
+
+    @classmethod
+    def reach(cls, sys: NonLinSys, opt: Options, sinks=()):
+        steps = cls.reach_iter(sys, opt, sinks)
+        return Algorithm.collect(steps, opt.r0, opt.t_start)
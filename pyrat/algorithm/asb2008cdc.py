@@ -8,45 +8,117 @@ nonlinear systems with uncertain parameters using conservative linearization. In
 
 from __future__ import annotations
 
+import copy
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import nullcontext
 from dataclasses import dataclass
 
 import numpy as np
 from scipy.special import factorial
 
 from pyrat.dynamic_system import LinSys, NonLinSys
-from pyrat.geometry import Geometry, Zonotope, Interval
+from pyrat.geometry import Geometry, Zonotope, Interval, ZonoTensor
 from pyrat.geometry.operation import cvt2
+from pyrat.util.functional.sparse_tensor import SparseTensor
+from pyrat.util.functional.stats import Stats, timed
 from .algorithm import Algorithm
 from .alk2011hscc import ALK2011HSCC
+from .checkpoint import Checkpoint
+from .distributed import Coordinator
+from .specification import Specification
+
+_worker_sys = None  # system owned by current worker process of the pool
+
+
+def _init_worker(sys: NonLinSys):
+    # unpickled once per worker, so derivatives are only compiled once per worker
+    global _worker_sys
+    _worker_sys = sys
+
+
+def _reach_worker(reach, rs, errs, opt):
+    return [reach(_worker_sys, r, err, opt) for r, err in zip(rs, errs)]
 
 
 class ASB2008CDC:
     @dataclass
-    class Options(Algorithm.Options):
+    class StepOptions(Algorithm.Options):
+        # options of the loop over the steps shared by the conservative linearization
+        # and the conservative polynomialization
         taylor_terms: int = 4  # for linearization
-        tensor_order: int = 2  # for error approximation
         u_trans: np.ndarray = None
         factors: np.ndarray = None
         max_err: np.ndarray = None
         lin_err_x = None
         lin_err_u = None
         lin_err_f0 = None
+        workers: int = 1  # number of processes for propagating sets in parallel
+        chunk_size: int = 0  # sets per task sent to a worker, 0 for even split
+        address: tuple = None  # (host, port) to serve tasks to TCP workers at if given
+        authkey: bytes = None  # key the TCP workers have to know, random if None
+        max_split_depth: int = 8  # max times a set can be split within one step
+        adaptive: bool = False  # adapt the step size to the linearization error
+        step_min: float = None  # lower bound of the step size, default step / 8
+        step_max: float = None  # upper bound of the step size, default step * 8
+        step_grow: float = 1.5  # factor to enlarge the step size by
+        step_shrink: float = 0.5  # factor to reduce the step size by
+        err_low: float = 0.2  # grow if the error is below this ratio of max_err
+        err_high: float = 0.8  # shrink if the error is above this ratio of max_err
+        time: float = None  # start time of the next step if adaptive
+        warm_start: bool = True  # start bounding the error from the one of last step
+        iter_hist: Counter = None  # number of sets bounded in each number of iterations
 
-        def _validate_misc(self, dim: int):
-            assert self.tensor_order == 2 or self.tensor_order == 3
+        def _validate_steps(self, dim: int):
+            assert self.workers >= 1 and self.chunk_size >= 0
+            assert self.max_split_depth >= 0
             self.max_err = (
                 np.full(dim, np.inf) if self.max_err is None else self.max_err
             )
+            self.set_step(self.step)
+            self.iter_hist = Counter()
+            if self.adaptive:
+                self.step_min = self.step / 8 if self.step_min is None else self.step_min
+                self.step_max = self.step * 8 if self.step_max is None else self.step_max
+                assert 0 < self.step_min <= self.step <= self.step_max
+                assert self.step_grow >= 1 >= self.step_shrink > 0
+                # the step size follows the error relative to max_err, never grows
+                # blindly when the error is unbounded
+                assert np.all(np.isfinite(self.max_err))
+                self.time = self.t_start
+            return True
+
+        def set_step(self, step: float):
+            self.step = step
             i = np.arange(1, self.taylor_terms + 2)
             self.factors = np.power(self.step, i) / factorial(i)
+
+    @dataclass
+    class Options(StepOptions):
+        tensor_order: int = 2  # for error approximation
+        sparse: bool = False  # touch only the nonzero derivatives for tensor order 3
+        batch: bool = False  # propagate all sets in lock-step as one batch
+        prune: bool = False  # drop time point sets contained in other ones each step
+        prune_order: int = 2  # order of a set reduced to when checking containment
+        checkpoint_dir: str = None  # directory to write snapshots to, None to disable
+        checkpoint_interval: int = 100  # number of steps between two snapshots
+        checkpoint_keep: int = 2  # number of latest snapshots retained
+
+        def _validate_misc(self, dim: int):
+            assert self.tensor_order == 2 or self.tensor_order == 3
+            assert self.prune_order >= 1
+            assert self.checkpoint_interval >= 1 and self.checkpoint_keep >= 1
             return True
 
         def validation(self, dim: int):
             assert self._validate_time_related()
+            assert self._validate_steps(dim)
             assert self._validate_misc(dim)
             return True
 
     @staticmethod
+    @timed("linearize")
     def linearize(sys: NonLinSys, r: Geometry.Base, opt: Options):
         opt.lin_err_u = opt.u_trans if opt.u_trans is not None else opt.u.c
         f0 = sys.evaluate((r.c, opt.lin_err_u), "numpy", 0, 0)
@@ -68,7 +140,41 @@ class ASB2008CDC:
         return lin_sys, lin_opt
 
     @staticmethod
-    def abstract_err(sys: NonLinSys, r: Geometry.Base, opt: Options):
+    def cubic_err(ih: Interval, t):
+        """
+        :param ih: interval hulls of the sets, (..., n)
+        :param t: third order tensors of shape (..., o, n, n, n), or a SparseTensor
+        :return: sum of t[i, j, k, l] * ih[j] * ih[k] * ih[l] over j, k, l of each i
+        """
+
+        def _group_sum(x: Interval, keys: np.ndarray):
+            # sum up the entries of same keys
+            keys, inv = np.unique(keys, axis=0, return_inverse=True)
+            inf = np.zeros(x.shape[:-1] + (keys.shape[0],), dtype=float)
+            sup = np.zeros(x.shape[:-1] + (keys.shape[0],), dtype=float)
+            np.add.at(inf, (..., inv.reshape(-1)), x.inf)
+            np.add.at(sup, (..., inv.reshape(-1)), x.sup)
+            return Interval(inf, sup), keys
+
+        if not isinstance(t, SparseTensor):
+            # same evaluation order as (ih @ t @ ih) * ih for every set of the batch
+            m = (ih[..., None, None, :, None] * t).sum(axis=-2)
+            m = (m * ih[..., None, None, :]).sum(axis=-1)
+            return (m * ih[..., None, :]).sum(axis=-1)
+        # same evaluation order over the nonzero entries only
+        idx = t.idx
+        m, keys = _group_sum(ih[..., idx[:, 2]] * t.val, idx[:, [0, 1, 3]])
+        m, keys = _group_sum(m * ih[..., keys[:, 2]], keys[:, :2])
+        m, keys = _group_sum(m * ih[..., keys[:, 1]], keys[:, :1])
+        batch = np.broadcast_shapes(ih.shape[:-1], t.batch_shape)
+        inf = np.zeros(batch + t.shape[:1], dtype=float)
+        sup = np.zeros(batch + t.shape[:1], dtype=float)
+        inf[..., keys[:, 0]], sup[..., keys[:, 0]] = m.inf, m.sup
+        return Interval(inf, sup)
+
+    @classmethod
+    @timed("abstract_err")
+    def abstract_err(cls, sys: NonLinSys, r: Geometry.Base, opt: Options):
         ihx = cvt2(r, Geometry.TYPE.INTERVAL)
         total_int_x = ihx + opt.lin_err_x
 
@@ -93,16 +199,20 @@ class ASB2008CDC:
             r_red = r.reduce(Zonotope.REDUCE_METHOD, Zonotope.ERROR_ORDER)
             z = r_red.card_prod(opt.u)
             # evaluate hessian
-            hx = sys.evaluate((opt.lin_err_x, opt.lin_err_u), "numpy", 2, 0)
-            hu = sys.evaluate((opt.lin_err_x, opt.lin_err_u), "numpy", 2, 1)
+            xu, total_int = (opt.lin_err_x, opt.lin_err_u), (total_int_x, total_int_u)
+            hx = sys.evaluate(xu, "numpy", 2, 0, opt.sparse)
+            hu = sys.evaluate(xu, "numpy", 2, 1, opt.sparse)
             # evaluate third order
-            tx = sys.evaluate((total_int_x, total_int_u), "interval", 3, 0)
-            tu = sys.evaluate((total_int_x, total_int_u), "interval", 3, 1)
+            tx = sys.evaluate(total_int, "interval", 3, 0, opt.sparse)
+            tu = sys.evaluate(total_int, "interval", 3, 1, opt.sparse)
 
             # second order error
             err_sec = 0.5 * z.quad_map([hx, hu])
-            xx = Interval.sum((ihx @ tx @ ihx) * ihx, axis=1)
-            uu = Interval.sum((ihu @ tu @ ihu) * ihu, axis=1)
+            if opt.sparse:
+                xx, uu = cls.cubic_err(ihx, tx), cls.cubic_err(ihu, tu)
+            else:
+                xx = Interval.sum((ihx @ tx @ ihx) * ihx, axis=1)
+                uu = Interval.sum((ihu @ tu @ ihu) * ihu, axis=1)
             err_lagr = (xx + uu) / 6
             err_lagr = cvt2(err_lagr, Geometry.TYPE.ZONOTOPE)
 
@@ -122,10 +232,11 @@ class ASB2008CDC:
         r_delta = r - opt.lin_err_x
         r_ti, r_tp = ALK2011HSCC.reach_one_step(lin_sys, r_delta, lin_opt)
 
-        perf_ind_cur, perf_ind = np.inf, 0
+        perf_ind_cur, perf_ind, iters = np.inf, 0, 0
         applied_err, abstract_err, v_err_dyn = None, err, None
 
         while perf_ind_cur > 1 and perf_ind <= 1:
+            iters += 1
             applied_err = 1.1 * abstract_err
             v_err = Zonotope(0 * applied_err, np.diag(applied_err))
             r_all_err = ALK2011HSCC.error_solution(v_err, lin_opt)
@@ -156,42 +267,471 @@ class ASB2008CDC:
         # linearization error
         dim_for_split = []
         if perf_ind > 1:
-            raise NotImplementedError  # TODO
+            dim_for_split = [cls.select_split_dim(sys, r, opt)]
         # store the linearization error
+        stats = Stats.active()
+        if stats is not None:
+            stats.add("gens_before_reduce", r_ti.gen_num + r_tp.gen_num)
         r_ti = r_ti.reduce(Zonotope.REDUCE_METHOD, Zonotope.ORDER)
         r_tp = r_tp.reduce(Zonotope.REDUCE_METHOD, Zonotope.ORDER)
-        return r_ti, r_tp, abstract_err, dim_for_split
+        if stats is not None:
+            stats.add("gens_after_reduce", r_ti.gen_num + r_tp.gen_num)
+        return r_ti, r_tp, abstract_err, dim_for_split, iters
 
     @classmethod
-    def reach_one_step(cls, sys: NonLinSys, r0, err, opt: Options):
-        r_ti, r_tp = [], []
-        for i in range(len(r0)):
-            temp_r_ti, temp_r_tp, abst_err, dims = cls.linear_reach(
-                sys, r0[i], err[i], opt
+    def select_split_dim(cls, sys: NonLinSys, r: Zonotope, opt):
+        """
+        select the dimension whose split reduces the linearization error the most
+        :param sys: nonlinear system
+        :param r: set to split
+        :param opt: options
+        :return: index of the dimension to split along
+        """
+        # linearization overwrites the linearization point stored in the options
+        opt = copy.copy(opt)
+        perf_ind = np.full(r.shape, np.inf)
+        for dim in range(r.shape):
+            if np.all(r.gen[dim] == 0):
+                continue
+            halves_perf_ind = []
+            for half in r.split(dim):
+                lin_sys, lin_opt = cls.linearize(sys, half, opt)
+                r_ti, _ = ALK2011HSCC.reach_one_step(
+                    lin_sys, half - opt.lin_err_x, lin_opt
+                )
+                true_err, _ = cls.abstract_err(sys, r_ti, opt)
+                halves_perf_ind.append(np.max(true_err / opt.max_err))
+            perf_ind[dim] = max(halves_perf_ind)
+        return int(np.argmin(perf_ind))
+
+    @classmethod
+    @timed("linearize")
+    def linearize_batch(cls, sys: NonLinSys, r: ZonoTensor, opt: Options):
+        opt.lin_err_u = opt.u_trans if opt.u_trans is not None else opt.u.c
+        f0 = sys.evaluate((r.c, opt.lin_err_u), "numpy", 0, 0)
+        opt.lin_err_x = r.c + f0 * 0.5 * opt.step
+        xu = (opt.lin_err_x, opt.lin_err_u)
+        opt.lin_err_f0 = sys.evaluate(xu, "numpy", 0, 0)
+        a = sys.evaluate(xu, "numpy", 1, 0)
+        b = sys.evaluate(xu, "numpy", 1, 1)
+        assert not (np.any(np.isnan(a))) or np.any(np.isnan(b))
+        lin_sys = LinSys(xa=a)
+        lin_opt = ALK2011HSCC.Options()
+        lin_opt.step = opt.step
+        lin_opt.taylor_terms = opt.taylor_terms
+        lin_opt.factors = opt.factors
+        u = ZonoTensor(opt.u.c, opt.u.gen)
+        lin_opt.u = b @ (u + opt.u_trans - opt.lin_err_u)
+        lin_opt.u -= lin_opt.u.c
+        lin_opt.u_trans = ZonoTensor(
+            opt.lin_err_f0 + lin_opt.u.c, np.zeros(opt.lin_err_f0.shape + (1,))
+        )
+        return lin_sys, lin_opt
+
+    @classmethod
+    @timed("abstract_err")
+    def abstract_err_batch(cls, sys: NonLinSys, r: ZonoTensor, opt: Options):
+        ihx = cvt2(r, Geometry.TYPE.INTERVAL)
+        total_int_x = ihx + opt.lin_err_x
+
+        ihu = cvt2(opt.u, Geometry.TYPE.INTERVAL)
+        total_int_u = ihu + opt.lin_err_u
+        total_int = (total_int_x, total_int_u)
+
+        if opt.tensor_order == 2:
+            dx = np.maximum(abs(ihx.inf), abs(ihx.sup))
+            du = np.maximum(abs(ihu.inf), abs(ihu.sup))
+
+            # evaluate the hessian matrix with the selected range-bounding technique
+            hx = sys.evaluate(total_int, "interval", 2, 0)
+            hu = sys.evaluate(total_int, "interval", 2, 1)
+            xx = np.maximum(abs(hx.inf), abs(hx.sup))
+            uu = np.maximum(abs(hu.inf), abs(hu.sup))
+
+            err_lagrange = 0.5 * (
+                np.einsum("nj,nijk,nk->ni", dx, xx, dx)
+                + np.einsum("j,nijk,k->ni", du, uu, du)
             )
-            # check if initial set has to be split
-            if len(dims) <= 0:
-                r_ti.append(temp_r_ti)
-                r_tp.append(temp_r_tp)
-            else:
-                raise NotImplementedError  # TODO
 
-        return r_ti, r_tp
+            verr_dyn = ZonoTensor(
+                np.zeros_like(err_lagrange), err_lagrange[..., None] * np.eye(sys.dim)
+            )
+            return err_lagrange, verr_dyn
+        elif opt.tensor_order == 3:
+            r_red = r.reduce(Zonotope.REDUCE_METHOD, Zonotope.ERROR_ORDER)
+            z = r_red.card_prod(opt.u)
+            # evaluate hessian
+            xu = (opt.lin_err_x, opt.lin_err_u)
+            hx = sys.evaluate(xu, "numpy", 2, 0, opt.sparse)
+            hu = sys.evaluate(xu, "numpy", 2, 1, opt.sparse)
+            # evaluate third order
+            tx = sys.evaluate(total_int, "interval", 3, 0, opt.sparse)
+            tu = sys.evaluate(total_int, "interval", 3, 1, opt.sparse)
+
+            # second order error
+            err_sec = 0.5 * z.quad_map([hx, hu])
+            err_lagr = (cls.cubic_err(ihx, tx) + cls.cubic_err(ihu, tu)) / 6
+            err_lagr = cvt2(err_lagr, Geometry.TYPE.ZONOTOPE)
+
+            # overall linearization error
+            verr_dyn = err_sec + err_lagr
+            verr_dyn = verr_dyn.reduce(
+                Zonotope.REDUCE_METHOD, Zonotope.INTERMEDIATE_ORDER
+            )
+            true_err = abs(cvt2(verr_dyn, Geometry.TYPE.INTERVAL)).sup
+            return true_err, verr_dyn
+        else:
+            raise Exception("unsupported tensor order")
+
+    @classmethod
+    def linear_reach_batch(cls, sys: NonLinSys, r: ZonoTensor, err, opt: Options):
+        lin_sys, lin_opt = cls.linearize_batch(sys, r, opt)
+        r_delta = r - opt.lin_err_x
+        r_ti, r_tp = ALK2011HSCC.reach_one_step(lin_sys, r_delta, lin_opt)
+
+        num = r.shape[0]
+        perf_ind_cur, perf_ind = np.full(num, np.inf), np.zeros(num)
+        abstract_err, v_err_dyn = err.copy(), None
+        active = np.ones(num, dtype=bool)  # sets whose error has not converged yet
+        iters = np.zeros(num, dtype=int)
+
+        while np.any(active):
+            iters += active
+            applied_err = 1.1 * abstract_err
+            v_err = ZonoTensor(0 * applied_err, applied_err[..., None] * np.eye(sys.dim))
+            r_all_err = ALK2011HSCC.error_solution(v_err, lin_opt)
+            r_max = r_ti + r_all_err
+            true_err, cur_v_err_dyn = cls.abstract_err_batch(sys, r_max, opt)
+
+            # compare linearization error with the maximum allowed error
+            temp = true_err / applied_err
+            temp[np.isnan(temp)] = -np.inf
+            perf_ind_cur[active] = np.max(temp, axis=-1)[active]
+            perf_ind[active] = np.max(true_err / opt.max_err, axis=-1)[active]
+            abstract_err[active] = true_err[active]
+            v_err_dyn = (
+                cur_v_err_dyn
+                if v_err_dyn is None
+                else ZonoTensor.where(active, cur_v_err_dyn, v_err_dyn)
+            )
+
+            # exception for set explosion
+            if np.any(abstract_err > 1e100):
+                raise Exception("Set Explosion")
+            active = (perf_ind_cur > 1) & (perf_ind <= 1)
+        # translate reachable sets by linearization point
+        r_ti += opt.lin_err_x
+        r_tp += opt.lin_err_x
+
+        # compute the reachable set due to the linearization error
+        r_err = ALK2011HSCC.error_solution(v_err_dyn, lin_opt)
+
+        # add the abstraction error to the reachable sets
+        r_ti += r_err
+        r_tp += r_err
+        # determine the best dimension to split the set in order to reduce the
+        # linearization error
+        dim_for_split = [[] for _ in range(num)]
+        for i in np.flatnonzero(perf_ind > 1):
+            r_i = Zonotope(r.c[i], r.gen[i])
+            dim_for_split[i] = [cls.select_split_dim(sys, r_i, opt)]
+        # store the linearization error
+        stats = Stats.active()
+        if stats is not None:
+            stats.add("gens_before_reduce", (r_ti.gen_num + r_tp.gen_num) * num)
+        r_ti = r_ti.reduce(Zonotope.REDUCE_METHOD, Zonotope.ORDER)
+        r_tp = r_tp.reduce(Zonotope.REDUCE_METHOD, Zonotope.ORDER)
+        if stats is not None:
+            stats.add("gens_after_reduce", (r_ti.gen_num + r_tp.gen_num) * num)
+        return r_ti, r_tp, abstract_err, dim_for_split, iters
+
+    @staticmethod
+    def _split(opt: Options, task, result, queue: deque, done: dict):
+        key, r, err, depth = task
+        r_ti, r_tp, abst_err, dims, iters = result
+        # check if initial set has to be split
+        if len(dims) <= 0:
+            done[key] = r_ti, r_tp, abst_err, iters
+        elif depth >= opt.max_split_depth:
+            raise Exception("Maximum split depth reached")
+        else:
+            for i, half in enumerate(r.split(dims[0])):
+                queue.append((key + (i,), half, err, depth + 1))
+
+    @staticmethod
+    def _gather(done: dict):
+        # order the sets by the set they are split from
+        results = [done[key] for key in sorted(done)]
+        return tuple(map(list, zip(*results))) if len(results) > 0 else ([], [], [], [])
 
     @classmethod
-    def reach(cls, sys: NonLinSys, opt: Options):
+    def reach_one_step_batch(cls, sys: NonLinSys, r0, err, opt: Options):
+        queue = deque(((i,), r0[i], err[i], 0) for i in range(len(r0)))
+        done = {}
+
+        while len(queue) > 0:
+            # propagate all sets waiting in lock-step, then split the failed ones
+            tasks = list(queue)
+            queue.clear()
+            r_ti, r_tp, abst_err, dims, iters = cls.linear_reach_batch(
+                sys,
+                ZonoTensor.stack([task[1] for task in tasks]),
+                np.stack([task[2] for task in tasks]),
+                opt,
+            )
+            r_ti, r_tp = r_ti.zonotopes(), r_tp.zonotopes()
+            for i, task in enumerate(tasks):
+                result = r_ti[i], r_tp[i], abst_err[i], dims[i], iters[i]
+                cls._split(opt, task, result, queue, done)
+
+        return cls._gather(done)
+
+    @staticmethod
+    def pool(sys: NonLinSys, opt: Options):
+        if opt.address is not None:
+            # local workers are started besides the ones joining from other machines
+            return Coordinator(
+                sys, _init_worker, opt.address, opt.workers, authkey=opt.authkey
+            )
+        if opt.workers <= 1:
+            return nullcontext()
+        return ProcessPoolExecutor(
+            opt.workers, initializer=_init_worker, initargs=(sys,)
+        )
+
+    @classmethod
+    def drain(cls, sys: NonLinSys, reach, r0, err, opt, executor=None):
+        """
+        propagate the sets through one step, sets failing to bound the linearization
+        error are split and the halves are put back to the queue of the sets to be
+        propagated, which is drained by the workers of the pool if given
+        :param sys: nonlinear system
+        :param reach: function to propagate one set through one step
+        :param r0: sets at the beginning of the step
+        :param err: linearization error of each set
+        :param opt: options
+        :param executor: pool of workers
+        :return: time interval sets, time point sets, errors and iteration counts
+        """
+        queue = deque(((i,), r0[i], err[i], 0) for i in range(len(r0)))
+        done = {}
+
+        if executor is None:
+            while len(queue) > 0:
+                task = queue.popleft()
+                cls._split(opt, task, reach(sys, task[1], task[2], opt), queue, done)
+            return cls._gather(done)
+
+        # initial sets are not needed by the workers, avoid sending them, and stats
+        # are only collected in this process
+        task_opt = copy.copy(opt)
+        task_opt.r0, task_opt.stats = [], None
+        chunk_size = opt.chunk_size
+        if chunk_size <= 0:
+            chunk_size = max(1, int(np.ceil(len(r0) / opt.workers)))
+        pending = {}
+        while len(queue) > 0 or len(pending) > 0:
+            while len(queue) > 0:
+                tasks = [queue.popleft() for _ in range(min(chunk_size, len(queue)))]
+                rs, errs = [task[1] for task in tasks], [task[2] for task in tasks]
+                f = executor.submit(_reach_worker, reach, rs, errs, task_opt)
+                pending[f] = tasks
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for f in finished:
+                for task, result in zip(pending.pop(f), f.result()):
+                    cls._split(opt, task, result, queue, done)
+
+        return cls._gather(done)
+
+    @classmethod
+    @timed("reach_one_step")
+    def reach_one_step(cls, sys: NonLinSys, r0, err, opt: Options, executor=None):
+        if opt.batch:
+            r_ti, r_tp, errs, iters = cls.reach_one_step_batch(sys, r0, err, opt)
+        else:
+            r_ti, r_tp, errs, iters = cls.drain(
+                sys, cls.linear_reach, r0, err, opt, executor
+            )
+        if opt.prune and len(r_tp) > 1:
+            # sets contained in other ones add nothing to the reachable sets after
+            keep = cls.prune(r_tp, opt)
+            r_tp, errs = [r_tp[i] for i in keep], [errs[i] for i in keep]
+        return r_ti, r_tp, errs, iters
+
+    @staticmethod
+    def prune(sets: [Zonotope], opt: Options):
+        """
+        find the sets not contained in any other set, candidates of the containing
+        set are looked up by the interval hulls, and the containment is checked on the
+        set reduced to a low order, which is sufficient. The lookup sweeps the most
+        selective dimension only, so it is O(N^2) in the worst case of N sets all
+        overlapping in that dimension, and one LP is solved per candidate left
+        :param sets: time point sets
+        :param opt: options
+        :return: indices of the sets to keep
+        """
+        z = ZonoTensor.stack(sets)
+        rad = np.abs(z.gen).sum(axis=-1)
+        lb, ub = z.c - rad, z.c + rad
+        # reduction keeps the interval hull, so the index holds for reduced sets
+        z = z.reduce(Zonotope.REDUCE_METHOD, opt.prune_order)
+        # sweep the dimension the sets spread the most along relative to their size
+        spread = np.ptp(z.c, axis=0) / np.maximum(np.mean(ub - lb, axis=0), 1e-12)
+        d = int(np.argmax(spread))
+        # a containing set starts before and ends after in this dimension, candidates
+        # are taken from the shorter of the two sorted prefixes
+        by_lb = np.argsort(lb[:, d], kind="stable")
+        by_ub = np.argsort(-ub[:, d], kind="stable")
+        n_lb = np.searchsorted(lb[by_lb, d], lb[:, d], side="right")
+        n_ub = np.searchsorted(-ub[by_ub, d], -ub[:, d], side="right")
+        removed = np.zeros(len(sets), dtype=bool)
+        # smaller sets are more likely to be contained, so check them first
+        for i in np.argsort(np.sum(ub - lb, axis=-1), kind="stable"):
+            cand = by_lb[: n_lb[i]] if n_lb[i] <= n_ub[i] else by_ub[: n_ub[i]]
+            inside = np.all(lb[cand] <= lb[i], axis=-1) & np.all(ub[cand] >= ub[i], axis=-1)
+            cand = cand[inside]
+            cand = cand[(cand != i) & ~removed[cand]]
+            r = Zonotope(z.c[i], z.gen[i])
+            removed[i] = any(r in sets[j] for j in cand)
+        return np.flatnonzero(~removed)
+
+    @staticmethod
+    def adapt_step(opt: Options, errs, iters):
+        """
+        choose the step size of the next step according to the linearization errors
+        and the iterations taken to bound them in the last step
+        :param opt: options, the step size and the factors are updated in place
+        :param errs: linearization error of each set
+        :param iters: number of iterations of each set
+        """
+        ratio = max(np.max(err / opt.max_err) for err in errs)
+        step = opt.step
+        # the first estimation of the error was already enough to bound it
+        if max(iters) <= 2 and ratio < opt.err_low:
+            step = min(step * opt.step_grow, opt.step_max)
+        elif max(iters) > 4 or ratio > opt.err_high:
+            step = max(step * opt.step_shrink, opt.step_min)
+        # do not step over the end of the time horizon
+        step = min(step, opt.t_end - opt.time)
+        if step != opt.step:
+            opt.set_step(step)
+
+    @staticmethod
+    def is_finished(opt: Options):
+        if opt.adaptive:
+            return opt.time >= opt.t_end - 1e-9 * (opt.t_end - opt.t_start)
+        return opt.step_idx >= opt.steps_num - 1
+
+    @classmethod
+    def reach_iter(cls, sys: NonLinSys, opt: Options, sinks=()):
+        """
+        compute the reachable sets step by step, only the sets of the latest step are
+        held, so memory use does not grow with the number of steps
+        :param sys: nonlinear system
+        :param opt: options
+        :param sinks: callables to write, reduce or drop the sets of each step
+        :return: generator of (step_idx, time_interval, ti_sets, tp_sets)
+        """
         assert opt.validation(sys.dim)
-        # init containers for storing the results
+        err = [np.zeros(r.shape) for r in opt.r0]
+        yield from cls._reach_from(sys, opt.r0, err, opt, sinks)
+
+    @classmethod
+    def _reach_from(cls, sys: NonLinSys, r, err, opt: Options, sinks):
+        checkpoint = None
+        if opt.checkpoint_dir is not None:
+            checkpoint = Checkpoint(opt.checkpoint_dir, opt.checkpoint_keep)
+        with checkpoint or nullcontext():
+            yield from cls.step_loop(
+                sys, cls.reach_one_step, r, err, opt, sinks, checkpoint
+            )
+
+    @classmethod
+    def step_loop(
+        cls,
+        sys: NonLinSys,
+        one_step,
+        r,
+        err,
+        opt: StepOptions,
+        sinks,
+        checkpoint: Checkpoint = None,
+    ):
+        """
+        loop over the steps until the end of the time horizon, the sets are
+        propagated by the pool of workers if configured
+        :param sys: nonlinear system
+        :param one_step: function taking (sys, r, err, opt, executor) and returning
+                         (ti_sets, tp_sets, errs, iters) of one step
+        :param r: time point sets to start from
+        :param err: linearization error of each set
+        :param opt: options
+        :param sinks: callables to write, reduce or drop the sets of each step
+        :param checkpoint: snapshots are written to if given
+        :return: generator of (step_idx, time_interval, ti_sets, tp_sets)
+        """
+        time_pts = np.linspace(opt.t_start, opt.t_end, opt.steps_num)
+
+        with cls.pool(sys, opt) as executor:
+            while not cls.is_finished(opt):
+                start = time.perf_counter()
+                with opt.stats or nullcontext():
+                    next_ti, r, next_err, iters = one_step(sys, r, err, opt, executor)
+                opt.iter_hist.update(int(i) for i in iters)
+                # errors are given per set after splitting, so they can be reused
+                err = next_err if opt.warm_start else [np.zeros(x.shape) for x in r]
+                opt.step_idx += 1
+                if opt.adaptive:
+                    time_interval = np.array([opt.time, opt.time + opt.step])
+                    opt.time += opt.step
+                    cls.adapt_step(opt, next_err, iters)
+                else:
+                    time_interval = time_pts[opt.step_idx - 1 : opt.step_idx + 1]
+                if opt.stats is not None:
+                    Algorithm.record(
+                        opt.stats, opt.step_idx, time_interval, start, r, iters
+                    )
+                if checkpoint and opt.step_idx % opt.checkpoint_interval == 0:
+                    checkpoint.save(opt.step_idx, r, err, opt)
+                stop = opt.specs is not None and Specification.monitor(
+                    opt.specs, opt.step_idx, next_ti, opt.spec_report
+                )
+                ti, tp = Algorithm.sink(sinks, opt.step_idx, time_interval, next_ti, r)
+                yield opt.step_idx, time_interval, ti, tp
+                if stop:
+                    return
+
+    @classmethod
+    def reach(cls, sys: NonLinSys, opt: Options, sinks=()):
+        steps = cls.reach_iter(sys, opt, sinks)
+        return Algorithm.collect(steps, opt.r0, opt.t_start)
+
+    @staticmethod
+    def _load(dir_name: str):
+        file_name = Checkpoint.latest(dir_name)
+        assert file_name is not None
+        _, r, err, opt = Checkpoint.load(file_name)
+        # keep writing snapshots to where they are resumed from
+        opt.checkpoint_dir = dir_name
+        return r, err, opt
+
+    @classmethod
+    def resume_iter(cls, sys: NonLinSys, dir_name: str, sinks=()):
+        """
+        continue the computation from the latest snapshot in the given directory
+        :param sys: nonlinear system
+        :param dir_name: directory of snapshots written by reach or reach_iter
+        :param sinks: callables to write, reduce or drop the sets of each step
+        :return: generator of (step_idx, time_interval, ti_sets, tp_sets) of the
+                 remaining steps
+        """
+        r, err, opt = cls._load(dir_name)
+        yield from cls._reach_from(sys, r, err, opt, sinks)
+
+    @classmethod
+    def resume(cls, sys: NonLinSys, dir_name: str, sinks=()):
+        r, err, opt = cls._load(dir_name)
         time_pts = np.linspace(opt.t_start, opt.t_end, opt.steps_num)
-        ti_set, ti_time, tp_set, tp_time = [], [], [opt.r0], [time_pts[0]]
-        err = [[np.zeros(r.shape) for r in opt.r0]]
-
-        while opt.step_idx < opt.steps_num - 1:
-            next_ti, next_tp = cls.reach_one_step(sys, tp_set[-1], err[-1], opt)
-            opt.step_idx += 1
-            ti_set.append(next_ti)
-            ti_time.append(time_pts[opt.step_idx - 1 : opt.step_idx + 1])
-            tp_set.append(next_tp)
-            tp_time.append(time_pts[opt.step_idx])
-
-        return ti_set, tp_set, np.vstack(ti_time), np.array(tp_time)
+        t = opt.time if opt.adaptive else time_pts[opt.step_idx]
+        steps = cls._reach_from(sys, r, err, opt, sinks)
+        return Algorithm.collect(steps, r, t)
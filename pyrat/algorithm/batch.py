@@ -0,0 +1,111 @@
+"""
+run many reachability problems sharing one system, like sweeps over initial sets, input
+sets and step sizes, the system is sent to each worker process once, so derivatives of
+the model are compiled once per worker instead of once per problem
+"""
+
+from __future__ import annotations
+
+import copy
+import itertools
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+
+from .alk2011hscc import ALK2011HSCC
+from .althoff2013hscc import ALTHOFF2013HSCC
+from .asb2008cdc import ASB2008CDC
+
+_worker_sys = None  # system owned by current worker process of the pool
+
+
+def _init_worker(sys):
+    global _worker_sys
+    _worker_sys = sys
+
+
+@dataclass
+class Job:
+    idx: int  # index of the options this job was created from
+    opt: object = None  # options after the computation, holding reports and stats
+    result: tuple = None  # what reach returns, None if failed
+    error: Exception = None  # exception raised by the computation, None if succeeded
+    trace: str = None  # formatted traceback of the error
+    duration: float = 0  # seconds spent in the computation
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def algorithm(opt):
+    """
+    :param opt: options of an algorithm
+    :return: the algorithm the options belong to
+    """
+    for alg in (ASB2008CDC, ALK2011HSCC, ALTHOFF2013HSCC):
+        if isinstance(opt, alg.Options):
+            return alg
+    raise NotImplementedError
+
+
+def variants(base, **values):
+    """
+    options for every combination of the given values
+    :param base: options shared by all variants
+    :param values: name of an option and the values to sweep it over
+    :return: list of options, copied from the base with the values set
+    """
+    names = list(values.keys())
+    opts = []
+    for combination in itertools.product(*values.values()):
+        opt = copy.deepcopy(base)
+        for name, value in zip(names, combination):
+            setattr(opt, name, value)
+        opts.append(opt)
+    return opts
+
+
+def _run(sys, idx: int, opt):
+    start = time.perf_counter()
+    try:
+        result = algorithm(opt).reach(sys, opt)
+        return Job(idx, opt, result, duration=time.perf_counter() - start)
+    except Exception as e:
+        # keep the failure inside this job, the rest of the sweep goes on
+        job = Job(idx, opt, error=e, trace=traceback.format_exc())
+        job.duration = time.perf_counter() - start
+        return job
+
+
+def _run_worker(idx: int, opt):
+    return _run(_worker_sys, idx, opt)
+
+
+def run(sys, opts: list, workers: int = 1):
+    """
+    compute the reachable sets for each of the given options
+    :param sys: system shared by all jobs
+    :param opts: options of ASB2008CDC, ALK2011HSCC or ALTHOFF2013HSCC
+    :param workers: number of processes to run jobs in, 1 to run in this process
+    :return: generator of jobs in the order they finish
+    """
+    assert workers >= 1
+    if workers <= 1:
+        for idx, opt in enumerate(opts):
+            yield _run(sys, idx, opt)
+        return
+
+    with ProcessPoolExecutor(
+        workers, initializer=_init_worker, initargs=(sys,)
+    ) as executor:
+        futures = {
+            executor.submit(_run_worker, idx, opt): idx for idx, opt in enumerate(opts)
+        }
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                # the job could not be shipped or its worker died
+                yield Job(futures[future], opts[futures[future]], error=e)
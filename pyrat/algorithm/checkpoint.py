@@ -0,0 +1,117 @@
+"""
+snapshots of the state of long running reachability analysis, a snapshot holds the
+time point sets, the linearization error of each set, the step index and the options,
+so the analysis can be resumed from the latest snapshot if the process dies
+"""
+
+from __future__ import annotations
+
+import copy
+import glob
+import os
+import pickle
+import queue
+import threading
+
+import numpy as np
+
+from pyrat.geometry import Zonotope
+
+
+class Checkpoint:
+    PREFIX = "checkpoint_"
+
+    def __init__(self, dir_name: str, keep: int = 2):
+        """
+        :param dir_name: directory to write snapshots to, created if not exists
+        :param keep: number of latest snapshots retained, older ones are removed
+        """
+        assert keep >= 1
+        os.makedirs(dir_name, exist_ok=True)
+        self.__dir_name = dir_name
+        self.__keep = keep
+        self.__queue = queue.Queue()
+        self.__error = None
+        # write snapshots in background, so the computation is not blocked by io
+        self.__writer = threading.Thread(target=self.__write_loop, daemon=True)
+        self.__writer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __write_loop(self):
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                return
+            try:
+                self.__write(*item)
+            except Exception as e:
+                self.__error = e
+
+    def __write(self, step_idx: int, arrays: dict):
+        name = os.path.join(self.__dir_name, self.PREFIX + "%08d" % step_idx)
+        # write to a temporary file first, a snapshot is either complete or absent
+        np.savez(name + ".tmp.npz", **arrays)
+        os.replace(name + ".tmp.npz", name + ".npz")
+        for old in self.list(self.__dir_name)[: -self.__keep]:
+            os.remove(old)
+
+    def save(self, step_idx: int, sets: [Zonotope], err: [np.ndarray], opt):
+        """
+        schedule a snapshot to be written, return immediately
+        :param step_idx: index of the step the sets belong to
+        :param sets: time point sets
+        :param err: linearization error of each set
+        :param opt: options of the algorithm
+        """
+        if self.__error is not None:
+            raise self.__error
+        opt = copy.copy(opt)
+        # initial sets are not needed for resuming, avoid writing them, and stats
+        # belong to the running process
+        opt.r0, opt.stats = [], None
+        arrays = {
+            "step_idx": np.array(step_idx),
+            "num": np.array(len(sets)),
+            "opt": np.frombuffer(pickle.dumps(opt), dtype=np.uint8),
+        }
+        for i, (r, e) in enumerate(zip(sets, err)):
+            arrays["c_" + str(i)] = r.c
+            arrays["gen_" + str(i)] = r.gen
+            arrays["err_" + str(i)] = e
+        self.__queue.put((step_idx, arrays))
+
+    def close(self):
+        """
+        wait for all scheduled snapshots to be written
+        """
+        self.__queue.put(None)
+        self.__writer.join()
+        if self.__error is not None:
+            raise self.__error
+
+    @classmethod
+    def list(cls, dir_name: str):
+        return sorted(glob.glob(os.path.join(dir_name, cls.PREFIX + "[0-9]*[0-9].npz")))
+
+    @classmethod
+    def latest(cls, dir_name: str):
+        snapshots = cls.list(dir_name)
+        return snapshots[-1] if len(snapshots) > 0 else None
+
+    @staticmethod
+    def load(file_name: str):
+        """
+        :param file_name: snapshot file
+        :return: step index, time point sets, linearization errors and options
+        """
+        with np.load(file_name) as data:
+            num = int(data["num"])
+            sets = [Zonotope(data["c_" + str(i)], data["gen_" + str(i)]) for i in range(num)]
+            err = [data["err_" + str(i)] for i in range(num)]
+            opt = pickle.loads(data["opt"].tobytes())
+            return int(data["step_idx"]), sets, err, opt
@@ -0,0 +1,371 @@
+"""
+coordinator and workers exchanging the per-set work of reach_one_step over TCP, so the
+sets of one step can be propagated by processes on other machines. The coordinator acts
+like a process pool, idle workers pull the next task from it, tasks of a worker which
+dies are put back to the queue, and once the queue is empty idle workers steal tasks
+running for long on other workers, the first result returned wins.
+
+A worker on another machine is started by
+
+    PYRAT_AUTHKEY=<hex key> python -m pyrat.algorithm.distributed <host> <port>
+
+connections are authenticated by the challenge and response of
+multiprocessing.connection with the key shared by the coordinator and its workers, only
+peers knowing the key are sent or read any frame, as frames may carry pickles. Callables
+are sent by name and only the ones defined by pyrat are resolved.
+
+frames are sent as two 8 bytes lengths followed by a JSON header and the raw bytes of
+the arrays referenced by the header, zonotopes and arrays are written as raw float64
+buffers, anything else not expressible in JSON is pickled
+"""
+
+from __future__ import annotations
+
+import importlib
+import inspect
+import json
+import multiprocessing
+import os
+import pickle
+import struct
+import sys as system
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection, Listener
+
+import numpy as np
+
+from pyrat.geometry import Zonotope
+
+_LENGTHS = struct.Struct("!QQ")
+
+
+# =============================================== wire format
+def _name(func) -> str:
+    return func.__module__ + ":" + func.__qualname__
+
+
+def _resolve(name: str):
+    module, qualname = name.split(":")
+    # only callables defined by pyrat, not the ones its modules import
+    if module != "pyrat" and not module.startswith("pyrat."):
+        raise ValueError("callable not allowed: " + name)
+    obj = importlib.import_module(module)
+    for attr in qualname.split("."):
+        obj = getattr(obj, attr)
+        if inspect.ismodule(obj):
+            raise ValueError("callable not allowed: " + name)
+    owner = getattr(obj, "__module__", None) or ""
+    if not callable(obj) or not (owner == "pyrat" or owner.startswith("pyrat.")):
+        raise ValueError("callable not allowed: " + name)
+    return obj
+
+
+def _encode(obj, buffers: list):
+    def _buffer(data: bytes):
+        buffers.append(data)
+        return len(buffers) - 1
+
+    def _array(a: np.ndarray):
+        a = np.ascontiguousarray(a)
+        return [_buffer(a.tobytes()), a.dtype.str, list(a.shape)]
+
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return {"v": obj}
+    elif isinstance(obj, Zonotope):
+        return {"z": [_array(obj.c), _array(obj.gen)]}
+    elif isinstance(obj, np.ndarray) and obj.dtype != object:
+        return {"a": _array(obj)}
+    elif isinstance(obj, list):
+        return {"l": [_encode(x, buffers) for x in obj]}
+    elif isinstance(obj, tuple):
+        return {"t": [_encode(x, buffers) for x in obj]}
+    elif callable(obj) and hasattr(obj, "__qualname__"):
+        return {"f": _name(obj)}
+    else:
+        return {"p": _buffer(pickle.dumps(obj))}
+
+
+def _decode(item, buffers: list):
+    def _array(ref):
+        idx, dtype, shape = ref
+        return np.frombuffer(buffers[idx], dtype=dtype).reshape(shape).copy()
+
+    tag, value = next(iter(item.items()))
+    if tag == "v":
+        return value
+    elif tag == "z":
+        return Zonotope(_array(value[0]), _array(value[1]))
+    elif tag == "a":
+        return _array(value)
+    elif tag == "l":
+        return [_decode(x, buffers) for x in value]
+    elif tag == "t":
+        return tuple(_decode(x, buffers) for x in value)
+    elif tag == "f":
+        return _resolve(value)
+    elif tag == "p":
+        return pickle.loads(buffers[value])
+    else:
+        raise NotImplementedError
+
+
+def send(conn: Connection, kind: str, task_id: int = -1, body=None):
+    """
+    write one frame to the connection
+    :param conn: authenticated connection
+    :param kind: type of the message
+    :param task_id: task the message belongs to
+    :param body: content of the message
+    """
+    buffers = []
+    header = {"kind": kind, "id": task_id, "body": _encode(body, buffers)}
+    header["sizes"] = [len(b) for b in buffers]
+    header = json.dumps(header).encode()
+    payload = b"".join(buffers)
+    conn.send_bytes(_LENGTHS.pack(len(header), len(payload)) + header + payload)
+
+
+def recv(conn: Connection):
+    """
+    read one frame from the connection
+    :param conn: authenticated connection
+    :return: type, task and content of the message
+    """
+    frame = conn.recv_bytes()
+    header_size, payload_size = _LENGTHS.unpack_from(frame)
+    start = _LENGTHS.size
+    header = json.loads(frame[start : start + header_size])
+    payload = frame[start + header_size :]
+    if len(payload) != payload_size:
+        raise ConnectionError("truncated frame")
+    buffers, start = [], 0
+    for size in header["sizes"]:
+        buffers.append(payload[start : start + size])
+        start += size
+    return header["kind"], header["id"], _decode(header["body"], buffers)
+
+
+# =============================================== worker
+def serve(address: tuple, authkey: bytes):
+    """
+    run a worker, computing the tasks received from the coordinator until it exits
+    :param address: (host, port) the coordinator listens at
+    :param authkey: key shared with the coordinator
+    """
+    with Client(tuple(address), authkey=authkey) as conn:
+        kind, _, (initializer, sys) = recv(conn)
+        assert kind == "init"
+        initializer(sys)
+        while True:
+            kind, task_id, body = recv(conn)
+            if kind == "exit":
+                return
+            fn, args = body
+            try:
+                result = fn(*args)
+            except Exception as e:
+                send(conn, "error", task_id, (e, traceback.format_exc()))
+            else:
+                send(conn, "result", task_id, result)
+
+
+# =============================================== coordinator
+class _Task:
+    def __init__(self, task_id: int, fn, args: tuple):
+        self.id = task_id
+        self.fn = fn
+        self.args = args
+        self.future = Future()
+        self.running = 0  # number of workers computing this task at the moment
+        self.start = None  # when the latest worker started this task
+
+
+class Coordinator:
+    def __init__(
+        self,
+        sys,
+        initializer,
+        address: tuple = ("127.0.0.1", 0),
+        workers: int = 0,
+        steal_after: float = 1.0,
+        authkey: bytes = None,
+    ):
+        """
+        :param sys: system sent to each worker once it connects
+        :param initializer: called by each worker with the system before any task
+        :param address: (host, port) to listen at, port 0 picks a free one, host None
+                        for localhost
+        :param workers: number of local worker processes to start
+        :param steal_after: seconds a task runs before idle workers may steal it, None
+                            to never steal
+        :param authkey: key the workers have to know, random if None, which only the
+                        local workers are given
+        """
+        self.__sys = sys
+        self.__initializer = initializer
+        self.__steal_after = steal_after
+        self.__queue = deque()
+        self.__running = {}  # tasks sent to workers but not finished yet
+        self.__cond = threading.Condition()
+        self.__closed = False
+        self.__next_id = 0
+        self.__threads = []
+        self.__authkey = os.urandom(32) if authkey is None else authkey
+        host, port = address
+        self.__server = Listener(
+            ("127.0.0.1" if host is None else host, port), authkey=self.__authkey
+        )
+        self.__acceptor = threading.Thread(target=self.__accept_loop, daemon=True)
+        self.__acceptor.start()
+        self.__processes = [
+            multiprocessing.Process(
+                target=serve, args=(self.address, self.__authkey), daemon=True
+            )
+            for _ in range(workers)
+        ]
+        for p in self.__processes:
+            p.start()
+
+    @property
+    def address(self) -> tuple:
+        return self.__server.address[:2]
+
+    @property
+    def authkey(self) -> bytes:
+        return self.__authkey
+
+    @property
+    def processes(self) -> [multiprocessing.Process]:
+        return self.__processes
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    def __accept_loop(self):
+        while True:
+            try:
+                conn = self.__server.accept()
+            except AuthenticationError:
+                continue  # peer not knowing the key, never served
+            except OSError:
+                return  # server closed
+            if self.__closed:
+                conn.close()
+                return
+            t = threading.Thread(target=self.__serve_worker, args=(conn,), daemon=True)
+            self.__threads.append(t)
+            t.start()
+
+    def __next_task(self):
+        with self.__cond:
+            while not self.__closed:
+                if len(self.__queue) > 0:
+                    task = self.__queue.popleft()
+                    if not task.future.done():
+                        break
+                    continue
+                # nothing waiting, steal the task running the longest on others
+                now, stealable = time.monotonic(), []
+                if self.__steal_after is not None:
+                    stealable = [
+                        t
+                        for t in self.__running.values()
+                        if t.running == 1 and now - t.start >= self.__steal_after
+                    ]
+                if len(stealable) > 0:
+                    task = min(stealable, key=lambda t: t.start)
+                    break
+                self.__cond.wait(self.__steal_after)
+            else:
+                return None
+            task.running += 1
+            task.start = time.monotonic()
+            self.__running[task.id] = task
+            return task
+
+    def __finish(self, task: _Task, kind: str, body):
+        with self.__cond:
+            task.running -= 1
+            if task.running <= 0:
+                self.__running.pop(task.id, None)
+            if task.future.done():
+                return  # computed by another worker already
+            if kind == "result":
+                task.future.set_result(body)
+            else:
+                task.future.set_exception(body[0])
+
+    def __requeue(self, task: _Task):
+        with self.__cond:
+            task.running -= 1
+            if task.running <= 0:
+                self.__running.pop(task.id, None)
+                if not task.future.done():
+                    self.__queue.appendleft(task)
+            self.__cond.notify_all()
+
+    def __serve_worker(self, conn: Connection):
+        with conn:
+            try:
+                send(conn, "init", body=(self.__initializer, self.__sys))
+            except OSError:
+                return
+            while True:
+                task = self.__next_task()
+                if task is None:
+                    try:
+                        send(conn, "exit")
+                    except OSError:
+                        pass
+                    return
+                try:
+                    send(conn, "task", task.id, (task.fn, task.args))
+                    kind, task_id, body = recv(conn)
+                except (OSError, EOFError, struct.error):
+                    # worker died, someone else has to compute its task
+                    self.__requeue(task)
+                    return
+                assert task_id == task.id
+                self.__finish(task, kind, body)
+
+    def submit(self, fn, *args) -> Future:
+        """
+        schedule fn(*args) to be run by a worker, fn has to be importable by the
+        workers and the arguments expressible in the wire format
+        """
+        with self.__cond:
+            assert not self.__closed
+            task = _Task(self.__next_id, fn, args)
+            self.__next_id += 1
+            self.__queue.append(task)
+            self.__cond.notify()
+            return task.future
+
+    def shutdown(self):
+        with self.__cond:
+            self.__closed = True
+            self.__cond.notify_all()
+        # wake up the blocking accept, closing alone does not on linux
+        try:
+            Client(self.address, authkey=self.__authkey).close()
+        except OSError:
+            pass
+        self.__acceptor.join()
+        self.__server.close()
+        for t in self.__threads:
+            t.join()
+        for p in self.__processes:
+            p.join()
+
+
+if __name__ == "__main__":
+    key = bytes.fromhex(os.environ["PYRAT_AUTHKEY"])
+    serve((system.argv[1], int(system.argv[2])), key)
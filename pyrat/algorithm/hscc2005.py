@@ -4,32 +4,230 @@ REF:
 Girard, A. (2005, March). Reachability of uncertain linear systems using zonotopes. In
 International Workshop on Hybrid Systems: Computation and Control (pp. 291-305).
 Springer, Berlin, Heidelberg.
+
+Girard, A., Le Guernic, C., & Maler, O. (2006, March). Efficient computation of
+reachable sets of linear time-invariant systems with inputs. In International Workshop
+on Hybrid Systems: Computation and Control (pp. 257-271). Springer, Berlin, Heidelberg.
 """
 
 from __future__ import annotations
-import numpy as np
-from numbers import Real
+
+import time
+from contextlib import nullcontext
 from dataclasses import dataclass
-from pyrat.geometry import Geometry
+
+import numpy as np
+from scipy.linalg import expm
+
 from pyrat.dynamic_system import LinSys
+from pyrat.geometry import Geometry, Zonotope
+from pyrat.util.functional.stats import timed
 from .algorithm import Algorithm
-from scipy.linalg import expm
+from .specification import Specification
+
+
+class _LazyZonotope(Zonotope):
+    """
+    zonotope whose center and generators are computed on first access, so the sets
+    of the steps nobody looks at are never built
+    """
+
+    def __init__(self, make, gen_num: int):
+        self._make, self._gen_num, self._cg = make, gen_num, None
+        self._vertices = None
+        self._type = Geometry.TYPE.ZONOTOPE
+
+    def __eval(self):
+        if self._cg is None:
+            self._cg, self._make = list(self._make()), None
+        return self._cg
+
+    @property
+    def _c(self):
+        return self.__eval()[0]
+
+    @_c.setter
+    def _c(self, c):
+        self.__eval()[0] = c
+
+    @property
+    def _gen(self):
+        return self.__eval()[1]
+
+    @_gen.setter
+    def _gen(self, gen):
+        self.__eval()[1] = gen
+
+    @property
+    def gen_num(self):
+        return self._gen_num if self._cg is None else self._gen.shape[1]
+
+    def __reduce__(self):
+        return Zonotope, (self.c, self.gen)
 
 
 class HSCC2005:
     @dataclass
     class Options(Algorithm.Options):
-        # TODO
+        u_trans: np.ndarray = None
+        # the accumulated input set holds at most input_order * dim generators, or
+        # twice the ones of the input set of one step if more, the smallest half of
+        # them are boxed once it is full
+        input_order: int = 20
+        phi: np.ndarray = None  # exp(A * step), shared by all steps
+        omega: Zonotope = None  # first time interval set without inputs, without box
+        omega_rad: float = 0  # radius of the box bloating omega
+        v: Zonotope = None  # set reachable by the inputs within one step, without box
+        v_rad: float = 0  # radius of the box bloating v
 
         def validation(self, dim: int):
-            # TODO
+            assert self._validate_time_related()
+            assert self.input_order >= 2
             return True
 
-    def one_step(self, sys: LinSys, r0, opt: Options):
+    @staticmethod
+    def _sup_norm(z: Zonotope) -> float:
+        # max norm of all points of the zonotope
+        return float(np.max(abs(z.c) + abs(z.gen).sum(axis=-1), initial=0))
+
+    @staticmethod
+    def input_set(sys: LinSys, opt: Options) -> Zonotope:
+        if opt.u is None:
+            return Zonotope.zero(sys.dim)
+        u = opt.u if opt.u_trans is None else opt.u + opt.u_trans
+        return u if sys.ub is None else sys.ub @ u
+
+    @classmethod
+    @timed("pre_compute")
+    def pre_compute(cls, sys: LinSys, opt: Options):
+        """
+        compute the terms shared by all steps
+        :param sys: linear system
+        :param opt: options, the computed terms are written to it
+        """
+        r, r0, u = opt.step, opt.r0, cls.input_set(sys, opt)
+        opt.phi = expm(sys.xa * r)
+        norm_a = np.linalg.norm(sys.xa, np.inf)
+        # bloating the sets by these radii covers the curvature of the trajectories
+        alpha = (np.expm1(r * norm_a) - r * norm_a) * cls._sup_norm(r0)
+        beta = 0
+        if norm_a > 0:
+            beta = (np.expm1(r * norm_a) - r * norm_a) / norm_a * cls._sup_norm(u)
+        # convex hull of the initial set and the time point set after one step, the
+        # boxes are kept apart as exp(A * step * i) maps them without a product
+        opt.omega, opt.omega_rad = r0.enclose(opt.phi @ r0 + r * u), alpha + beta
+        opt.v, opt.v_rad = r * u, beta
+
+    @staticmethod
+    def init_state(sys: LinSys, opt: Options):
+        """
+        :return: exp(A * step * i) of current step and the accumulated input set, as
+                 center, buffer of generators, number of generators held in the buffer
+                 and radius of the box the reduced generators went to
+        """
+        dim = sys.dim
+        # generators added by one step, after boxing half of the buffer they must fit
+        step_num = opt.v.gen_num + (dim if opt.v_rad > 0 else 0)
+        gen = np.empty((dim, max(opt.input_order * dim, 2 * step_num)), order="F")
+        return np.eye(dim), (np.zeros(dim), gen, 0, np.zeros(dim))
 
-        raise NotImplementedError
+    @staticmethod
+    def _accumulate(s, c: np.ndarray, gen: np.ndarray):
+        """
+        add a zonotope to the accumulated input set, the generators are written to the
+        free columns of the buffer, once it is full the smallest half of them go to the
+        box, each generator is boxed at most once, so wrapping does not pile up
+        """
+        s_c, s_gen, s_num, s_rad = s
+        if s_num + gen.shape[1] > s_gen.shape[1]:
+            held = s_gen[:, :s_num]
+            h = np.sum(abs(held), axis=0) - np.max(abs(held), axis=0)
+            boxed = np.argsort(h)[: s_num - s_num // 2]
+            keep = np.setdiff1d(np.arange(s_num), boxed)
+            s_rad = s_rad + np.sum(abs(held[:, boxed]), axis=1)
+            # a new buffer, the sets of earlier steps still refer to the old one
+            s_gen = np.empty_like(s_gen, order="F")
+            s_num = keep.size
+            s_gen[:, :s_num] = held[:, keep]
+        s_gen[:, s_num : s_num + gen.shape[1]] = gen
+        return s_c + c, s_gen, s_num + gen.shape[1], s_rad
 
-    def reach(self, sys: LinSys, opt: Options):
+    @staticmethod
+    def _set(m: np.ndarray, z: Zonotope, rad: float, s) -> _LazyZonotope:
+        """
+        :return: m @ (z + box of radius rad) + s, built on first access
+        """
+        s_c, s_gen, s_num, s_rad = s
+        blocks = [z.gen.shape[1], m.shape[1] if rad > 0 else 0, s_num]
+        blocks.append(s_rad.size if np.any(s_rad > 0) else 0)
+
+        def _make():
+            gen = [m @ z.gen, rad * m, s_gen[:, :s_num], np.diag(s_rad)]
+            gen = [g for g, num in zip(gen, blocks) if num > 0]
+            gen = np.hstack(gen) if gen else np.zeros((m.shape[0], 0))
+            return m @ z.c + s_c, gen
+
+        return _LazyZonotope(_make, sum(blocks))
+
+    @classmethod
+    @timed("one_step")
+    def one_step(cls, sys: LinSys, state, opt: Options):
+        """
+        propagate the sets by one step, only exp(A * step * i) and the accumulated
+        input set are advanced, the homogeneous solutions are mapped from the first
+        sets when the sets of a step are accessed, so they are never reduced, a step
+        still costs two dense products with exp(A * step * i)
+        :param sys: linear system
+        :param state: exp(A * step * i) and the accumulated input set
+        :param opt: options
+        :return: time interval set, time point set and the state of next step
+        """
+        m, s = state
+        r_ti = cls._set(m, opt.omega, opt.omega_rad, s)
+        # input set of this step mapped to the end of the time horizon so far
+        gen = m @ opt.v.gen if opt.v.gen_num > 0 else np.zeros((sys.dim, 0))
+        if opt.v_rad > 0:
+            gen = np.hstack([gen, opt.v_rad * m])
+        s = cls._accumulate(s, m @ opt.v.c, gen)
+        m = opt.phi @ m
+        r_tp = cls._set(m, opt.r0, 0, s)
+        return r_ti, r_tp, (m, s)
+
+    @classmethod
+    def reach_iter(cls, sys: LinSys, opt: Options, sinks=()):
+        """
+        compute the reachable sets step by step, only the sets of the latest step are
+        held, so memory use does not grow with the number of steps
+        :param sys: linear system
+        :param opt: options
+        :param sinks: callables to write, reduce or drop the sets of each step
+        :return: generator of (step_idx, time_interval, ti_set, tp_set)
+        """
         assert opt.validation(sys.dim)
-        # TODO
-        raise NotImplementedError
+        time_pts = np.linspace(opt.t_start, opt.t_end, opt.steps_num)
+        with opt.stats or nullcontext():
+            cls.pre_compute(sys, opt)
+        state = cls.init_state(sys, opt)
+
+        while opt.step_idx < opt.steps_num - 1:
+            start = time.perf_counter()
+            with opt.stats or nullcontext():
+                next_ti, next_tp, state = cls.one_step(sys, state, opt)
+            opt.step_idx += 1
+            time_interval = time_pts[opt.step_idx - 1 : opt.step_idx + 1]
+            if opt.stats is not None:
+                Algorithm.record(opt.stats, opt.step_idx, time_interval, start, next_tp)
+            stop = opt.specs is not None and Specification.monitor(
+                opt.specs, opt.step_idx, next_ti, opt.spec_report
+            )
+            ti, tp = Algorithm.sink(
+                sinks, opt.step_idx, time_interval, next_ti, next_tp
+            )
+            yield opt.step_idx, time_interval, ti, tp
+            if stop:
+                return
+
+    @classmethod
+    def reach(cls, sys: LinSys, opt: Options, sinks=()):
+        steps = cls.reach_iter(sys, opt, sinks)
+        return Algorithm.collect(steps, opt.r0, opt.t_start)
@@ -0,0 +1,174 @@
+"""
+compact storage of reachable sets, the centers and the generators of all sets are
+held in contiguous arrays instead of one object per set, the sets of each step are
+located by offsets, so large results can be indexed, projected and bounded at once
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+from pyrat.geometry import Geometry, Interval, Zonotope, ZonoTensor
+
+
+class ReachResult:
+    def __init__(self, dim: int, capacity: int = 1024):
+        """
+        :param dim: dimension of the sets
+        :param capacity: number of sets to allocate for, grows when exceeded
+        """
+        assert capacity >= 1
+        self._c = np.empty((capacity, dim), dtype=float)
+        # generators padded by zeros to the largest number of generators of all sets
+        self._gen = np.zeros((capacity, dim, 0), dtype=float)
+        self._gen_num = np.zeros(capacity, dtype=int)  # generators of each set
+        self._num = 0  # number of sets stored
+        self._offsets = [0]  # sets of step i are located in [offsets[i], offsets[i+1])
+        self._time = []  # time interval or time point of each step
+
+    # =============================================== property
+    @property
+    def dim(self) -> int:
+        return self._c.shape[-1]
+
+    @property
+    def c(self) -> np.ndarray:
+        return self._c[: self._num]
+
+    @property
+    def gen(self) -> np.ndarray:
+        return self._gen[: self._num]
+
+    @property
+    def gen_num(self) -> np.ndarray:
+        return self._gen_num[: self._num]
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return np.asarray(self._offsets)
+
+    @property
+    def time(self) -> np.ndarray:
+        return np.asarray(self._time)
+
+    @property
+    def set_num(self) -> int:
+        return self._num
+
+    # =============================================== operator
+    def __len__(self):
+        return len(self._time)
+
+    def __getitem__(self, step: int) -> ZonoTensor:
+        """
+        sets of the given step as one batch, views of the stored arrays
+        """
+        start, end = self._offsets[step], self._offsets[step + 1]
+        gen_num = self._gen_num[start:end].max(initial=0)
+        return ZonoTensor(self._c[start:end], self._gen[start:end, :, :gen_num])
+
+    # =============================================== private method
+    def _reserve(self, num: int, gen_num: int):
+        capacity = self._c.shape[0]
+        if self._num + num > capacity:
+            capacity = max(2 * capacity, self._num + num)
+            c = np.empty((capacity, self.dim), dtype=float)
+            c[: self._num] = self.c
+            self._c = c
+            self._gen_num = np.concatenate(
+                [self.gen_num, np.zeros(capacity - self._num, dtype=int)]
+            )
+        if self._num + num > self._gen.shape[0] or gen_num > self._gen.shape[-1]:
+            gen = np.zeros(
+                (capacity, self.dim, max(gen_num, self._gen.shape[-1])), dtype=float
+            )
+            gen[: self._num, :, : self._gen.shape[-1]] = self.gen
+            self._gen = gen
+
+    # =============================================== public method
+    def append(self, sets, time):
+        """
+        store the sets of one step
+        :param sets: zonotope, list of zonotopes or batch of zonotopes of the step,
+                     None if the sets of this step are dropped
+        :param time: time interval or time point of the step
+        """
+        if sets is None:
+            sets = []
+        elif isinstance(sets, Geometry.Base):
+            if sets.type != Geometry.TYPE.ZONOTOPE:
+                raise NotImplementedError
+            sets = sets.zonotopes() if isinstance(sets, ZonoTensor) else [sets]
+        num = len(sets)
+        self._reserve(num, max((s.gen_num for s in sets), default=0))
+        for i, s in enumerate(sets, self._num):
+            self._c[i] = s.c
+            self._gen[i, :, : s.gen_num] = s.gen
+            self._gen[i, :, s.gen_num :] = 0
+            self._gen_num[i] = s.gen_num
+        self._num += num
+        self._offsets.append(self._num)
+        self._time.append(time)
+
+    def step_idx(self) -> np.ndarray:
+        """
+        :return: index of the step each set belongs to
+        """
+        return np.repeat(np.arange(len(self)), np.diff(self._offsets))
+
+    def interval_hull(self, step: int = None) -> Interval:
+        """
+        :param step: index of the step, all sets if None
+        :return: interval hulls of the sets as one interval of shape (num, dim)
+        """
+        if step is None:
+            c, gen = self.c, self.gen
+        else:
+            z = self[step]
+            c, gen = z.c, z.gen
+        rad = abs(gen).sum(axis=-1)
+        return Interval(c - rad, c + rad)
+
+    def proj(self, dims) -> ReachResult:
+        """
+        :param dims: dimensions to keep
+        :return: result holding the projected sets of all steps
+        """
+        dims = np.atleast_1d(dims)
+        result = ReachResult(dims.shape[0], max(self._num, 1))
+        result._c[: self._num] = self.c[:, dims]
+        result._gen = self.gen[:, dims, :].copy()
+        result._gen_num[: self._num] = self.gen_num
+        result._num = self._num
+        result._offsets = list(self._offsets)
+        result._time = list(self._time)
+        return result
+
+    def to_zonotopes(self) -> [[Zonotope]]:
+        """
+        :return: list of the sets of each step
+        """
+        zonos = [
+            Zonotope(c, gen[:, :m])
+            for c, gen, m in zip(self.c, self.gen, self.gen_num)
+        ]
+        return [
+            zonos[start:end] for start, end in zip(self._offsets, self._offsets[1:])
+        ]
+
+    @classmethod
+    def collect(cls, steps, r0, t_start: float = 0):
+        """
+        store the sets produced by reach_iter or resume_iter
+        :param steps: generator of (step_idx, time_interval, ti_sets, tp_sets)
+        :param r0: initial sets, stored as the first time point sets
+        :param t_start: time of the initial sets
+        :return: results of the time interval sets and of the time point sets
+        """
+        r0 = r0 if isinstance(r0, list) else [r0]
+        ti, tp = cls(r0[0].shape), cls(r0[0].shape)
+        tp.append(r0, t_start)
+        for step_idx, time_interval, next_ti, next_tp in steps:
+            ti.append(next_ti, time_interval)
+            tp.append(next_tp, time_interval[-1])
+        return ti, tp
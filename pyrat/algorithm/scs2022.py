@@ -6,7 +6,12 @@ Safety Controller Synthesis based on MPC
 
 from __future__ import annotations
 
+import copy
+import multiprocessing
+from collections import deque
 from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 from dataclasses import dataclass
 
 import numpy as np
@@ -15,8 +20,22 @@ from sympy import *
 from pyrat.dynamic_system import NonLinSys
 from pyrat.geometry import Zonotope, Interval
 from pyrat.model import Model
+from pyrat.util.functional import kdtree, knn_query
 from .asb2008cdc import ASB2008CDC
 
+_worker_sys, _worker_opt = None, None  # owned by current worker process of the pool
+
+
+def _init_worker(sys: NonLinSys, opt):
+    global _worker_sys, _worker_opt
+    _worker_sys, _worker_opt = sys, opt
+
+
+def _safe_control_worker(param: np.ndarray, cur_x: np.ndarray):
+    opt = copy.copy(_worker_opt)
+    opt.cur_x = cur_x
+    return SCS2022.safe_control(_worker_sys, param, opt)
+
 
 class SCS2022:
     @dataclass
@@ -36,6 +55,11 @@ class SCS2022:
         max_attempts: int = 30
         low: float = -10
         up: float = 10
+        # for distance to the target region
+        boundary_tol: float = 0.05  # max width of the boxes sampling the boundary
+        boundary = None  # kd tree of the samples of the boundary, built once per run
+        query_workers: int = -1  # threads answering the distance queries, -1 for all
+        workers: int = 1  # number of processes checking the sampled p concurrently
         # for running time
         cur_step: int = 0
         cur_x: np.ndarray = 0
@@ -51,122 +75,170 @@ class SCS2022:
             assert self.vx is not None
             assert self.target is not None
             assert self.up > self.low
+            assert self.workers >= 1
+            assert self.boundary_tol > 0
             self.cur_x = self.x0
             return True
 
     @classmethod
-    def simulation(cls, f, x, px, opt: Options):
-        def func(_x):
-            return np.array(f(_x, px))
-
-        next_x = func(x) * opt.step + x
-        return next_x
+    def simulation(cls, sys: NonLinSys, x, params, opt: Options):
+        """
+        :param sys: model with the parameters of the controller as inputs
+        :param x: current state
+        :param params: parameters of each candidate controller stacked as (num, n)
+        :return: next state under each candidate controller stacked as (num, dim)
+        """
+        xs = np.broadcast_to(x, (params.shape[0], x.shape[0]))
+        dxdt = sys.evaluate((xs, params), "numpy", 0, 0)
+        return dxdt * opt.step + xs
 
     @classmethod
-    def distance(cls, pts: np.ndarray, opt: Options) -> np.ndarray:
-        if opt.distance is not None:
-            return opt.distance(pts)  # if define custom distance function
-        # else we approximate this distance
+    def target_boundary(cls, opt: Options) -> np.ndarray:
+        """
+        sample the boundary of the target region by bisecting the boxes intersecting
+        it until they are smaller than the tolerance
+        :param opt: options
+        :return: vertices of these boxes as points of shape (num, dim)
+        """
+
         def contains_boundary(box: Interval):
             # check if this box intersecting with target region
             result = opt.target(box)
-            if result.inf[0] <= 0 and result.sup[0] >= 0:
-                return True
-            return False
-
-        def need_split(box: Interval, tolerance: float):
-            d = box.sup - box.inf
-            dim = np.where(d > tolerance)[0]
-            if dim.shape[0] > 0:
-                return dim[0]
-            return -1
-
-        tol, level = 1, 0
-        c = pts.sum(axis=0) / pts.shape[0]
+            return result.inf[0] <= 0 <= result.sup[0]
+
+        def encloses_boundary(box: Interval):
+            # target region is bounded, so the boundary is enclosed by the box if the
+            # value of the target function is positive on every face of the box
+            for dim in range(box.shape[0]):
+                for bd in (box.inf[dim], box.sup[dim]):
+                    inf, sup = box.inf.copy(), box.sup.copy()
+                    inf[dim] = sup[dim] = bd
+                    if opt.target(Interval(inf, sup)).inf[0] <= 0:
+                        return False
+            return True
+
+        # grow the box around the initial state until the whole boundary is inside
+        level, c = 0, opt.x0
         cell = Interval(c - 2**level, c + 2**level)
-        while not contains_boundary(cell):
+        while not (contains_boundary(cell) and encloses_boundary(cell)):
             level += 1
+            assert level < 64  # target region is unbounded
             cell = Interval(c - 2**level, c + 2**level)
 
         # refine the space iteratively according to the tolerance
-        active_cells = {cell}
-        valid_cell = []
+        active_cells, valid_cells = [cell], []
         while active_cells:
             cur_cell = active_cells.pop()
             if contains_boundary(cur_cell):
-                dim = need_split(cur_cell, tol)
-                if dim < 0:
-                    valid_cell.append(cur_cell)
+                d = cur_cell.sup - cur_cell.inf
+                dims = np.where(d > opt.boundary_tol)[0]
+                if dims.shape[0] <= 0:
+                    valid_cells.append(cur_cell)
                 else:
-                    sub_cells = cur_cell.split(dim)
-                    for sub_cell in sub_cells:
-                        active_cells.add(sub_cell)
+                    active_cells.extend(cur_cell.split(dims[0]))
 
-        # get points from valid cells
-        pts = np.concatenate([cell.vertices for cell in valid_cell], axis=1)
-        # approximate the distance by the shortest distance to these points
+        # get points from valid cells, cells share vertices with their neighbours
+        pts = np.concatenate([cell.vertices for cell in valid_cells], axis=0)
+        return np.unique(pts, axis=0)
 
-        # about our case, target region is bounded by a circle
-        d = pts - np.array([0, 0.5])
-        # return 0
-        return np.linalg.norm(d, ord=2) + np.sqrt(0.1)
+    @classmethod
+    def distance(cls, pts: np.ndarray, opt: Options) -> np.ndarray:
+        """
+        :param pts: points stacked as (num, dim)
+        :param opt: options
+        :return: distance of each point to the target region
+        """
+        if opt.distance is not None:
+            return opt.distance(pts)  # if define custom distance function
+        # else approximate the distance by the one to the nearest boundary sample
+        dists, _ = knn_query(opt.boundary, pts, 1, opt.query_workers)
+        # points inside the target region already have no distance to go
+        dists[opt.target(pts.T) <= 0] = 0
+        return dists
 
     @classmethod
-    def get_valid_p(cls, f, opt: Options):
+    def get_valid_p(cls, sys: NonLinSys, opt: Options, executor=None):
         # sampling potential valid ps
         params = np.random.rand(opt.max_attempts, opt.n)
         params = params * (opt.up - opt.low) + opt.low
-        next_xs = np.vstack(
-            [
-                cls.simulation(f, opt.cur_x, lambda x: opt.p(x, param), opt)
-                for param in params
-            ]
-        )
+        next_xs = cls.simulation(sys, opt.cur_x, params, opt)
         dists = cls.distance(next_xs, opt)
         # get the index of potential p according to potential distance to the target
         indices = np.argsort(dists)
-        for idx in indices:  # check every potential p
-            is_safe, next_r = cls.safe_control(f, lambda x: opt.p(x, params[idx]), opt)
-            if is_safe:
-                return params[idx], next_r  # control and next reachable set
+        if executor is None:
+            for idx in indices:  # check every potential p
+                is_safe, next_r = cls.safe_control(sys, params[idx], opt)
+                if is_safe:
+                    return params[idx], next_r  # control and next reachable set
+            return None, None
+
+        # check the closest potential ps concurrently, one more is submitted each
+        # time a check fails, so at most one check per worker is still running once
+        # the closest valid one is found
+        pending, waiting = deque(), deque(indices)
+        try:
+            while len(pending) > 0 or len(waiting) > 0:
+                while len(waiting) > 0 and len(pending) < opt.workers:
+                    idx = waiting.popleft()
+                    f = executor.submit(_safe_control_worker, params[idx], opt.cur_x)
+                    pending.append((idx, f))
+                idx, f = pending.popleft()
+                is_safe, next_r = f.result()
+                if is_safe:
+                    return params[idx], next_r
+        finally:
+            # running checks cannot be stopped, only the ones not started are dropped
+            for _, f in pending:
+                f.cancel()
 
         # if none of these potential p is valid, return None
         return None, None
 
     @classmethod
-    def init_model(cls, func, px, opt: Options):
-        def _f(x, u):
-            return Matrix(func(x, px))
+    def init_model(cls, func, opt: Options):
+        """
+        build the model with the parameters of the controller as symbolic inputs, so
+        it is derived and compiled once for all candidate parameters
+        """
 
-        @dataclass
-        class InnerModel(ModelOld):
-            vars = symbols(("x:" + str(opt.dim), "u:1"))
-            f = _f(*vars)
-            name = "inner model"
-            dim = f.rows
+        def controlled(x, w):
+            return Matrix(func(x, lambda _x: opt.p(_x, w)))
 
-        return InnerModel()
+        return NonLinSys(Model(controlled, [opt.dim, opt.n]))
 
     @classmethod
-    def safe_control(cls, f, px, opt: Options):
-        r0 = [Set(Zonotope(opt.cur_x, np.eye(opt.cur_x.shape[0]) * 0.05))]
-
-        # init system according to this given px
-        system = NonLinSysOld.Entity(cls.init_model(f, px, opt))
+    def safe_control(cls, sys: NonLinSys, param, opt: Options):
+        r0 = [Zonotope(opt.cur_x, np.eye(opt.cur_x.shape[0]) * 0.05)]
 
-        # init options for verification
+        # init options for verification, parameters are given as constant inputs
         verif_opt = ASB2008CDC.Options()
-        verif_opt.u = Zonotope.zero(1)
-        verif_opt.u_trans = np.zeros(1)
+        verif_opt.u = Zonotope.zero(opt.n, 1)
+        verif_opt.u_trans = param
         verif_opt.step = opt.step
         verif_opt.t_end = opt.step
         assert verif_opt.validation(opt.dim)
-        r_ti, r_tp = ASB2008CDC.reach_one_step(system, r0, verif_opt)
+        err = [np.zeros(r.shape) for r in r0]
+        r_ti, r_tp, _, _ = ASB2008CDC.reach_one_step(sys, r0, err, verif_opt)
         # check if r_ti inside the RA set according to the value function
-        for vertex in r_ti[0].vertices:
-            if opt.vx(vertex) <= 0:
-                return False, None
-        return True, r_tp[0].geometry
+        for r in r_ti:
+            for vertex in r.vertices:
+                if opt.vx(vertex) <= 0:
+                    return False, None
+        return True, r_tp[0]
+
+    @staticmethod
+    def pool(sys: NonLinSys, opt: Options):
+        # workers are forked with the model and the options, so the functions given
+        # by the options need not to be picklable, the ps are checked one by one on
+        # platforms not able to fork
+        if opt.workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+            return nullcontext()
+        return ProcessPoolExecutor(
+            opt.workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_worker,
+            initargs=(sys, opt),
+        )
 
     @classmethod
     def terminate(cls, opt: Options):
@@ -186,8 +258,8 @@ class SCS2022:
         return False
 
     @classmethod
-    def one_step_forward(cls, f, opt: Options):
-        p, next_r = cls.get_valid_p(f, opt)
+    def one_step_forward(cls, sys: NonLinSys, opt: Options, executor=None):
+        p, next_r = cls.get_valid_p(sys, opt, executor)
         if p is None:
             opt.invalid_p = True
             return None
@@ -199,13 +271,17 @@ class SCS2022:
     @classmethod
     def run(cls, f, opt: Options):
         assert opt.validation()
+        sys = cls.init_model(f, opt)
+        if opt.distance is None:
+            opt.boundary = kdtree(cls.target_boundary(opt))
 
         x = [opt.x0]
         rs = []
-        while not cls.terminate(opt):
-            r = cls.one_step_forward(f, opt)
-            if r is not None:
-                rs.append(r)
-                x.append(opt.cur_x)
+        with cls.pool(sys, opt) as executor:
+            while not cls.terminate(opt):
+                r = cls.one_step_forward(sys, opt, executor)
+                if r is not None:
+                    rs.append(r)
+                    x.append(opt.cur_x)
         # return the result
         return x, rs
@@ -0,0 +1,66 @@
+"""
+sinks for consuming the sets produced by reach_iter on the fly, a sink is called with
+(step_idx, time_interval, ti, tp) and returns the (ti, tp) to keep, or None to drop them
+"""
+
+from __future__ import annotations
+
+import os
+
+import numpy as np
+
+
+def _apply(func, sets):
+    # some algorithms produce one set per step, others a list of sets
+    if sets is None:
+        return None
+    return [func(s) for s in sets] if isinstance(sets, list) else func(sets)
+
+
+def drop(step_idx, time_interval, ti, tp):
+    return None
+
+
+def every(n: int):
+    """
+    keep the sets of every n-th step only
+    """
+    assert n >= 1
+
+    def _every(step_idx, time_interval, ti, tp):
+        return (ti, tp) if step_idx % n == 0 else None
+
+    return _every
+
+
+def reduce(method, order: int):
+    """
+    reduce the order of the kept sets
+    """
+
+    def _reduce(step_idx, time_interval, ti, tp):
+        r = lambda s: s.reduce(method, order)
+        return _apply(r, ti), _apply(r, tp)
+
+    return _reduce
+
+
+def save(dir_name: str, keep: bool = False):
+    """
+    write the sets of each step to "dir_name/step_<step_idx>.npz"
+    :param dir_name: directory to write to, created if not exists
+    :param keep: if to pass the sets on after writing, or drop them
+    """
+    os.makedirs(dir_name, exist_ok=True)
+
+    def _save(step_idx, time_interval, ti, tp):
+        arrays = {"time_interval": np.asarray(time_interval)}
+        for name, sets in (("ti", ti), ("tp", tp)):
+            sets = sets if isinstance(sets, list) else [sets]
+            for i, s in enumerate(sets):
+                arrays[name + "_c_" + str(i)] = s.c
+                arrays[name + "_gen_" + str(i)] = s.gen
+        np.savez(os.path.join(dir_name, "step_" + str(step_idx) + ".npz"), **arrays)
+        return (ti, tp) if keep else None
+
+    return _save
@@ -0,0 +1,123 @@
+"""
+specifications checked against the reachable sets while they are computed, so the
+computation can stop as soon as the result is known
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from enum import IntEnum
+
+import numpy as np
+
+from pyrat.geometry import Geometry, Zonotope, ZonoTensor
+
+
+class Specification:
+    class TYPE(IntEnum):
+        SAFE = 0  # reachable sets must stay inside the set
+        UNSAFE = 1  # reachable sets must never intersect the set
+        # set known to be invariant and to satisfy the other specifications
+        INVARIANT = 2
+
+    class VERDICT(IntEnum):
+        SATISFIED = 0  # specification proven for all steps computed
+        UNKNOWN = 1  # over-approximation too coarse to decide at some step
+        VIOLATED = 2  # violation is certain
+        INVARIANT = 3  # all sets inside an invariant, proven for all future steps
+
+    @dataclass
+    class Report:
+        verdict: int = 0  # one of Specification.VERDICT
+        step_idx: int = None  # step of the violation or the first undecided step
+        set_idx: int = None  # index of the set causing the violation in that step
+        set: Geometry.Base = None  # the set causing the violation in that step
+        spec: Specification = None  # the specification not satisfied
+
+    def __init__(self, s: Geometry.Base, t: TYPE):
+        """
+        :param s: polytope or interval the reachable sets are checked against
+        :param t: type of the specification
+        """
+        if s.type == Geometry.TYPE.POLYTOPE:
+            self._a, self._b = s.a, s.b
+        elif s.type == Geometry.TYPE.INTERVAL:
+            assert s.inf.ndim == 1
+            eye = np.eye(s.inf.shape[0])
+            self._a = np.concatenate([eye, -eye])
+            self._b = np.concatenate([s.sup, -s.inf])
+        else:
+            raise NotImplementedError
+        self._set = s
+        self._type = t
+
+    @property
+    def set(self) -> Geometry.Base:
+        return self._set
+
+    @property
+    def type(self) -> TYPE:
+        return self._type
+
+    def _bounds(self, sets: [Zonotope]):
+        # support functions of all sets along the normals of all half spaces at once
+        z = ZonoTensor.stack(sets)
+        center = z.c @ self._a.T
+        radius = np.abs(self._a @ z.gen).sum(axis=-1)
+        return center - radius, center + radius
+
+    def check(self, sets: [Zonotope]):
+        """
+        check the given sets against this specification
+        :param sets: reachable sets of one step
+        :return: boolean arrays telling which sets satisfy this specification for
+                 certain and which violate it for certain
+        """
+        lb, ub = self._bounds(sets)
+        inside = np.all(ub <= self._b, axis=-1)
+        # separated by any half space of the specification set
+        outside = np.any(lb > self._b, axis=-1)
+        if self._type == Specification.TYPE.SAFE:
+            return inside, outside
+        elif self._type == Specification.TYPE.UNSAFE:
+            return outside, inside
+        elif self._type == Specification.TYPE.INVARIANT:
+            return inside, np.zeros_like(inside)
+        else:
+            raise NotImplementedError
+
+    @classmethod
+    def monitor(cls, specs: [Specification], step_idx: int, sets, report: Report):
+        """
+        check the sets of one step against all specifications and update the report
+        :param specs: specifications
+        :param step_idx: index of the step
+        :param sets: reachable sets of the step
+        :param report: report updated in place
+        :return: True if the verdict is final and the computation can stop
+        """
+        sets = sets if isinstance(sets, list) else [sets]
+        invariant = False
+        for spec in specs:
+            satisfied, violated = spec.check(sets)
+            if spec.type == Specification.TYPE.INVARIANT:
+                invariant |= bool(np.all(satisfied))
+            elif np.any(violated):
+                idx = int(np.argmax(violated))
+                report.verdict = Specification.VERDICT.VIOLATED
+                report.step_idx, report.set_idx, report.set = step_idx, idx, sets[idx]
+                report.spec = spec
+                return True
+            elif not np.all(satisfied) and report.step_idx is None:
+                # remember where the result became undecided first
+                idx = int(np.argmin(satisfied))
+                report.verdict = Specification.VERDICT.UNKNOWN
+                report.step_idx, report.set_idx, report.set = step_idx, idx, sets[idx]
+                report.spec = spec
+        if invariant:
+            # nothing can leave the invariant, so the verdict can not change anymore
+            if report.verdict == Specification.VERDICT.SATISFIED:
+                report.verdict = Specification.VERDICT.INVARIANT
+                report.step_idx = step_idx
+            return True
+        return False
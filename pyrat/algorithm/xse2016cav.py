@@ -10,9 +10,11 @@ from __future__ import annotations
 from dataclasses import dataclass
 import cvxpy as cp
 import numpy as np
+from scipy import sparse
 from scipy.linalg import block_diag
+from scipy.optimize import linprog
 from pyrat.dynamic_system import NonLinSys
-from pyrat.geometry import Geometry, Polytope, Zonotope
+from pyrat.geometry import Geometry, Interval, Polytope, Zonotope
 from pyrat.geometry.operation import cvt2, boundary
 from .algorithm import Algorithm
 from .asb2008cdc import ASB2008CDC
@@ -23,21 +25,67 @@ class XSE2016CAV:
     class Options(Algorithm.Options):
         epsilon_m: float = np.inf  # for boundary sampling
         epsilon: float = np.inf  # for backward verification
+        lp_solver: str = "highs"  # "highs" for scipy, or the name of a cvxpy solver
+        # align boundary boxes to a grid of epsilon_m, so boxes met in later steps are
+        # reused and each step only propagates the new ones, at the price of enlarging
+        # each box by up to epsilon_m per dimension, which coarsens the backward sets,
+        # if False the exact boxes are propagated on every step and nothing is cached
+        snap: bool = True
+        boundary_cache: dict = None  # backward sets of each boundary box computed
 
         def validation(self, dim: int):
             assert self._validate_time_related()
+            assert self.lp_solver == "highs" or self.lp_solver in cp.installed_solvers()
             assert not np.isinf(self.epsilon) and self.epsilon >= 0
             assert not np.isinf(self.epsilon_m) and self.epsilon_m > 0
             self.step_idx = self.steps_num - 1  # index from 0
+            self.boundary_cache = {}
             return True
 
+    @staticmethod
+    def _snap(box: Interval, epsilon: float):
+        # grid cells covering the box, boxes of different steps meet on the same grid
+        inf = np.floor(box.inf / epsilon).astype(int)
+        sup = np.ceil(box.sup / epsilon).astype(int)
+        return (inf.tobytes(), sup.tobytes()), Interval(inf * epsilon, sup * epsilon)
+
     @classmethod
-    def boundary_back(cls, sys: NonLinSys, u, epsilon, opt: ASB2008CDC.Options):
-        bounds = boundary(u, epsilon, Geometry.TYPE.ZONOTOPE)
-        r0 = [cvt2(bd, Geometry.TYPE.ZONOTOPE) for bd in bounds]
-        opt.r0 = r0
-        _, tps, _, _ = ASB2008CDC.reach(sys, opt)
-        return [cvt2(zono, Geometry.TYPE.INTERVAL) for zono in tps[-1]]
+    def boundary_back(cls, sys: NonLinSys, u, opt: Options, opt_back: ASB2008CDC.Options):
+        """
+        propagate the boundary of given set backward by one step, boxes covering the
+        boundary which are not cached are propagated together by one call, and if
+        snapped to the grid, the results are kept in the options, so boxes met again in
+        later steps are not propagated again
+        :param sys: reversed system
+        :param u: set to propagate the boundary of
+        :param opt: options, holding the backward sets of the boxes propagated
+        :param opt_back: options for the backward propagation of one step
+        :return: intervals enclosing the propagated boundary
+        """
+        boxes = {}
+        for bd in boundary(u, opt.epsilon_m, Geometry.TYPE.ZONOTOPE):
+            box = cvt2(bd, Geometry.TYPE.INTERVAL)
+            if opt.snap:
+                key, box = cls._snap(box, opt.epsilon_m)
+            else:
+                key = box.inf.tobytes(), box.sup.tobytes()
+            boxes.setdefault(key, box)
+        missed = [k for k in boxes if not opt.snap or k not in opt.boundary_cache]
+        omega = []
+        if len(missed) > 0:
+            opt_back.r0 = [cvt2(boxes[k], Geometry.TYPE.ZONOTOPE) for k in missed]
+            _, tps, _, _ = ASB2008CDC.reach(sys, opt_back)
+            sets = [cvt2(zono, Geometry.TYPE.INTERVAL) for zono in tps[-1]]
+            if opt.snap and not opt_back.prune and len(sets) == len(missed):
+                # nothing split, each box ends in one set in the order of the boxes
+                for k, r in zip(missed, sets):
+                    opt.boundary_cache[k] = [r]
+            else:
+                # split sets can not be told apart by the box they come from
+                omega.extend(sets)
+        for k in boxes:
+            omega.extend(opt.boundary_cache.get(k, []) if opt.snap else [])
+        return omega
 
     @classmethod
     def polytope(cls, omega):
@@ -46,8 +94,35 @@ class XSE2016CAV:
         # get polytope from these points
         return cvt2(pts, Geometry.TYPE.POLYTOPE)
 
+    @staticmethod
+    def _lp_matrix(o: Polytope):
+        # variables are the state and the offset t of the half spaces, a @ x - t <= b
+        return np.hstack([o.a, -np.ones((o.a.shape[0], 1))])
+
     @classmethod
-    def contraction(cls, omega, o):
+    def contraction(cls, omega, o, opt: Options):
+        if opt.lp_solver != "highs":
+            return cls._contraction_cvxpy(omega, o, opt.lp_solver)
+        # boxes share the constraint matrix and differ in the bounds only, so the
+        # independent problems of all boxes are solved as one block diagonal problem
+        num_box, dim = len(omega), o.dim
+        a = sparse.kron(sparse.identity(num_box), sparse.csr_matrix(cls._lp_matrix(o)))
+        c = np.tile(np.append(np.zeros(dim), 1), num_box)
+        lb = np.stack([np.append(box.inf, -np.inf) for box in omega]).reshape(-1)
+        ub = np.stack([np.append(box.sup, 0) for box in omega]).reshape(-1)
+        res = linprog(
+            c,
+            A_ub=a.tocsr(),
+            b_ub=np.tile(o.b, num_box),
+            bounds=np.stack([lb, ub], axis=-1),
+            method="highs",
+        )
+        assert res.status == 0  # ensure valid solution for LP problem
+        bu = np.min(res.x[dim :: dim + 1])
+        return Polytope(o.a, o.b + bu), bu
+
+    @classmethod
+    def _contraction_cvxpy(cls, omega, o, solver: str):
         num_box = len(omega)
         bj = []
         for i in range(num_box):
@@ -56,9 +131,7 @@ class XSE2016CAV:
             c[-1] = 1
 
             constraints = []
-            a = np.zeros((o.a.shape[0], x.shape[0]))
-            a[:, :-1] = o.a
-            a[:, -1] = -1
+            a = cls._lp_matrix(o)
             constraints.append(a @ x - o.b <= 0)
             lb = np.zeros(omega[i].inf.shape[0] + 1)
             lb[:-1] = omega[i].inf
@@ -71,51 +144,52 @@ class XSE2016CAV:
 
             cost = c @ x
             prob = cp.Problem(cp.Minimize(cost), constraints)
-            prob.solve(solver=cp.GLPK)
+            prob.solve(solver=solver)
             assert prob.status == "optimal"  # ensure valid solution for LP problem
             bj.append(x.value[-1])
         bu = np.min(bj)
         return Polytope(o.a, o.b + bu), bu
 
     @classmethod
-    def get_d(cls, o: Polytope):  # polytope before contraction
-        x = cp.Variable(o.dim + 1)
+    def get_d(cls, o: Polytope, opt: Options):  # polytope before contraction
         c = np.zeros(o.dim + 1)
         c[-1] = 1
+        a = cls._lp_matrix(o)
 
-        constraints = []
-        a = np.zeros((o.a.shape[0], x.shape[0]))
-        a[:, :-1] = o.a
-        a[:, -1] = -1
-        constraints.append(a @ x - o.b <= 0)
+        if opt.lp_solver == "highs":
+            res = linprog(c, A_ub=a, b_ub=o.b, bounds=(None, None), method="highs")
+            assert res.status == 0  # ensure valid solution for LP
+            return res.x[-1]  # which is d
 
+        x = cp.Variable(o.dim + 1)
+        constraints = [a @ x - o.b <= 0]
         cost = c @ x
         prob = cp.Problem(cp.Minimize(cost), constraints)
-        prob.solve(solver=cp.GLPK)
+        prob.solve(solver=opt.lp_solver)
         assert prob.status == "optimal"  # ensure valid solution for LP
         return x.value[-1]  # which is d
 
     @classmethod
-    def verification(cls, o, u_back, sys, bu, epsilon, opt: ASB2008CDC.Options):
+    def verification(cls, o, u_back, sys, bu, opt: Options, opt_back: ASB2008CDC.Options):
         r0 = Zonotope(u_back.c, np.eye(u_back.c.shape[0]) * 0.1)
-        opt.r0 = [r0]
-        _, tps, _, _ = ASB2008CDC.reach(sys, opt)
+        opt_back.r0 = [r0]
+        _, tps, _, _ = ASB2008CDC.reach(sys, opt_back)
         sx = tps[-1][-1]
         is_inside = sx in o
-        d = cls.get_d(o)
-        if abs(bu / d) > epsilon or not is_inside:
+        d = cls.get_d(o, opt)
+        if abs(bu / d) > opt.epsilon or not is_inside:
             return False
         return True
 
     @classmethod
-    def one_step_backward(cls, u, sys, opt: Options, opt_back: ASB2008CDC.Options):
-        sys.reverse()  # reverse the system for backward computation
-        omega = cls.boundary_back(sys, u, opt.epsilon_m, opt_back)
+    def one_step_backward(
+        cls, u, sys, sys_back, opt: Options, opt_back: ASB2008CDC.Options
+    ):
+        omega = cls.boundary_back(sys_back, u, opt, opt_back)
         o = cls.polytope(omega)
         u_back, bu = cls.contraction(omega, o, opt)
 
-        sys.reverse()  # reverse the system for forward computation
-        if not cls.verification(o, u_back, sys, bu, opt.epsilon, opt_back):
+        if not cls.verification(o, u_back, sys, bu, opt, opt_back):
             return None, False
         return u_back, True
 
@@ -123,6 +197,9 @@ class XSE2016CAV:
     def reach(cls, sys: NonLinSys, opt: Options, opt_back: ASB2008CDC.Options):
         assert opt.validation(sys.dim)
         assert opt_back.validation(sys.dim)
+        # reversed view of the system for backward computation, the derivatives of
+        # both directions are kept by the shared model for all steps
+        sys_back = sys.reversed()
         tp_set, tp_time = [], []
         time_pts = np.linspace(opt.t_start, opt.t_end, opt.steps_num)
         u = opt.r0
@@ -131,7 +208,7 @@ class XSE2016CAV:
 
         # loop over all backward steps
         while opt.step_idx >= 0:
-            u, is_valid = cls.one_step_backward(u, sys, opt, opt_back)
+            u, is_valid = cls.one_step_backward(u, sys, sys_back, opt, opt_back)
             opt.step_idx -= 1
             if is_valid:
                 tp_set.append(u)
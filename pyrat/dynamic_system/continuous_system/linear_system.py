@@ -21,7 +21,7 @@ class LinSys:
 
     @property
     def dim(self) -> int:
-        return self._xa.shape[1]
+        return self._xa.shape[-1]
 
     @property
     def xa(self) -> np.ndarray:
@@ -14,5 +14,9 @@ class NonLinSys:
     def reverse(self):
         self.model.reverse()
 
-    def evaluate(self, xs: tuple, mod: str, order: int, v: int):
-        return self.model.evaluate(xs, mod, order, v)
+    def reversed(self) -> NonLinSys:
+        # shares the derivatives of the model with this system
+        return NonLinSys(self.model.reversed())
+
+    def evaluate(self, xs: tuple, mod: str, order: int, v: int, sparse: bool = False):
+        return self.model.evaluate(xs, mod, order, v, sparse)
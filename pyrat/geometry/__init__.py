@@ -2,10 +2,12 @@ from .geometry import Geometry
 from .interval import Interval
 from .polytope import Polytope
 from .zonotope import Zonotope
+from .zono_tensor import ZonoTensor
 
 __all__ = [
     "Geometry",
     "Polytope",
     "Interval",
     "Zonotope",
+    "ZonoTensor",
 ]
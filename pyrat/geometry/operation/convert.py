@@ -9,6 +9,9 @@ from pyrat.geometry import *
 
 def _interval2zonotope(source: Interval):
     c = source.c
+    if len(source.shape) > 1:
+        # batch of intervals to batch of zonotopes
+        return ZonoTensor(c, source.rad[..., None] * np.eye(source.shape[-1]))
     gen = np.diag(source.rad)
     return Zonotope(c, gen)
 
@@ -28,7 +31,7 @@ def _zonotope2interval(source: Zonotope):
     """
     c = source.c
     # determine left and right limit, specially designed for high performance
-    delta = np.sum(abs(source.z), axis=1) - abs(c)
+    delta = np.sum(abs(source.z), axis=-1) - abs(c)
     left_limit = c - delta
     right_limit = c + delta
     return Interval(left_limit, right_limit)
@@ -0,0 +1,434 @@
+from __future__ import annotations
+
+from numbers import Real
+from typing import TYPE_CHECKING
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+import pyrat.util.functional.auxiliary as aux
+from pyrat.util.functional.sparse_tensor import SparseTensor
+from pyrat.util.functional.stats import timed
+from .geometry import Geometry
+from .zonotope import Zonotope
+
+if TYPE_CHECKING:
+    from pyrat.geometry.interval import Interval
+
+
+class ZonoTensor(Geometry.Base):
+    """
+    batch of zonotopes with the same dimension, the center is stored as (..., d) and
+    the generators as (..., d, m) where leading axes index the batch, zonotopes with
+    fewer generators are padded by zero generators. Operations apply to every
+    zonotope of the batch in lock-step, so this object behaves as a zonotope
+    """
+
+    def __init__(self, c: ArrayLike, gen: ArrayLike):
+        c = c if isinstance(c, np.ndarray) else np.asarray(c, dtype=float)
+        gen = gen if isinstance(gen, np.ndarray) else np.asarray(gen, dtype=float)
+        assert gen.ndim == c.ndim + 1 and gen.shape[:-1] == c.shape
+        self._c = c
+        self._gen = gen
+        self._type = Geometry.TYPE.ZONOTOPE
+
+    # =============================================== property
+    @property
+    def c(self) -> np.ndarray:
+        return self._c
+
+    @property
+    def gen(self) -> np.ndarray:
+        return self._gen
+
+    @property
+    def z(self) -> np.ndarray:
+        return np.concatenate([self._c[..., None], self._gen], axis=-1)
+
+    @property
+    def shape(self) -> tuple:
+        return self._c.shape
+
+    @property
+    def dim(self) -> int:
+        return self._c.shape[-1]
+
+    @property
+    def gen_num(self) -> int:
+        return self._gen.shape[-1]
+
+    @property
+    def is_empty(self) -> bool:
+        return aux.is_empty(self._c)
+
+    @property
+    def info(self):
+        info = "\n ------------- ZonoTensor BEGIN ------------- \n"
+        info += ">>> shape -- gen_num -- center\n"
+        info += str(self.shape) + "\n"
+        info += str(self.gen_num) + "\n"
+        info += str(self.c) + "\n"
+        info += str(self.gen) + "\n"
+        info += "\n ------------- ZonoTensor END --------------- \n"
+        return info
+
+    @property
+    def type(self) -> Geometry.TYPE:
+        return self._type
+
+    # =============================================== operator
+    def __str__(self):
+        return self.info
+
+    def __len__(self):
+        return self._c.shape[0]
+
+    def __getitem__(self, item):
+        return ZonoTensor(self._c[item], self._gen[item])
+
+    def __abs__(self):
+        return ZonoTensor(abs(self._c), abs(self._gen))
+
+    def __add__(self, other):
+        if isinstance(other, (np.ndarray, Real)):
+            c = self._c + other
+            return ZonoTensor(c, np.broadcast_to(self._gen, c.shape + (self.gen_num,)))
+        elif isinstance(other, Geometry.Base):
+            if other.type == Geometry.TYPE.ZONOTOPE:
+                c = self._c + other.c
+                gen = np.concatenate(
+                    [
+                        np.broadcast_to(self._gen, c.shape + (self.gen_num,)),
+                        np.broadcast_to(other.gen, c.shape + (other.gen.shape[-1],)),
+                    ],
+                    axis=-1,
+                )
+                return ZonoTensor(c, gen)
+            else:
+                raise NotImplementedError
+        else:
+            raise NotImplementedError
+
+    def __radd__(self, other):
+        return self + other
+
+    def __iadd__(self, other):
+        return self + other
+
+    def __sub__(self, other):
+        if isinstance(other, (np.ndarray, Real)):
+            return self + (-other)
+        else:
+            raise NotImplementedError
+
+    def __isub__(self, other):
+        return self - other
+
+    def __pos__(self):
+        return self
+
+    def __neg__(self):
+        return ZonoTensor(-self._c, -self._gen)
+
+    def __matmul__(self, other):
+        raise NotImplementedError(
+            "For matrix multiplication, use 'matrix@zono_tensor' instead"
+        )
+
+    def __rmatmul__(self, other):
+        if isinstance(other, np.ndarray):
+            c = (other @ self._c[..., None])[..., 0]
+            return ZonoTensor(c, other @ self._gen)
+        else:
+            raise NotImplementedError
+
+    def __mul__(self, other):
+        def __mul_interval(x: Interval):
+            zas = np.sum(abs(self.z), axis=-1)
+            if len(x.shape) > self._c.ndim:
+                # interval matrix multiplied with every zonotope of the batch
+                s = (x.rad @ zas[..., None])[..., 0]
+                if not np.any(x.c):
+                    c = np.zeros(s.shape, dtype=float)
+                    gen = np.zeros(s.shape + (0,), dtype=float)
+                else:
+                    c = (x.c @ self._c[..., None])[..., 0]
+                    gen = x.c @ self._gen
+            else:
+                # element-wise multiplication
+                s = x.rad * zas
+                c = x.c * self._c
+                gen = x.c[..., None] * self._gen
+            gen = np.broadcast_to(gen, s.shape + (gen.shape[-1],))
+            box = s[..., None] * np.eye(s.shape[-1])
+            return ZonoTensor(c + np.zeros_like(s), np.concatenate([gen, box], axis=-1))
+
+        if isinstance(other, Real):
+            return ZonoTensor(self._c * other, self._gen * other)
+        elif isinstance(other, np.ndarray):
+            c = self._c * other
+            gen = self._gen * np.asarray(other)[..., None]
+            return ZonoTensor(c, np.broadcast_to(gen, c.shape + (self.gen_num,)))
+        elif isinstance(other, Geometry.Base):
+            if other.type == Geometry.TYPE.INTERVAL:
+                return __mul_interval(other)
+            else:
+                raise NotImplementedError
+        else:
+            raise NotImplementedError
+
+    def __rmul__(self, other):
+        return self * other
+
+    def __imul__(self, other):
+        return self * other
+
+    # =============================================== class method
+    @classmethod
+    def functional(cls):
+        raise NotImplementedError
+
+    # =============================================== static method
+    @staticmethod
+    def empty(gen_num: int, *shape):
+        return ZonoTensor(np.empty(shape, dtype=float), np.empty(shape + (gen_num,)))
+
+    @staticmethod
+    def rand(gen_num: int, *shape):
+        assert gen_num >= 0 and len(shape) >= 1
+        return ZonoTensor(np.random.rand(*shape), np.random.rand(*shape, gen_num))
+
+    @staticmethod
+    def zeros(gen_num: int, *shape):
+        assert gen_num >= 0 and len(shape) >= 1
+        return ZonoTensor(np.zeros(shape), np.zeros(shape + (gen_num,)))
+
+    @staticmethod
+    def stack(zonos: [Zonotope]):
+        """
+        stack given zonotopes into one batch, missing generators are padded by zeros
+        :param zonos: zonotopes with the same dimension
+        :return:
+        """
+        gen_num = max(zono.gen_num for zono in zonos)
+        c = np.stack([zono.c for zono in zonos])
+        gen = np.zeros(c.shape + (gen_num,), dtype=float)
+        for i, zono in enumerate(zonos):
+            gen[i, :, : zono.gen_num] = zono.gen
+        return ZonoTensor(c, gen)
+
+    @staticmethod
+    def where(cond: np.ndarray, x: ZonoTensor, y: ZonoTensor):
+        """
+        pick zonotopes from x where condition holds and from y elsewhere
+        :param cond: boolean array over the batch axes
+        :param x: batch of zonotopes
+        :param y: batch of zonotopes
+        :return:
+        """
+        gen_num = max(x.gen_num, y.gen_num)
+
+        def __pad(gen):
+            pad = np.zeros(gen.shape[:-1] + (gen_num - gen.shape[-1],), dtype=float)
+            return np.concatenate([gen, pad], axis=-1)
+
+        c = np.where(cond[..., None], x.c, y.c)
+        gen = np.where(cond[..., None, None], __pad(x.gen), __pad(y.gen))
+        return ZonoTensor(c, gen)
+
+    # =============================================== public method
+    def zonotopes(self) -> [Zonotope]:
+        """
+        split this batch into independent zonotopes, padded generators are removed
+        :return: list of zonotopes in row-major order of the batch axes
+        """
+        cs = self._c.reshape((-1, self.dim))
+        gens = self._gen.reshape((-1, self.dim, self.gen_num))
+        zonos = []
+        for c, gen in zip(cs, gens):
+            zono = Zonotope(c, gen)
+            zono.remove_zero_gen()
+            zonos.append(zono)
+        return zonos
+
+    def remove_zero_gen(self):
+        if self.gen_num <= 1:
+            return
+        # only generators which are zero for all zonotopes of the batch are removed
+        nz = abs(self._gen).reshape((-1, self.gen_num)).sum(axis=0) > 0
+        if not np.any(nz):
+            nz[0] = True  # at least one generator even all zeros inside
+        self._gen = self._gen[..., nz]
+
+    def transpose(self, *axes):
+        axes = tuple(range(self._c.ndim))[::-1] if len(axes) <= 0 else axes
+        return ZonoTensor(
+            self._c.transpose(*axes), self._gen.transpose(*axes, self._c.ndim)
+        )
+
+    def enclose(self, other: ZonoTensor) -> ZonoTensor:
+        if isinstance(other, Geometry.Base) and other.type == Geometry.TYPE.ZONOTOPE:
+            lhs_num, rhs_num = self.gen_num + 1, other.gen.shape[-1] + 1
+            z_cut, z_add, z_eq = None, None, None
+            if rhs_num < lhs_num:
+                z_cut = self.z[..., :rhs_num]
+                z_add = self.z[..., rhs_num:lhs_num]
+                z_eq = other.z
+            else:
+                z_cut = other.z[..., :lhs_num]
+                z_add = other.z[..., lhs_num:rhs_num]
+                z_eq = self.z
+            z_sum, z_diff = (z_cut + z_eq) * 0.5, (z_cut - z_eq) * 0.5
+            z_add = np.broadcast_to(z_add, z_sum.shape[:-1] + (z_add.shape[-1],))
+            z = np.concatenate([z_sum, z_diff, z_add], axis=-1)
+            return ZonoTensor(z[..., 0], z[..., 1:])
+        else:
+            raise NotImplementedError
+
+    @timed("reduce")
+    def reduce(self, method: Zonotope.REDUCE_METHOD, order: int):
+        def __reduce_girard():
+            self.remove_zero_gen()
+            # only reduce if zonotope order is greater than the desired order
+            if self.gen_num <= self.dim * order:
+                return ZonoTensor(self._c, self._gen)
+            # compute metric of generators
+            h = np.linalg.norm(self._gen, ord=1, axis=-2) - np.linalg.norm(
+                self._gen, ord=np.inf, axis=-2
+            )
+            # number of generators that are not reduced and that are reduced
+            num_ur = np.floor(self.dim * (order - 1)).astype(dtype=int)
+            num_r = self.gen_num - num_ur
+            # pick generators with smallest h values to be reduced
+            idx = np.argsort(h, axis=-1)
+            idx_r = idx[..., None, :num_r]
+            idx_ur = np.sort(idx[..., num_r:], axis=-1)[..., None, :]
+            gr = np.take_along_axis(self._gen, idx_r, axis=-1)
+            gur = np.take_along_axis(self._gen, idx_ur, axis=-1)
+            # box remaining generators
+            d = np.sum(abs(gr), axis=-1)
+            gb = d[..., None] * np.eye(self.dim)
+            return ZonoTensor(self._c, np.concatenate([gur, gb], axis=-1))
+
+        if method == Zonotope.METHOD.REDUCE.GIRARD:
+            return __reduce_girard()
+        else:
+            raise NotImplementedError
+
+    def proj(self, dims):
+        return ZonoTensor(self._c[..., dims], self._gen[..., dims, :])
+
+    def card_prod(self, other):
+        if isinstance(other, Geometry.Base) and other.type == Geometry.TYPE.ZONOTOPE:
+            batch = np.broadcast_shapes(self._c.shape[:-1], other.c.shape[:-1])
+            d0, d1 = self.dim, other.c.shape[-1]
+            m0, m1 = self.gen_num, other.gen.shape[-1]
+            c = np.concatenate(
+                [
+                    np.broadcast_to(self._c, batch + (d0,)),
+                    np.broadcast_to(other.c, batch + (d1,)),
+                ],
+                axis=-1,
+            )
+            gen = np.zeros(batch + (d0 + d1, m0 + m1), dtype=float)
+            gen[..., :d0, :m0] = self._gen
+            gen[..., d0:, m0:] = other.gen
+            z = ZonoTensor(c, gen)
+            z.remove_zero_gen()
+            return z
+        else:
+            raise NotImplementedError
+
+    @timed("quad_map")
+    def quad_map(self, q: [np.ndarray], rz: ZonoTensor = None):
+        """
+        batched quadratic map, every element of q is a tensor of shape (..., o, n, n)
+        holding one matrix per output dimension for every zonotope of the batch, or a
+        SparseTensor of such, then only the entries held are touched
+        """
+        return _quad_map(self, q, rz)
+
+
+def _quad_map(x: ZonoTensor, q: [np.ndarray], rz: ZonoTensor = None):
+    # not timed, so Zonotope.quad_map records its time once when calling it
+
+    def _block_q():
+        dim_q = q[0].shape[-3]
+        n = sum(iq.shape[-1] for iq in q)
+        batch = np.broadcast_shapes(*[iq.shape[:-3] for iq in q])
+        qm = np.zeros(batch + (dim_q, n, n), dtype=float)
+        start = 0
+        for iq in q:
+            end = start + iq.shape[-1]
+            qm[..., start:end, start:end] = iq
+            start = end
+        # count empty matrices along the batch
+        q_noz = np.any(qm.reshape((-1, dim_q, n * n)), axis=(0, -1))
+        return qm, q_noz
+
+    def _sparse_q():
+        # entries of the block diagonal matrices, sorted by output dimension
+        sq = [
+            iq if isinstance(iq, SparseTensor) else SparseTensor.from_dense(iq, 3)
+            for iq in q
+        ]
+        offsets = np.cumsum([0] + [iq.shape[-1] for iq in sq])
+        idx = np.concatenate(
+            [iq.idx + [0, start, start] for iq, start in zip(sq, offsets)]
+        )
+        batch = np.broadcast_shapes(*[iq.batch_shape for iq in sq])
+        val = np.concatenate(
+            [np.broadcast_to(iq.val, batch + (iq.nnz,)) for iq in sq], axis=-1
+        )
+        order = np.argsort(idx[:, 0], kind="stable")
+        return idx[order], val[..., order], sq[0].shape[0]
+
+    def _quad_mat(z1, z2):
+        if not any(isinstance(iq, SparseTensor) for iq in q):
+            qm, q_noz = _block_q()
+            z1, z2 = z1[..., None, :, :], z2[..., None, :, :]
+            return np.swapaxes(z1, -1, -2) @ qm @ z2, q_noz
+        idx, val, dim_q = _sparse_q()
+        # every entry adds its value times the product of two rows of z1 and z2
+        a, b = z1[..., idx[:, 1], :] * val[..., None], z2[..., idx[:, 2], :]
+        batch = np.broadcast_shapes(a.shape[:-2], b.shape[:-2])
+        quad_mat = np.zeros(batch + (dim_q, z1.shape[-1], z2.shape[-1]))
+        rows, starts = np.unique(idx[:, 0], return_index=True)
+        for i, start, end in zip(rows, starts, np.append(starts[1:], len(idx))):
+            quad_mat[..., i, :, :] = (
+                np.swapaxes(a[..., start:end, :], -1, -2) @ b[..., start:end, :]
+            )
+        # count empty matrices along the batch
+        q_noz = np.zeros(dim_q, dtype=bool)
+        nz = np.any(val.reshape((-1, val.shape[-1])) != 0, axis=0)
+        q_noz[idx[nz, 0]] = True
+        return quad_mat, q_noz
+
+    def _zono(c, gen, q_noz):
+        # generate new zonotope
+        if np.sum(q_noz) <= 1:
+            return ZonoTensor(c, np.sum(abs(gen), axis=-1)[..., None])
+        else:
+            z = ZonoTensor(c, gen)
+            z.remove_zero_gen()
+            return z
+
+    def _xTQx():
+        quad_mat, q_noz = _quad_mat(x.z, x.z)
+        gens = x.gen_num
+        # faster method diag elements
+        gen_diag = 0.5 * np.diagonal(quad_mat[..., 1:, 1:], axis1=-2, axis2=-1)
+        # center
+        c = quad_mat[..., 0, 0] + np.sum(gen_diag, axis=-1)
+        # off-diagonal elements added, pick via logical indexing
+        quad_mat_off_diag = quad_mat + np.swapaxes(quad_mat, -1, -2)
+        k_ind = np.tril(np.ones((gens + 1, gens + 1), dtype=bool), -1)
+        gen = np.concatenate([gen_diag, quad_mat_off_diag[..., k_ind]], axis=-1)
+        return _zono(c, gen, q_noz)
+
+    def _x1TQx2():
+        quad_mat, q_noz = _quad_mat(x.z, rz.z)
+        z = quad_mat.reshape(quad_mat.shape[:-2] + (-1,))
+        return _zono(z[..., 0], z[..., 1:], q_noz)
+
+    return _xTQx() if rz is None else _x1TQx2()
@@ -8,6 +8,8 @@ import numpy as np
 from numpy.typing import ArrayLike
 from scipy.linalg import block_diag
 import pyrat.util.functional.auxiliary as aux
+from pyrat.util.functional.sparse_tensor import SparseTensor
+from pyrat.util.functional.stats import timed
 from .geometry import Geometry
 
 if TYPE_CHECKING:  # for type hint, easy coding ：)
@@ -109,9 +111,55 @@ class Zonotope(Geometry.Base):
 
     # =============================================== operator
     def __contains__(self, item):
-
-        # TODO
-        raise NotImplementedError
+        def __contains_pts(pts: np.ndarray):
+            return __solve(pts.reshape((-1, 1)) - self.c.reshape((-1, 1)))
+
+        def __contains_zonotope(other: Zonotope):
+            return __solve(np.hstack([other.gen, (other.c - self.c).reshape((-1, 1))]))
+
+        def __solve(z: np.ndarray):
+            from scipy.optimize import linprog
+            from scipy.sparse import csr_matrix, eye, hstack, kron, vstack
+
+            # find x=[Gamma beta] with G@x=z and sum(abs(x),axis=1)<=1, which is
+            # sufficient for containment of zonotopes and exact for points
+            n, m = z.shape[1], self.gen_num
+            if m <= 0:
+                return bool(np.allclose(z, 0))
+            # variables are x and t bounding abs(x), both stacked column by column
+            k = n * m
+            i_k = eye(k, format="csr")
+            a_eq = hstack([kron(eye(n), csr_matrix(self.gen)), csr_matrix((z.size, k))])
+            row_sum = kron(np.ones((1, n)), eye(m))
+            a_ub = vstack(
+                [
+                    hstack([i_k, -i_k]),
+                    hstack([-i_k, -i_k]),
+                    hstack([csr_matrix((m, k)), row_sum]),
+                ]
+            )
+            b_ub = np.concatenate([np.zeros(2 * k), np.ones(m)])
+            res = linprog(
+                np.zeros(2 * k),
+                A_ub=a_ub,
+                b_ub=b_ub,
+                A_eq=a_eq,
+                b_eq=z.reshape(-1, order="F"),
+                bounds=(None, None),
+                method="highs",
+            )
+            return res.status == 0
+
+        if isinstance(item, np.ndarray):
+            assert item.ndim == 1
+            return item.shape[0] == self.shape and __contains_pts(item)
+        elif isinstance(item, Geometry.Base):
+            if item.type == Geometry.TYPE.ZONOTOPE:
+                return item.shape == self.shape and __contains_zonotope(item)
+            else:
+                raise NotImplementedError
+        else:
+            raise NotImplementedError
 
     def __str__(self):
         return self.info
@@ -332,6 +380,7 @@ class Zonotope(Geometry.Base):
         else:
             raise NotImplementedError
 
+    @timed("reduce")
     def reduce(self, method: REDUCE_METHOD, order: int):
         def __reduce_girard():
             # pick generators to reduce
@@ -352,6 +401,19 @@ class Zonotope(Geometry.Base):
     def proj(self, dims):
         return Zonotope(self.c[dims], self.gen[dims, :])
 
+    def split(self, dim: int) -> (Zonotope, Zonotope):
+        """
+        split the zonotope into two halves by halving the generator with the largest
+        component in the given dimension, the union of the halves is the zonotope
+        :param dim: dimension to split along
+        :return: two halves of the zonotope
+        """
+        idx = np.argmax(abs(self.gen[dim, :]))
+        assert self.gen[dim, idx] != 0  # zonotope is flat in this dimension
+        gen = self.gen.copy()
+        gen[:, idx] *= 0.5
+        return Zonotope(self.c - gen[:, idx], gen), Zonotope(self.c + gen[:, idx], gen)
+
     def partition(self):
         # TODO
         raise NotImplementedError
@@ -369,7 +431,16 @@ class Zonotope(Geometry.Base):
         else:
             raise NotImplementedError
 
+    @timed("quad_map")
     def quad_map(self, q: [np.ndarray], rz: Zonotope = None):
+        if any(isinstance(iq, SparseTensor) for iq in q):
+            # only the entries held by the sparse tensors are touched
+            from .zono_tensor import ZonoTensor, _quad_map
+
+            rz = None if rz is None else ZonoTensor(rz.c, rz.gen)
+            z = _quad_map(ZonoTensor(self.c, self.gen), q, rz)
+            return Zonotope(z.c, z.gen)
+
         def _xTQx():
             dim_q = q[0].shape[0]
             c = np.zeros(dim_q)
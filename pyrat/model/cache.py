@@ -0,0 +1,137 @@
+"""
+content addressed disk cache of the derivatives of a model and of the source of their
+evaluators, a model is identified by the hash of its symbolic expression, so processes
+started later load what was derived and compiled before instead of doing it again
+
+entries are unpickled and executed when loaded, so the directory has to be writable
+only by trusted users. The sha256 digest stored next to each entry only catches entries
+which are partly written, corrupted or moved from another model, not ones forged by
+whoever can write to the directory, which is why entries in a directory writable by
+others than its owner are never loaded
+"""
+
+from __future__ import annotations
+
+import builtins
+import hashlib
+import hmac
+import inspect
+import os
+import pickle
+import tempfile
+
+import numpy as np
+import sympy
+from sympy import srepr
+
+from .codegen import namespace
+
+
+class DiskCache:
+    def __init__(self, root: str, key: str):
+        """
+        :param root: directory holding the entries of all models
+        :param key: identifier of the model
+        """
+        self.__dir = os.path.join(root, key)
+        self.__key = key
+
+    @staticmethod
+    def key(f, var_dims) -> str:
+        """
+        :param f: symbolic expression of the model
+        :param var_dims: dimensions of the variables of the model
+        :return: identifier of the model, shared by both time directions
+        """
+        content = "\n".join([srepr(f), str(list(var_dims)), sympy.__version__])
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def __path(self, name: str) -> str:
+        return os.path.join(self.__dir, name)
+
+    def __digest(self, name: str, data: bytes) -> bytes:
+        # bound to the model and the name, so an entry only loads where it was saved
+        content = b"\n".join([self.__key.encode(), name.encode(), data])
+        return hashlib.sha256(content).hexdigest().encode()
+
+    def __trusted(self) -> bool:
+        if os.name != "posix":
+            return True
+        st = os.stat(self.__dir)
+        return st.st_uid == os.getuid() and st.st_mode & 0o022 == 0
+
+    def __write(self, name: str, data: bytes):
+        # written to a temporary file first, so concurrent readers never see a part
+        os.makedirs(self.__dir, mode=0o700, exist_ok=True)
+        for n, d in ((name, data), (name + ".sha256", self.__digest(name, data))):
+            fd, tmp = tempfile.mkstemp(dir=self.__dir)
+            try:
+                with os.fdopen(fd, "wb") as file:
+                    file.write(d)
+                os.replace(tmp, self.__path(n))
+            except OSError:
+                os.unlink(tmp)
+                raise
+
+    def __read(self, name: str):
+        """
+        :return: content of the entry, None if missing, not trusted or not matching
+                 its digest
+        """
+        try:
+            if not self.__trusted():
+                return None
+            with open(self.__path(name), "rb") as file:
+                data = file.read()
+            with open(self.__path(name + ".sha256"), "rb") as file:
+                digest = file.read()
+        except OSError:
+            return None
+        if not hmac.compare_digest(digest, self.__digest(name, data)):
+            return None
+        return data
+
+    def load_sym(self, order: int, v: int):
+        """
+        :return: derivative tensor of given order w.r.t. given variable, None if missing
+        """
+        data = self.__read(str(order) + "_" + str(v) + ".pkl")
+        if data is None:
+            return None
+        try:
+            return pickle.loads(data)
+        except Exception:
+            return None  # written by an incompatible version
+
+    def save_sym(self, order: int, v: int, d: np.ndarray):
+        self.__write(str(order) + "_" + str(v) + ".pkl", pickle.dumps(d))
+
+    def load_func(
+        self, order: int, v: int, mod: str, modules, name: str = "_lambdifygenerated"
+    ):
+        """
+        :param mod: mode, tells apart evaluators generated in different ways
+        :param modules: modules the evaluator was generated for
+        :param name: name of the evaluator in the stored source
+        :return: evaluator rebuilt from the stored source, None if missing
+        """
+        entry = str(order) + "_" + str(v) + "_" + mod + ".py"
+        data = self.__read(entry)
+        if data is None:
+            return None
+        try:
+            code = compile(data.decode(), self.__path(entry), "exec")
+        except (UnicodeDecodeError, SyntaxError):
+            return None
+        scope = dict(namespace(mod, modules))
+        exec(code, scope)
+        func = scope.get(name)
+        if func is None or any(
+            n not in scope and not hasattr(builtins, n) for n in func.__code__.co_names
+        ):
+            return None  # refers to something not given by the modules, rebuild it
+        return func
+
+    def save_func(self, order: int, v: int, mod: str, func):
+        source = inspect.getsource(func)
+        self.__write(str(order) + "_" + str(v) + "_" + mod + ".py", source.encode())
@@ -0,0 +1,94 @@
+"""
+generation of the functions evaluating the derivative tensors of a model, besides the
+default lambdify, the entries of a tensor can be written to an output array one by one,
+optionally with the common subexpressions of all entries eliminated first, so each one
+is computed once. Only the non-zero entries are written, and arguments given as arrays
+of the same shape are evaluated at once, the shape is appended to the one of the tensor
+"""
+
+from __future__ import annotations
+
+import itertools
+import linecache
+
+import numpy as np
+import sympy
+from sympy import lambdify, numbered_symbols
+from sympy.printing.numpy import NumPyPrinter
+
+_namespaces = {}  # namespace of the evaluators of each mode, built once per process
+_count = itertools.count()  # for naming the generated sources
+
+
+def namespace(mod: str, modules) -> dict:
+    """
+    :param mod: name of the mode
+    :param modules: modules given to lambdify for this mode
+    :return: names the generated functions of this mode refer to
+    """
+    # lambdify fills the namespace of a module the same way for every expression
+    if mod not in _namespaces:
+        _namespaces[mod] = lambdify((), 0, modules).__globals__
+    return _namespaces[mod]
+
+
+def fill_source(args, d: np.ndarray, cse: bool = True, interval: bool = False) -> str:
+    """
+    :param args: symbols of the arguments of the generated function
+    :param d: tensor of symbolic expressions
+    :param cse: if eliminating the common subexpressions of the entries
+    :param interval: if the arguments are intervals, the bounds of the entries are
+                     written to a pair of arrays then
+    :return: source of the function computing the tensor
+    """
+    printer = NumPyPrinter(
+        {"fully_qualified_modules": False, "inline": True, "allow_unknown_functions": True}
+    )
+    idx = [i for i in np.ndindex(d.shape) if d[i] != 0]
+    replacements, reduced = [], [d[i] for i in idx]
+    if cse:
+        replacements, reduced = sympy.cse(reduced, numbered_symbols("_cse"))
+    lines = ["def _fillgenerated(" + ", ".join(str(a) for a in args) + ", out=None):"]
+    for s, e in replacements:
+        lines.append("    " + str(s) + " = " + printer.doprint(e))
+    if interval:
+        shape = str(d.shape) + " + shape(" + str(args[0]) + ".inf)"
+        lines.append("    if out is None:")
+        lines.append("        out = (zeros(" + shape + "), zeros(" + shape + "))")
+        lines.append("    else:")
+        lines.append("        out[0][...], out[1][...] = 0, 0")
+        for i, e in zip(idx, reduced):
+            lines.append("    _e = " + printer.doprint(e))
+            lines.append("    out[0][{0}], out[1][{0}] = _e.inf, _e.sup".format(i))
+    else:
+        shape = str(d.shape) + " + shape(" + str(args[0]) + ")"
+        lines.append("    if out is None:")
+        lines.append("        out = zeros(" + shape + ")")
+        lines.append("    else:")
+        lines.append("        out[...] = 0")
+        for i, e in zip(idx, reduced):
+            lines.append("    out[" + str(i) + "] = " + printer.doprint(e))
+    lines.append("    return out")
+    return "\n".join(lines) + "\n"
+
+
+def fill_function(args, d: np.ndarray, cse: bool = True, interval: bool = False):
+    """
+    :param args: symbols of the arguments of the generated function
+    :param d: tensor of symbolic expressions
+    :param cse: if eliminating the common subexpressions of the entries
+    :param interval: if the arguments are intervals
+    :return: function computing the tensor, writes to the array given as out if any
+    """
+    from pyrat.geometry import Interval
+
+    source = fill_source(args, d, cse, interval)
+    # registered like lambdify does, so the source can be inspected and cached
+    filename = "<fillgenerated-" + str(next(_count)) + ">"
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    if interval:
+        scope = dict(namespace("interval", [Interval.functional(), "numpy"]))
+    else:
+        scope = dict(namespace("numpy", "numpy"))
+    exec(compile(source, filename, "exec"), scope)
+    return scope["_fillgenerated"]
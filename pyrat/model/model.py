@@ -1,10 +1,19 @@
+from __future__ import annotations
+
 import inspect
+import os
+import threading
 from dataclasses import dataclass
 from typing import Callable
 
 import numpy as np
 from sympy import symbols, Matrix, lambdify, derive_by_array, ImmutableDenseNDimArray
 
+from pyrat.util.functional.sparse_tensor import SparseTensor
+from pyrat.util.functional.stats import timed
+from .cache import DiskCache
+from .codegen import fill_function
+
 
 @dataclass
 class Model:
@@ -12,13 +21,19 @@ class Model:
     var_dims: [int] = None
     name: str = "DYNAMIC SYSTEM"
     dim: int = None
+    codegen: str = "lambdify"  # "lambdify" or "cse" to generate numpy evaluators
     __inr_vars = None
     __inr_x = None
     __inr_idx: np.ndarray = None
     __inr_dim: int = 0
     __inr_f: Matrix = None
-    __inr_series = {}
+    __entries: dict = None  # (reversed, order, variable, kind) -> tensor or evaluator
+    __lock: threading.RLock = None  # taken when an entry is missing
     __reversed = False
+    __cache: DiskCache = None
+    # derivatives and evaluators are cached on disk under this directory, None to disable,
+    # entries are executed when loaded, so only trusted users may write to it
+    CACHE_DIR = os.environ.get("PYRAT_CACHE_DIR")
 
     def __validation(self):
         vars = inspect.getfullargspec(self.f).args
@@ -26,12 +41,12 @@ class Model:
         assert len(self.var_dims) == vars_num
         self.__inr_dim = sum(self.var_dims)
         assert type(self.__inr_dim) == int  # ensure input dimensions are integers
+        assert self.codegen in {"lambdify", "cse"}
         self.__inr_vars = symbols(
             [vars[i] + ":" + str(self.var_dims[i]) for i in range(vars_num)]
         )
         self.__inr_x = symbols("inr_x:" + str(self.__inr_dim))
         self.__inr_f = self.f(*self.__inr_vars)
-        self.__inr_f = -1 * self.__inr_f if self.__reversed else self.__inr_f
         self.dim = self.__inr_f.rows
         self.__inr_idx = np.zeros((vars_num, 2), dtype=int)
         self.__inr_idx[:, 0] = np.cumsum(self.var_dims) - self.var_dims
@@ -45,90 +60,199 @@ class Model:
                 )
             )
             self.__inr_f = self.__inr_f.subs(d)
-        self.__inr_series[0] = {
-            "sym": {v: np.asarray(self.__inr_f) for v in range(vars_num)}
-        }
+        # derivatives and evaluators are owned by each model, the ones of the reversed
+        # direction are derived from the forward ones
+        self.__entries, self.__lock = {}, threading.RLock()
+        self.__cache = None
+        if Model.CACHE_DIR is not None:
+            key = DiskCache.key(self.__inr_f, self.var_dims)
+            self.__cache = DiskCache(Model.CACHE_DIR, key)
 
     def __post_init__(self):
         self.__validation()
 
-    def __series(self, order: int, mod: str, v: int):
-        return self.__inr_series[order][mod][v]
-
-    def __take_derivative(self, order: int, v: int):
-        if (
-            order - 1 not in self.__inr_series
-            or v not in self.__inr_series[order - 1]["sym"]
-        ):
-            self.__take_derivative(order - 1, v)
-        start, end = self.__inr_idx[v]
-        x = self.__inr_x[start:end]
-        d = derive_by_array(self.__series(order - 1, "sym", v), x)
-        d = np.asarray(d)
-        self.__inr_series[order] = {"sym": {v: np.moveaxis(d, 0, -2)}}
+    def __getstate__(self):
+        # only ship the definition of the model, symbolic expressions and compiled
+        # evaluators are rebuilt lazily inside the process which receives it
+        return {
+            "f": self.f,
+            "var_dims": self.var_dims,
+            "name": self.name,
+            "codegen": self.codegen,
+            "reversed": self.__reversed,
+        }
+
+    def __setstate__(self, state):
+        self.f = state["f"]
+        self.var_dims = state["var_dims"]
+        self.name = state["name"]
+        self.codegen = state["codegen"]
+        self.__reversed = state["reversed"]
+        self.__validation()
+
+    def __entry(self, key: tuple, build: Callable):
+        # entries are never replaced once set, so readers only lock on a miss
+        try:
+            return self.__entries[key]
+        except KeyError:
+            pass
+        with self.__lock:
+            if key not in self.__entries:
+                self.__entries[key] = build()
+            return self.__entries[key]
+
+    def __derivative(self, order: int, v: int, rev: bool) -> np.ndarray:
+        def _build():
+            if rev:
+                # reversing the time only flips the sign of every derivative
+                return -self.__derivative(order, v, False)
+            if order == 0:
+                return np.asarray(self.__inr_f)
+            d = None if self.__cache is None else self.__cache.load_sym(order, v)
+            if d is None:
+                start, end = self.__inr_idx[v]
+                x = self.__inr_x[start:end]
+                d = derive_by_array(self.__derivative(order - 1, v, False), x)
+                d = np.moveaxis(np.asarray(d), 0, -2)
+                if self.__cache is not None:
+                    self.__cache.save_sym(order, v, d)
+            return d
+
+        return self.__entry((rev, order, v, "sym"), _build)
+
+    def __compile(self, order: int, kind: str, v: int, rev: bool, d, modules):
+        # evaluators of all kinds but "numpy" write the entries to output arrays
+        fill = kind != "numpy"
+        name = "_fillgenerated" if fill else "_lambdifygenerated"
+        mod = kind + "_reversed" if rev else kind
+        f = None
+        if self.__cache is not None:
+            f = self.__cache.load_func(order, v, mod, modules, name)
+        if f is None:
+            if fill:
+                cse, interval = not kind.startswith("fill"), kind.startswith("interval")
+                f = fill_function(self.__inr_x, d, cse, interval)
+            else:
+                f = lambdify(self.__inr_x, ImmutableDenseNDimArray(d), modules)
+            if self.__cache is not None:
+                self.__cache.save_func(order, v, mod, f)
+        return f
+
+    def __pattern(self, order: int, v: int) -> np.ndarray:
+        # indices of the entries not identically zero, same for both directions
+        def _build():
+            d = self.__derivative(order, v, False).squeeze(axis=-1)
+            is_zero = np.frompyfunc(lambda x: x == 0, 1, 1)
+            return np.argwhere(np.logical_not(is_zero(d).astype(dtype=bool)))
+
+        return self.__entry((False, order, v, "pattern"), _build)
+
+    def __sym(self, order: int, v: int, rev: bool, sparse: bool):
+        d = self.__derivative(order, v, rev)
+        if not sparse:
+            return d
+        # held entries stacked as a vector, the trailing axis is kept like the dense
+        return d.squeeze(axis=-1)[tuple(self.__pattern(order, v).T)][:, None]
 
     def reverse(self):
+        # derivatives and evaluators of both directions are kept side by side
         self.__reversed = not self.__reversed
-        self.__validation()
 
-    def evaluate(self, xs: tuple, mod: str, order: int, v: int):
+    def reversed(self) -> Model:
+        """
+        :return: model reversed in time, sharing the derivatives and the evaluators
+                 of both directions with this one
+        """
+        m = object.__new__(Model)
+        m.__dict__.update(self.__dict__)
+        m.__reversed = not self.__reversed
+        return m
+
+    @timed(
+        lambda self, xs, mod, order, *args, **kw: "evaluate_" + mod + "_" + str(order)
+    )
+    def evaluate(self, xs: tuple, mod: str, order: int, v: int, sparse: bool = False):
+        """
+        :param xs: value of each variable, stacked as (N, n) for a batch of points
+        :param mod: "numpy" or "interval"
+        :param order: order of the derivative
+        :param v: index of the variable the derivative is taken w.r.t.
+        :param sparse: if returning only the entries not identically zero
+        :return: derivative tensor, as SparseTensor if sparse
+        """
         assert order >= 0 and 0 <= v < len(self.__inr_vars)
-        if order not in self.__inr_series or v not in self.__inr_series[order]["sym"]:
-            self.__take_derivative(order, v)
+        rev = self.__reversed  # direction taken once, reverse() may run meanwhile
+        suffix = "_sparse" if sparse else ""
 
         def _eval_numpy():
-            if mod not in self.__inr_series[order]:
-                d = self.__series(order, "sym", v)
-                d = d if order == 0 else d.squeeze(axis=-1)
-                d = ImmutableDenseNDimArray(d)
-                self.__inr_series[order][mod] = {v: lambdify(self.__inr_x, d, "numpy")}
-            r = np.asarray(self.__series(order, mod, v)(*np.concatenate(xs)))
-            return r.squeeze(axis=-1) if order == 0 else r
+            # points stacked as (N, n) are evaluated at once by the filling evaluators
+            batched = any(np.ndim(x) > 1 for x in xs)
+            kind = "cse" if self.codegen == "cse" else "fill" if batched else "numpy"
+            kind = kind if not sparse else kind.replace("numpy", "fill") + suffix
+
+            def _build():
+                d = self.__sym(order, v, rev, sparse)
+                d = d if order == 0 and not sparse else d.squeeze(axis=-1)
+                return self.__compile(order, kind, v, rev, d, "numpy")
+
+            f = self.__entry((rev, order, v, kind), _build)
+            if batched:
+                # inputs without batch axis are shared by all points
+                num = max(x.shape[0] for x in xs if np.ndim(x) > 1)
+                xs_ = [np.broadcast_to(x, (num, np.shape(x)[-1])) for x in xs]
+                r = f(*np.hstack(xs_).T)
+                r = np.moveaxis(r, -1, 0)
+            else:
+                r = np.asarray(f(*np.concatenate(xs)))
+            return r.squeeze(axis=-1) if order == 0 and not sparse else r
 
         def _eval_interval():
             from pyrat.geometry import Interval
 
-            if mod not in self.__inr_series[order]:
-                d = self.__series(order, "sym", v)
-                ff = np.frompyfunc(lambda x: x.is_number, 1, 1)
-                xx = ff(d).astype(dtype=bool)
-                mask = xx == 0
-                if len(d[mask]) <= 0:
-                    self.__inr_series[order][mod] = {v: [None, mask]}
-                else:
-                    sym_d = ImmutableDenseNDimArray(d[mask])
-                    vf = lambdify(self.__inr_x, sym_d, Interval.functional())
-                    self.__inr_series[order][mod] = {v: [vf, mask]}
-
-            vm = self.__series(order, mod, v)
-            d = self.__series(order, "sym", v)
-            lb = np.zeros_like(d, dtype=float)
-            ub = np.zeros_like(d, dtype=float)
-            # calculate interval expressions
-            if vm[0] is not None:
-                vx = np.asarray(
-                    vm[0](
-                        *[
-                            xs[i][j]
-                            for i in range(len(self.var_dims))
-                            for j in range(self.var_dims[i])
-                        ]
-                    )
-                )
-                inff = np.frompyfunc(lambda x: x.inf, 1, 1)
-                supf = np.frompyfunc(lambda x: x.sup, 1, 1)
-                lb[vm[1]] = inff(vx)
-                ub[vm[1]] = supf(vx)
-            # set remain constant values
-            inv_mask = np.logical_not(vm[1])
-            lb[inv_mask] = d[inv_mask].astype(dtype=float)
-            ub[inv_mask] = d[inv_mask].astype(dtype=float)
+            kind = mod + suffix
+
+            def _build():
+                d = self.__sym(order, v, rev, sparse)
+                # constant entries are taken as they are, only the others are evaluated
+                is_number = np.frompyfunc(lambda x: x.is_number, 1, 1)
+                mask = np.logical_not(is_number(d).astype(dtype=bool))
+                const = np.where(mask, 0, d).astype(dtype=float)
+                vf = None
+                if np.any(mask):
+                    modules = [Interval.functional(), "numpy"]
+                    d = np.where(mask, d, 0)
+                    vf = self.__compile(order, kind, v, rev, d, modules)
+                return vf, const
+
+            vf, const = self.__entry((rev, order, v, kind), _build)
+            # points stacked as (N, n) are evaluated at once, bounds of all entries of
+            # all points are computed by one pass over the expressions
+            batched = any(len(x.shape) > 1 for x in xs)
+            num = max(x.shape[0] for x in xs if len(x.shape) > 1) if batched else 1
+            args = [
+                Interval(np.full(num, x.inf[..., j]), np.full(num, x.sup[..., j]))
+                for x in xs
+                for j in range(x.shape[-1])
+            ]
+            lb, ub = 0, 0
+            if vf is not None:
+                lb, ub = vf(*args)
+            lb, ub = lb + const[..., None], ub + const[..., None]
+            if vf is None:
+                lb, ub = np.repeat(lb, num, axis=-1), np.repeat(ub, num, axis=-1)
+            lb, ub = np.moveaxis(lb, -1, 0), np.moveaxis(ub, -1, 0)
+            if not batched:
+                lb, ub = lb[0], ub[0]
             # finally return the result as interval tensor
             return Interval(lb.squeeze(-1), ub.squeeze(-1))
 
         if mod == "numpy":
-            return _eval_numpy()
+            r = _eval_numpy()
         elif mod == "interval":
-            return _eval_interval()
+            r = _eval_interval()
         else:
             raise NotImplementedError
+        if sparse:
+            shape = self.__derivative(order, v, rev).shape[:-1]
+            return SparseTensor(self.__pattern(order, v), r, shape)
+        return r
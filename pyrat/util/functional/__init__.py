@@ -2,6 +2,7 @@ from .auxiliary import *
 from .solver import *
 from .kd_tree import *
 from .csp_solver import *
+from .sparse_tensor import SparseTensor
 
 
 __all__ = [
@@ -14,4 +15,5 @@ __all__ = [
     "knn_query",
     "rnn_query",
     "CSPSolver",
+    "SparseTensor",
 ]
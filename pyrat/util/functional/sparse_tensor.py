@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass
+class SparseTensor:
+    """
+    tensor in coordinate format, only the entries which are not identically zero are
+    held, values are stacked along the last axis, leading axes of the values are batch
+    axes, so one index pattern is shared by the tensors of all points of a batch
+    """
+
+    idx: np.ndarray  # (nnz, ndim) indices of the held entries
+    val: object  # (..., nnz) values of the held entries, numpy array or interval
+    shape: tuple  # shape of one dense tensor
+
+    @property
+    def nnz(self) -> int:
+        return self.idx.shape[0]
+
+    @property
+    def batch_shape(self) -> tuple:
+        return self.val.shape[:-1]
+
+    @staticmethod
+    def from_dense(a: np.ndarray, ndim: int = None) -> SparseTensor:
+        """
+        :param a: dense tensor, the leading axes are batch axes if ndim given
+        :param ndim: number of the trailing axes of one tensor, all axes if None
+        :return: sparse tensor holding the entries nonzero for any of the batch
+        """
+        ndim = a.ndim if ndim is None else ndim
+        shape = a.shape[a.ndim - ndim :]
+        nz = np.any(a.reshape((-1,) + shape) != 0, axis=0)
+        idx = np.argwhere(nz)
+        return SparseTensor(idx, a[(...,) + tuple(idx.T)], shape)
+
+    def todense(self):
+        """
+        :return: dense tensor of shape batch_shape + shape
+        """
+        from pyrat.geometry import Interval
+
+        def _dense(val: np.ndarray):
+            a = np.zeros(val.shape[:-1] + self.shape, dtype=float)
+            a[(...,) + tuple(self.idx.T)] = val
+            return a
+
+        if isinstance(self.val, Interval):
+            return Interval(_dense(self.val.inf), _dense(self.val.sup))
+        return _dense(self.val)
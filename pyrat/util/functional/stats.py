@@ -0,0 +1,101 @@
+"""
+instrumentation of reachability analysis, time spent in the functions decorated by
+"timed" and the state of each step are collected into the active Stats object
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import time
+from collections import Counter, defaultdict
+
+
+class Stats:
+    __active = None  # stats collecting at the moment, None if nothing to collect
+
+    def __init__(self, callback=None):
+        """
+        :param callback: called with the record of each step once the step finishes
+        """
+        self.timings = defaultdict(float)  # seconds spent in each event in total
+        self.calls = Counter()  # number of calls of each event in total
+        self.steps = []  # record of each step
+        self.callback = callback
+        self.__counters = Counter()  # counters of the current step
+        self.__last_timings = {}
+        self.__prev = None
+
+    def __enter__(self):
+        self.__prev, Stats.__active = Stats.__active, self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        Stats.__active = self.__prev
+
+    @classmethod
+    def active(cls):
+        return cls.__active
+
+    def record(self, event: str, seconds: float):
+        self.timings[event] += seconds
+        self.calls[event] += 1
+
+    def add(self, name: str, value):
+        """
+        accumulate a counter of the current step, like generator numbers
+        """
+        self.__counters[name] += value
+
+    def step(self, **record):
+        """
+        finish the record of current step, time spent in each event during the step
+        and the counters of the step are added to the given record
+        """
+        record["timings"] = {
+            k: v - self.__last_timings.get(k, 0)
+            for k, v in self.timings.items()
+            if v > self.__last_timings.get(k, 0)
+        }
+        record.update(self.__counters)
+        self.__last_timings = dict(self.timings)
+        self.__counters.clear()
+        self.steps.append(record)
+        if self.callback is not None:
+            self.callback(record)
+
+    def summary(self):
+        return {
+            "timings": dict(self.timings),
+            "calls": dict(self.calls),
+            "steps": self.steps,
+        }
+
+    def export(self, file_name: str):
+        with open(file_name, "w") as f:
+            json.dump(self.summary(), f, indent=2, default=float)
+
+
+def timed(event):
+    """
+    record the time spent in the decorated function to the active stats
+    :param event: name of the event, or a function of the arguments of the decorated
+                  function returning the name
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            stats = Stats.active()
+            if stats is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                name = event if isinstance(event, str) else event(*args, **kwargs)
+                stats.record(name, (time.perf_counter_ns() - start) * 1e-9)
+
+        return wrapper
+
+    return decorator
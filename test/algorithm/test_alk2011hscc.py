@@ -29,3 +29,110 @@ def test_case_0():
 
     # visualize the results
     plot(tp, [0, 1])
+
+
+def test_lti_pre_compute():
+    import numpy as np
+    from pyrat.geometry import Zonotope
+    from pyrat.dynamic_system import LinSys
+    from pyrat.algorithm import ALK2011HSCC
+
+    xa = np.array([[-1, -4, 0, 0, 0], [4, -1, 0, 0, 0], [0, 0, -3, 1, 0],
+                   [0, 0, -1, -3, 0], [0, 0, 0, 0, -2]], dtype=float)
+    system = LinSys(xa, ub=np.eye(5))
+
+    def options():
+        opt = ALK2011HSCC.Options()
+        opt.t_end = 1
+        opt.step = 0.02
+        opt.taylor_terms = 4
+        opt.r0 = Zonotope(np.ones(5), 0.1 * np.eye(5))
+        opt.u = Zonotope([1, 0, 0, 0.5, -0.5], 0.5 * np.diag([0.2, 0.5, 0.2, 0.5, 0.5]))
+        opt.u_trans = np.zeros(5)
+        return opt
+
+    ALK2011HSCC.clear_cache()
+    ti, tp, ti_time, _ = ALK2011HSCC.reach(system, options())
+
+    # streaming the steps gives the same sets as collecting them
+    for step_idx, time_interval, r_ti, r_tp in ALK2011HSCC.reach_iter(system, options()):
+        assert np.allclose(time_interval, ti_time[step_idx - 1])
+        assert np.allclose(r_tp.c, tp[step_idx].c) and np.allclose(r_tp.gen, tp[step_idx].gen)
+
+    # recompute every step from scratch and compare with the precomputed propagation
+    opt = options()
+    assert opt.validation(system.dim)
+    r = opt.r0
+    for i in range(1, len(tp)):
+        ALK2011HSCC.clear_cache()
+        r_ti, r = ALK2011HSCC.reach_one_step(system, r, opt)
+        assert np.allclose(r_ti.c, ti[i - 1].c) and np.allclose(r_ti.gen, ti[i - 1].gen)
+        assert np.allclose(r.c, tp[i].c) and np.allclose(r.gen, tp[i].gen)
+
+
+def test_pre_compute_reused(monkeypatch):
+    import numpy as np
+    from pyrat.geometry import Zonotope
+    from pyrat.dynamic_system import LinSys
+    from pyrat.algorithm import ALK2011HSCC
+
+    system = LinSys(np.array([[-1, -4], [4, -1]], dtype=float), ub=np.eye(2))
+    computed = []
+    exponential = ALK2011HSCC.exponential
+    monkeypatch.setattr(
+        ALK2011HSCC,
+        "exponential",
+        lambda sys, opt: computed.append(1) or exponential(sys, opt),
+    )
+
+    def options():
+        opt = ALK2011HSCC.Options()
+        opt.t_end = 0.2
+        opt.step = 0.02
+        opt.r0 = Zonotope(np.ones(2), 0.1 * np.eye(2))
+        opt.u = Zonotope(np.zeros(2), 0.1 * np.eye(2))
+        opt.u_trans = np.zeros(2)
+        return opt
+
+    # terms of a time invariant system are reused by the runs after the first one
+    ALK2011HSCC.clear_cache()
+    ALK2011HSCC.reach(system, options())
+    ALK2011HSCC.reach(system, options())
+    assert len(computed) == 1
+
+    # one step of an arbitrary system, as linearized by the nonlinear algorithms,
+    # is never cached
+    opt = options()
+    assert opt.validation(system.dim)
+    ALK2011HSCC.reach_one_step(system, opt.r0, opt)
+    ALK2011HSCC.reach_one_step(system, opt.r0, opt)
+    assert len(computed) == 3
+
+
+def test_reach_iter_sinks(tmp_path):
+    import numpy as np
+    from pyrat.geometry import Zonotope
+    from pyrat.dynamic_system import LinSys
+    from pyrat.algorithm import ALK2011HSCC, sinks
+
+    system = LinSys(np.array([[-1, -4], [4, -1]], dtype=float), ub=np.eye(2))
+    opt = ALK2011HSCC.Options()
+    opt.t_end = 1
+    opt.step = 0.01
+    opt.r0 = Zonotope(np.ones(2), 0.1 * np.eye(2))
+    opt.u = Zonotope(np.zeros(2), 0.05 * np.eye(2))
+    opt.u_trans = np.zeros(2)
+
+    _, tp, _, _ = ALK2011HSCC.reach(system, opt)
+    opt.step_idx = 0
+
+    ss = [sinks.every(10), sinks.save(tmp_path)]
+    for step_idx, _, r_ti, r_tp in ALK2011HSCC.reach_iter(system, opt, ss):
+        assert r_ti is None and r_tp is None
+
+    saved = list(tmp_path.iterdir())
+    assert len(saved) == (len(tp) - 1) // 10
+    for f in saved:
+        data = np.load(f)
+        r = tp[int(f.stem.split("_")[-1])]
+        assert np.allclose(data["tp_c_0"], r.c) and np.allclose(data["tp_gen_0"], r.gen)
@@ -59,6 +59,31 @@ def test_van_der_pol_using_zonotope():
     plot(tp, [0, 1])
 
 
+def test_van_der_pol_split():
+    # init dynamic system
+    system = NonLinSys(Model(vanderpol, [2, 1]))
+
+    # settings for the computation, small max_err forces splitting the sets
+    options = ALTHOFF2013HSCC.Options()
+    options.t_end = 0.1
+    options.step = 0.005
+    options.taylor_terms = 4
+    options.tensor_order = 3
+    options.r0 = [Zonotope([1.4, 2.4], np.diag([0.17, 0.06]))]
+    options.u = Zonotope.zero(1, 1)
+    options.u_trans = np.zeros(1)
+    options.max_err = np.array([0.02, 0.02])
+
+    # settings for using Zonotope
+    Zonotope.ORDER = 50
+    Zonotope.INTERMEDIATE_ORDER = 50
+    Zonotope.ERROR_ORDER = 20
+
+    # reachable sets
+    ti, tp, _, _ = ALTHOFF2013HSCC.reach(system, options)
+    assert len(tp[-1]) > 1
+
+
 def test_van_der_pol_using_polyzonotope():
     # init dynamic system
     system = NonLinSys(Model(vanderpol, [2, 1]))
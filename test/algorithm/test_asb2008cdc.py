@@ -1,6 +1,9 @@
+import copy
+
 import numpy as np
+import pytest
 
-from pyrat.algorithm import ASB2008CDC
+from pyrat.algorithm import ASB2008CDC, ReachResult, batch
 from pyrat.dynamic_system import NonLinSys
 from pyrat.geometry import Zonotope, Interval, Geometry
 from pyrat.model import *
@@ -33,7 +36,7 @@ def test_van_der_pol():
     plot(tp, [0, 1])
 
 
-def test_van_der_pol_comp():
+def test_van_der_pol_comp(tmp_path):
     # init dynamic system
     system = NonLinSys(Model(vanderpol, [2, 1]))
 
@@ -105,7 +108,7 @@ def test_van_der_pol_comp():
     ax.set_ylabel("x" + str(dims[1]))
 
     # plt.show()
-    plt.savefig("asb_cmp.svg", dpi=300, transparent=True)
+    plt.savefig(tmp_path / "asb_cmp.svg", dpi=300, transparent=True)
 
 
 def test_tank6eq():
@@ -162,3 +165,494 @@ def test_laub_loomis():
     plot(tp, [5, 6])
     plot(tp, [1, 5])
     plot(tp, [4, 6])
+
+
+def test_van_der_pol_parallel():
+    from pyrat.geometry.operation import boundary
+
+    # init dynamic system
+    system = NonLinSys(Model(vanderpol, [2, 1]))
+
+    # settings for the computation
+    options = ASB2008CDC.Options()
+    options.t_end = 0.1
+    options.step = 0.005
+    options.tensor_order = 3
+    options.taylor_terms = 4
+    box = Interval([1.23, 2.34], [1.57, 2.46])
+    options.r0 = boundary(box, 0.1, Geometry.TYPE.ZONOTOPE)
+    options.u = Zonotope.zero(1, 1)
+    options.u_trans = np.zeros(1)
+
+    # settings for the using geometry
+    Zonotope.REDUCE_METHOD = Zonotope.REDUCE_METHOD.GIRARD
+    Zonotope.ORDER = 50
+
+    # reachable sets computation, serial and in parallel
+    _, tp0, _, _ = ASB2008CDC.reach(system, options)
+    options.workers = 4
+    _, tp1, _, _ = ASB2008CDC.reach(system, options)
+
+    assert len(tp0[-1]) == len(tp1[-1])
+    for z0, z1 in zip(tp0[-1], tp1[-1]):
+        assert np.allclose(z0.c, z1.c) and np.allclose(z0.gen, z1.gen)
+
+
+def test_van_der_pol_batch():
+    from pyrat.geometry.operation import boundary
+
+    # init dynamic system
+    system = NonLinSys(Model(vanderpol, [2, 1]))
+
+    # settings for the computation
+    options = ASB2008CDC.Options()
+    options.t_end = 0.1
+    options.step = 0.005
+    options.tensor_order = 3
+    options.taylor_terms = 4
+    box = Interval([1.23, 2.34], [1.57, 2.46])
+    options.r0 = boundary(box, 0.1, Geometry.TYPE.ZONOTOPE)
+    options.u = Zonotope.zero(1, 1)
+    options.u_trans = np.zeros(1)
+
+    # settings for the using geometry
+    Zonotope.REDUCE_METHOD = Zonotope.REDUCE_METHOD.GIRARD
+    Zonotope.ORDER = 50
+
+    # reachable sets computation, set by set and in lock-step as one batch
+    _, tp0, _, _ = ASB2008CDC.reach(system, options)
+    options.batch = True
+    _, tp1, _, _ = ASB2008CDC.reach(system, options)
+
+    assert len(tp0[-1]) == len(tp1[-1])
+    for z0, z1 in zip(tp0[-1], tp1[-1]):
+        assert np.allclose(z0.c, z1.c)
+        assert np.allclose(abs(z0.gen).sum(axis=1), abs(z1.gen).sum(axis=1))
+
+
+def test_van_der_pol_resume(tmp_path):
+    from pyrat.algorithm.checkpoint import Checkpoint
+
+    # init dynamic system
+    system = NonLinSys(Model(vanderpol, [2, 1]))
+
+    # settings for the computation
+    def options():
+        opt = ASB2008CDC.Options()
+        opt.t_end = 0.1
+        opt.step = 0.005
+        opt.tensor_order = 3
+        opt.taylor_terms = 4
+        opt.r0 = [Zonotope([1.4, 2.4], np.diag([0.17, 0.06]))]
+        opt.u = Zonotope.zero(1, 1)
+        opt.u_trans = np.zeros(1)
+        return opt
+
+    # settings for the using geometry
+    Zonotope.REDUCE_METHOD = Zonotope.REDUCE_METHOD.GIRARD
+    Zonotope.ORDER = 50
+
+    _, tp0, _, tp_time0 = ASB2008CDC.reach(system, options())
+
+    # stop the computation halfway, as if the process died
+    opt = options()
+    opt.checkpoint_dir = str(tmp_path)
+    opt.checkpoint_interval = 4
+    for step_idx, _, _, _ in ASB2008CDC.reach_iter(system, opt):
+        if step_idx >= 13:
+            break
+    assert len(Checkpoint.list(str(tmp_path))) == opt.checkpoint_keep
+
+    _, tp1, _, tp_time1 = ASB2008CDC.resume(system, str(tmp_path))
+    assert np.allclose(tp_time0[-len(tp_time1):], tp_time1)
+    z0, z1 = tp0[-1][0], tp1[-1][0]
+    assert np.allclose(z0.c, z1.c) and np.allclose(z0.gen, z1.gen)
+
+
+def test_van_der_pol_adaptive():
+    # init dynamic system
+    system = NonLinSys(Model(vanderpol, [2, 1]))
+
+    # settings for the computation
+    options = ASB2008CDC.Options()
+    options.t_end = 0.5
+    options.step = 0.005
+    options.tensor_order = 3
+    options.taylor_terms = 4
+    options.r0 = [Zonotope([1.4, 2.4], np.diag([0.17, 0.06]))]
+    options.u = Zonotope.zero(1, 1)
+    options.u_trans = np.zeros(1)
+    options.adaptive = True
+    options.step_max = 0.04
+    options.max_err = np.full(2, 0.5)
+
+    # settings for the using geometry
+    Zonotope.REDUCE_METHOD = Zonotope.REDUCE_METHOD.GIRARD
+    Zonotope.ORDER = 50
+
+    ti, tp, ti_time, tp_time = ASB2008CDC.reach(system, options)
+
+    # time intervals are contiguous and cover the whole time horizon
+    assert np.allclose(ti_time[1:, 0], ti_time[:-1, 1])
+    assert np.isclose(ti_time[0, 0], 0) and np.isclose(ti_time[-1, 1], 0.5)
+    assert np.allclose(tp_time[1:], ti_time[:, 1])
+    # the step size grows while the linearization error stays small
+    assert len(ti) < 0.5 / 0.005
+    assert np.max(np.diff(ti_time, axis=1)) <= 0.04 + 1e-12
+
+    # the step size shrinks once the error gets close to a tighter max_err
+    options = copy.deepcopy(options)
+    options.step, options.step_idx = 0.04, 0
+    options.step_min, options.step_max = None, None
+    options.max_err = np.full(2, 0.1)
+    ti, tp, ti_time, tp_time = ASB2008CDC.reach(system, options)
+    steps = np.diff(ti_time, axis=1).ravel()
+    assert steps[0] == 0.04 and np.min(steps[:-1]) < 0.04
+
+    # unbounded error would let the step size grow regardless of the error
+    options.max_err = None
+    with pytest.raises(AssertionError):
+        options.validation(system.dim)
+
+
+def test_van_der_pol_split():
+    # init dynamic system
+    system = NonLinSys(Model(vanderpol, [2, 1]))
+
+    # settings for the computation
+    def options():
+        opt = ASB2008CDC.Options()
+        opt.t_end = 0.05
+        opt.step = 0.005
+        opt.tensor_order = 3
+        opt.taylor_terms = 4
+        opt.r0 = [Zonotope([1.4, 2.4], np.diag([0.17, 0.06]))]
+        opt.u = Zonotope.zero(1, 1)
+        opt.u_trans = np.zeros(1)
+        opt.max_err = np.array([0.02, 0.02])
+        return opt
+
+    # settings for the using geometry
+    Zonotope.REDUCE_METHOD = Zonotope.REDUCE_METHOD.GIRARD
+    Zonotope.ORDER = 50
+
+    # sets are split once the linearization error exceeds the maximum allowed
+    _, tp0, _, _ = ASB2008CDC.reach(system, options())
+    assert len(tp0[-1]) > 1
+
+    opt = options()
+    opt.workers = 2
+    _, tp1, _, _ = ASB2008CDC.reach(system, opt)
+    opt = options()
+    opt.batch = True
+    _, tp2, _, _ = ASB2008CDC.reach(system, opt)
+
+    assert len(tp0[-1]) == len(tp1[-1]) == len(tp2[-1])
+    for z0, z1, z2 in zip(tp0[-1], tp1[-1], tp2[-1]):
+        assert np.allclose(z0.c, z1.c) and np.allclose(z0.gen, z1.gen)
+        assert np.allclose(z0.c, z2.c)
+
+
+def test_van_der_pol_warm_start():
+    # init dynamic system
+    system = NonLinSys(Model(vanderpol, [2, 1]))
+
+    # settings for the computation
+    def options(warm_start):
+        opt = ASB2008CDC.Options()
+        opt.t_end = 0.1
+        opt.step = 0.005
+        opt.tensor_order = 3
+        opt.taylor_terms = 4
+        opt.r0 = [Zonotope([1.4, 2.4], np.diag([0.17, 0.06]))]
+        opt.u = Zonotope.zero(1, 1)
+        opt.u_trans = np.zeros(1)
+        opt.warm_start = warm_start
+        return opt
+
+    # settings for the using geometry
+    Zonotope.REDUCE_METHOD = Zonotope.REDUCE_METHOD.GIRARD
+    Zonotope.ORDER = 50
+
+    opt0, opt1 = options(False), options(True)
+    _, tp0, _, _ = ASB2008CDC.reach(system, opt0)
+    _, tp1, _, _ = ASB2008CDC.reach(system, opt1)
+
+    # same number of sets bounded, but in fewer iterations
+    assert sum(opt0.iter_hist.values()) == sum(opt1.iter_hist.values())
+    iters0 = sum(k * v for k, v in opt0.iter_hist.items())
+    iters1 = sum(k * v for k, v in opt1.iter_hist.items())
+    assert iters1 < iters0
+    assert np.allclose(tp0[-1][0].c, tp1[-1][0].c, atol=1e-3)
+
+
+def test_van_der_pol_prune():
+    # init dynamic system
+    system = NonLinSys(Model(vanderpol, [2, 1]))
+
+    # settings for the computation
+    options = ASB2008CDC.Options()
+    options.t_end = 0.05
+    options.step = 0.005
+    options.tensor_order = 3
+    options.taylor_terms = 4
+    z = Zonotope([1.4, 2.4], np.diag([0.17, 0.06]))
+    options.r0 = [Zonotope(z.c, 0.1 * z.gen), z, Zonotope(z.c + [0.05, 0], 0.5 * z.gen)]
+    options.u = Zonotope.zero(1, 1)
+    options.u_trans = np.zeros(1)
+    options.prune = True
+
+    # settings for the using geometry
+    Zonotope.REDUCE_METHOD = Zonotope.REDUCE_METHOD.GIRARD
+    Zonotope.ORDER = 50
+
+    _, tp, _, _ = ASB2008CDC.reach(system, options)
+
+    # only the set containing the others is kept
+    assert len(tp[1]) == len(tp[-1]) == 1
+    assert ASB2008CDC.prune([z, z, z], options).tolist() == [2]
+
+
+def test_van_der_pol_stats(tmp_path):
+    import json
+    from pyrat.util.functional.stats import Stats
+
+    # init dynamic system
+    system = NonLinSys(Model(vanderpol, [2, 1]))
+
+    # settings for the computation
+    options = ASB2008CDC.Options()
+    options.t_end = 0.05
+    options.step = 0.005
+    options.tensor_order = 3
+    options.taylor_terms = 4
+    options.r0 = [Zonotope([1.4, 2.4], np.diag([0.17, 0.06]))]
+    options.u = Zonotope.zero(1, 1)
+    options.u_trans = np.zeros(1)
+    records = []
+    options.stats = Stats(callback=records.append)
+
+    # settings for the using geometry
+    Zonotope.REDUCE_METHOD = Zonotope.REDUCE_METHOD.GIRARD
+    Zonotope.ORDER = 50
+
+    ti, _, _, _ = ASB2008CDC.reach(system, options)
+
+    stats = options.stats
+    assert Stats.active() is None
+    assert len(records) == len(stats.steps) == len(ti)
+    for event in ["reach_one_step", "linearize", "abstract_err", "reduce", "quad_map"]:
+        assert stats.calls[event] > 0
+    assert stats.calls["evaluate_interval_3"] == 2 * stats.calls["abstract_err"]
+    assert all(r["sets"] == 1 and r["iterations"] >= 1 for r in records)
+    assert all(r["gens_before_reduce"] >= r["gens_after_reduce"] for r in records)
+
+    stats.export(tmp_path / "stats.json")
+    with open(tmp_path / "stats.json") as f:
+        assert len(json.load(f)["steps"]) == len(ti)
+
+
+def test_van_der_pol_reach_result():
+    # init dynamic system
+    system = NonLinSys(Model(vanderpol, [2, 1]))
+
+    # settings for the computation
+    def options():
+        opt = ASB2008CDC.Options()
+        opt.t_end = 0.05
+        opt.step = 0.005
+        opt.tensor_order = 3
+        opt.taylor_terms = 4
+        opt.r0 = [Zonotope([1.4, 2.4], np.diag([0.17, 0.06]))]
+        opt.u = Zonotope.zero(1, 1)
+        opt.u_trans = np.zeros(1)
+        opt.max_err = np.array([0.02, 0.02])
+        return opt
+
+    # settings for the using geometry
+    Zonotope.REDUCE_METHOD = Zonotope.REDUCE_METHOD.GIRARD
+    Zonotope.ORDER = 50
+
+    ti0, tp0, ti_time, tp_time = ASB2008CDC.reach(system, options())
+    opt = options()
+    ti1, tp1 = ReachResult.collect(
+        ASB2008CDC.reach_iter(system, opt), opt.r0, opt.t_start
+    )
+
+    assert len(ti1) == len(ti0) and len(tp1) == len(tp0)
+    assert ti1.set_num == sum(len(s) for s in ti0)
+    assert np.allclose(ti1.time, ti_time) and np.allclose(tp1.time, tp_time)
+    # sets are restored exactly
+    for sets0, sets1 in zip(tp0, tp1.to_zonotopes()):
+        assert len(sets0) == len(sets1)
+        for z0, z1 in zip(sets0, sets1):
+            assert np.allclose(z0.c, z1.c) and np.allclose(z0.gen, z1.gen)
+
+    # interval hulls of one step and of all steps
+    ih = tp1.interval_hull(len(tp1) - 1)
+    assert ih.inf.shape == (len(tp0[-1]), 2)
+    for i, z in enumerate(tp0[-1]):
+        rad = abs(z.gen).sum(axis=-1)
+        assert np.allclose(ih.inf[i], z.c - rad) and np.allclose(ih.sup[i], z.c + rad)
+    ih = ti1.interval_hull()
+    assert ih.inf.shape == (ti1.set_num, 2)
+    assert np.all(np.diff(ti1.step_idx()) >= 0)
+
+    # projection keeps the layout of the steps
+    p = ti1.proj([1])
+    assert p.dim == 1 and np.array_equal(p.offsets, ti1.offsets)
+    assert np.allclose(p.interval_hull().inf[:, 0], ih.inf[:, 1])
+    z = ti0[3][0].proj([1])
+    assert np.allclose(p[3].zonotopes()[0].c, z.c)
+
+    # dropped steps hold no sets
+    r = ReachResult(2, capacity=1)
+    r.append(None, 0)
+    r.append(tp0[-1], 1)
+    r.append(tp0[-1][0], 2)
+    assert r.set_num == len(tp0[-1]) + 1
+    assert [len(s) for s in r.to_zonotopes()] == [0, len(tp0[-1]), 1]
+
+
+def test_van_der_pol_sweep():
+    # init dynamic system
+    system = NonLinSys(Model(vanderpol, [2, 1]))
+
+    # settings for the computation
+    options = ASB2008CDC.Options()
+    options.t_end = 0.02
+    options.tensor_order = 3
+    options.taylor_terms = 4
+    options.u = Zonotope.zero(1, 1)
+    options.u_trans = np.zeros(1)
+
+    # settings for the using geometry
+    Zonotope.REDUCE_METHOD = Zonotope.REDUCE_METHOD.GIRARD
+    Zonotope.ORDER = 50
+
+    r0 = [
+        [Zonotope([1.4, 2.4], np.diag([0.17, 0.06]))],
+        [Zonotope([1.2, 2.0], np.diag([0.05, 0.05]))],
+    ]
+    opts = batch.variants(options, r0=r0, step=[0.005, 0.01])
+    assert len(opts) == 4 and opts[1].step == 0.01 and opts[2].r0 is r0[1]
+    # invalid options only fail their own job
+    opts[2].tensor_order = 5
+
+    for workers in [1, 2]:
+        jobs = sorted(batch.run(system, opts, workers), key=lambda j: j.idx)
+        assert [j.idx for j in jobs] == [0, 1, 2, 3]
+        assert not jobs[2].ok and isinstance(jobs[2].error, AssertionError)
+        assert "tensor_order" in jobs[2].trace
+        for job in jobs[:2] + jobs[3:]:
+            assert job.ok and job.duration > 0
+            _, tp, _, tp_time = job.result
+            assert np.isclose(tp_time[-1], options.t_end)
+            assert job.opt.step_idx == len(tp) - 1
+
+    _, tp, _, _ = ASB2008CDC.reach(system, batch.variants(options, r0=r0, step=[0.005])[0])
+    assert np.allclose(jobs[0].result[1][-1][0].c, tp[-1][0].c)
+
+
+def test_van_der_pol_distributed():
+    # init dynamic system
+    system = NonLinSys(Model(vanderpol, [2, 1]))
+
+    # settings for the computation
+    def options():
+        opt = ASB2008CDC.Options()
+        opt.t_end = 0.05
+        opt.step = 0.005
+        opt.tensor_order = 3
+        opt.taylor_terms = 4
+        opt.r0 = [Zonotope([1.4, 2.4], np.diag([0.17, 0.06]))]
+        opt.u = Zonotope.zero(1, 1)
+        opt.u_trans = np.zeros(1)
+        opt.max_err = np.array([0.02, 0.02])
+        return opt
+
+    # settings for the using geometry
+    Zonotope.REDUCE_METHOD = Zonotope.REDUCE_METHOD.GIRARD
+    Zonotope.ORDER = 50
+
+    _, tp0, _, _ = ASB2008CDC.reach(system, options())
+    opt = options()
+    opt.workers = 2
+    opt.address = ("127.0.0.1", 0)
+    _, tp1, _, _ = ASB2008CDC.reach(system, opt)
+
+    assert len(tp0[-1]) == len(tp1[-1])
+    for z0, z1 in zip(tp0[-1], tp1[-1]):
+        assert np.allclose(z0.c, z1.c) and np.allclose(z0.gen, z1.gen)
+
+
+def test_coordinator():
+    import threading
+    from multiprocessing import AuthenticationError
+    from multiprocessing.connection import Client
+    from pyrat.algorithm.asb2008cdc import _init_worker
+    from pyrat.algorithm.distributed import Coordinator, _decode, recv, serve
+
+    z = Zonotope([1.0, 2.0], np.diag([0.5, 0.1]))
+    with Coordinator(None, _init_worker, steal_after=0.2) as coordinator:
+        address, key = coordinator.address, coordinator.authkey
+        # peers not knowing the key are turned away before any frame
+        with pytest.raises(AuthenticationError):
+            Client(address, authkey=b"wrong key")
+        # a worker dying with a task in hand, the task is given to the next worker
+        f = coordinator.submit(Zonotope.split, z, 0)
+        conn = Client(address, authkey=key)
+        assert recv(conn)[0] == "init" and recv(conn)[0] == "task"
+        conn.close()
+        # a worker holding its task for long, the task is stolen by an idle worker
+        stuck = Client(address, authkey=key)
+        assert recv(stuck)[0] == "init" and recv(stuck)[0] == "task"
+        worker = threading.Thread(target=serve, args=(address, key))
+        worker.start()
+        lhs, rhs = f.result(timeout=30)
+        assert np.allclose(lhs.c, [0.75, 2.0]) and np.allclose(rhs.c, [1.25, 2.0])
+        # errors of a task are raised by its future, the worker keeps serving
+        f = coordinator.submit(Zonotope.split, z, 5)
+        assert isinstance(f.exception(timeout=30), IndexError)
+        f = coordinator.submit(Zonotope.proj, z, [1])
+        assert np.allclose(f.result(timeout=30).c, [2.0])
+        stuck.close()
+    worker.join()
+
+    # only callables defined by pyrat are resolved
+    for name in ["os:system", "pyrat.algorithm.distributed:pickle.loads"]:
+        with pytest.raises(ValueError):
+            _decode({"f": name}, [])
+
+
+def test_laub_loomis_sparse():
+    # init dynamic system
+    system = NonLinSys(Model(laubloomis, [7, 1]))
+
+    # settings for the computation
+    options = ASB2008CDC.Options()
+    options.t_end = 1
+    options.step = 0.04
+    options.tensor_order = 3
+    options.taylor_terms = 4
+    options.r0 = [Zonotope([1.2, 1.05, 1.5, 2.4, 1, 0.1, 0.45], np.eye(7) * 0.01)]
+    options.u = Zonotope.zero(1, 1)
+    options.u_trans = np.zeros(1)
+    options.batch = True
+
+    # settings for using geometry
+    Zonotope.REDUCE_METHOD = Zonotope.METHOD.REDUCE.GIRARD
+    Zonotope.ORDER = 50
+
+    # dense and sparse derivative tensors bound the same errors
+    _, tp0, _, _ = ASB2008CDC.reach(system, copy.deepcopy(options))
+    options.sparse = True
+    _, tp1, _, _ = ASB2008CDC.reach(system, copy.deepcopy(options))
+    for z0, z1 in zip(tp0[-1], tp1[-1]):
+        assert np.allclose(z0.c, z1.c)
+        assert np.allclose(abs(z0.gen).sum(axis=1), abs(z1.gen).sum(axis=1))
+
+    # set by set with sparse tensors
+    options.batch = False
+    _, tp2, _, _ = ASB2008CDC.reach(system, options)
+    assert np.allclose(tp2[-1][0].c, tp1[-1][0].c, atol=1e-3)
@@ -0,0 +1,76 @@
+import numpy as np
+from scipy.linalg import expm
+
+from pyrat.algorithm import HSCC2005
+from pyrat.dynamic_system import LinSys
+from pyrat.geometry import Zonotope
+
+
+def test_hscc2005():
+    xa = np.array([[-1, -4, 0, 0, 0], [4, -1, 0, 0, 0], [0, 0, -3, 1, 0],
+                   [0, 0, -1, -3, 0], [0, 0, 0, 0, -2]], dtype=float)
+    system = LinSys(xa, ub=np.eye(5))
+
+    opt = HSCC2005.Options()
+    opt.t_end = 1
+    opt.step = 0.02
+    opt.r0 = Zonotope(np.ones(5), 0.1 * np.eye(5))
+    opt.u = Zonotope([1, 0, 0, 0.5, -0.5], 0.5 * np.diag([0.2, 0.5, 0.2, 0.5, 0.5]))
+    opt.u_trans = np.zeros(5)
+    ti, tp, ti_time, tp_time = HSCC2005.reach(system, opt)
+    assert len(ti) == len(tp) - 1 == opt.steps_num - 1
+
+    # trajectories under constant inputs stay inside the interval hulls
+    rng = np.random.default_rng(0)
+    x0 = opt.r0.c + (opt.r0.gen @ rng.uniform(-1, 1, (5, 20))).T
+    u = opt.u.c + (opt.u.gen @ rng.uniform(-1, 1, (5, 20))).T
+    inv = np.linalg.inv(xa)
+    for k, (r_ti, r_tp) in enumerate(zip(ti, tp[1:])):
+        for t in np.linspace(*ti_time[k], 5):
+            e = expm(xa * t)
+            x = x0 @ e.T + u @ (inv @ (e - np.eye(5))).T
+            rad = abs(r_ti.gen).sum(axis=1)
+            assert np.all(abs(x - r_ti.c) <= rad + 1e-9)
+        rad = abs(r_tp.gen).sum(axis=1)
+        assert np.all(abs(x - r_tp.c) <= rad + 1e-9)
+
+    # center follows the trajectory from the centers of the initial and input sets
+    e = expm(xa * tp_time[-1])
+    x = e @ opt.r0.c + inv @ (e - np.eye(5)) @ opt.u.c
+    assert np.allclose(tp[-1].c, x, atol=5e-2)
+
+    # generators stay bounded over long horizons of large systems
+    dim = 100
+    xa = -np.eye(dim) + np.diag(np.ones(dim - 1), 1) - np.diag(np.ones(dim - 1), -1)
+    opt = HSCC2005.Options()
+    opt.t_end = 20
+    opt.step = 0.01
+    opt.r0 = Zonotope(np.ones(dim), 0.1 * np.eye(dim))
+    opt.u = Zonotope(np.zeros(dim), 0.01 * np.eye(dim))
+    gen_num = 0
+    for _, _, r_ti, r_tp in HSCC2005.reach_iter(LinSys(xa), opt):
+        gen_num = max(gen_num, r_ti.gen_num, r_tp.gen_num)
+    assert opt.step_idx == opt.steps_num - 1
+    assert gen_num <= opt.omega.gen_num + dim * opt.input_order + 2 * dim
+    # sets are built on access only, as announced by their number of generators
+    assert r_tp.gen_num == r_tp.gen.shape[1] and r_ti.gen_num == r_ti.gen.shape[1]
+
+
+def test_hscc2005_high_order_input():
+    xa = np.array([[-1, -4], [4, -1]], dtype=float)
+    opt = HSCC2005.Options()
+    opt.t_end = 1
+    opt.step = 0.01
+    opt.r0 = Zonotope(np.ones(2), 0.1 * np.eye(2))
+    # more generators per step than the buffer of input_order * dim holds
+    gen = np.random.default_rng(0).uniform(-0.01, 0.01, (2, 39))
+    opt.u = Zonotope(np.zeros(2), gen)
+    ti, tp, _, _ = HSCC2005.reach(LinSys(xa), opt)
+    assert len(tp) == opt.steps_num
+
+    # centered inputs leave the center on the trajectory of the initial center, and
+    # the sets still enclose the homogeneous solution
+    e = expm(xa * opt.step * (len(tp) - 1))
+    assert np.allclose(tp[-1].c, e @ opt.r0.c, atol=1e-6)
+    rad = abs(tp[-1].gen).sum(axis=1)
+    assert np.all(rad >= abs(e @ opt.r0.gen).sum(axis=1) - 1e-9)
@@ -1,11 +1,14 @@
+import multiprocessing
 from typing import Callable
 
 import matplotlib.pyplot as plt
 import numpy as np
+import pytest
 from matplotlib.patches import Polygon, Circle
 
 from pyrat.algorithm import SCS2022
 from pyrat.geometry import Zonotope
+from pyrat.util.functional import kdtree
 from .value_function import vx0
 
 
@@ -97,3 +100,45 @@ def test_computer_based_model():
     tj, rs = SCS2022.run(f, options)
     tj = np.vstack(tj)
     vis(tj, rs, [0, 1])
+
+
+@pytest.mark.parametrize("can_fork", [True, False])
+def test_concurrent_safe_control(monkeypatch, can_fork):
+    if not can_fork:
+        # the ps are checked one by one where the workers cannot be forked
+        monkeypatch.setattr(multiprocessing, "get_all_start_methods", lambda: ["spawn"])
+    def f(x, px: Callable[[np.ndarray], float]):
+        return [-0.5 * x[0] - 0.5 * x[1] + 0.5 * x[0] * x[1], -0.5 * x[1] + 1 + px(x)]
+
+    options = SCS2022.Options()
+    options.x0 = np.array([0.2, -0.9])
+    options.step = 0.01
+    options.dim = 2
+    options.target = lambda x: 10 * x[0] ** 2 + 10 * (x[1] - 0.6) ** 2 - 1
+    options.vx = lambda x: vx0(x[0], x[1])
+    options.p = lambda x, params: params[0]
+    options.n = 1
+    options.low = -1
+    options.up = 1
+    options.workers = 2
+
+    np.random.seed(0)
+    tj, rs = SCS2022.run(f, options)
+    # every step got a valid p and the target is hit
+    assert not options.invalid_p
+    assert len(rs) == len(tj) - 1
+    assert options.target(tj[-1]) <= 0
+
+
+def test_distance():
+    options = SCS2022.Options()
+    options.x0 = np.array([0.2, -0.9])
+    options.target = lambda x: 10 * x[0] ** 2 + 10 * (x[1] - 0.6) ** 2 - 1
+    options.boundary_tol = 0.01
+    options.boundary = kdtree(SCS2022.target_boundary(options))
+
+    pts = np.random.rand(100, 2) * 4 - 2
+    dists = SCS2022.distance(pts, options)
+    # target region is bounded by a circle, so distance can get exactly as
+    exact = np.linalg.norm(pts - np.array([0, 0.6]), axis=1) - np.sqrt(0.1)
+    assert np.allclose(dists, np.maximum(exact, 0), atol=2e-2)
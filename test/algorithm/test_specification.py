@@ -0,0 +1,77 @@
+import numpy as np
+
+from pyrat.algorithm import ALK2011HSCC, ASB2008CDC, Specification
+from pyrat.dynamic_system import LinSys, NonLinSys
+from pyrat.geometry import Interval, Zonotope
+from pyrat.model import Model, vanderpol
+
+
+def test_linear():
+    system = LinSys(np.array([[-1, -4], [4, -1]], dtype=float), ub=np.eye(2))
+
+    def options(*specs):
+        opt = ALK2011HSCC.Options()
+        opt.t_end = 3
+        opt.step = 0.01
+        opt.r0 = Zonotope(np.ones(2), 0.1 * np.eye(2))
+        opt.u = Zonotope(np.zeros(2), 0.05 * np.eye(2))
+        opt.u_trans = np.zeros(2)
+        opt.specs = list(specs)
+        return opt
+
+    # never close to the unsafe set, all steps are computed
+    opt = options(Specification(Interval([3, 3], [4, 4]), Specification.TYPE.UNSAFE))
+    ti_all, _, _, _ = ALK2011HSCC.reach(system, opt)
+    assert opt.spec_report.verdict == Specification.VERDICT.SATISFIED
+    assert len(ti_all) == opt.steps_num - 1
+
+    # sets converge into the unsafe set around the origin
+    opt = options(Specification(Interval([-0.3, -0.3], [0.3, 0.3]), Specification.TYPE.UNSAFE))
+    ti, _, _, _ = ALK2011HSCC.reach(system, opt)
+    report = opt.spec_report
+    assert report.verdict == Specification.VERDICT.VIOLATED
+    assert len(ti) == report.step_idx < opt.steps_num - 1
+    assert report.set is ti[-1]
+
+    # sets cross the border of the safe set, but none leaves it for certain
+    sup = np.max([r.c + abs(r.gen).sum(axis=1) for r in ti_all], axis=0)
+    opt = options(Specification(Interval([-5, -5], sup - 0.01), Specification.TYPE.SAFE))
+    ti, _, _, _ = ALK2011HSCC.reach(system, opt)
+    assert opt.spec_report.verdict == Specification.VERDICT.UNKNOWN
+    assert len(ti) == opt.steps_num - 1
+
+    # all sets inside an invariant from the first step on
+    big = Interval([-5, -5], [5, 5])
+    opt = options(Specification(big, Specification.TYPE.SAFE),
+                  Specification(big, Specification.TYPE.INVARIANT))
+    ti, _, _, _ = ALK2011HSCC.reach(system, opt)
+    assert opt.spec_report.verdict == Specification.VERDICT.INVARIANT
+    assert len(ti) == 1
+
+
+def test_nonlinear():
+    system = NonLinSys(Model(vanderpol, [2, 1]))
+
+    def options(*specs):
+        opt = ASB2008CDC.Options()
+        opt.t_end = 0.1
+        opt.step = 0.01
+        opt.tensor_order = 2
+        opt.taylor_terms = 4
+        opt.r0 = [Zonotope([1.4, 2.4], np.diag([0.17, 0.06]))]
+        opt.u = Zonotope.zero(1, 1)
+        opt.u_trans = np.zeros(1)
+        opt.specs = list(specs)
+        return opt
+
+    # far from the unsafe set, all steps are computed
+    opt = options(Specification(Interval([-4, -4], [-3, -3]), Specification.TYPE.UNSAFE))
+    ti, _, _, _ = ASB2008CDC.reach(system, opt)
+    assert opt.spec_report.verdict == Specification.VERDICT.SATISFIED
+    assert len(ti) == opt.steps_num - 1
+
+    # the sets start inside the unsafe set, so the first step stops the computation
+    opt = options(Specification(Interval([0, 1], [3, 4]), Specification.TYPE.UNSAFE))
+    ti, _, _, _ = ASB2008CDC.reach(system, opt)
+    assert opt.spec_report.verdict == Specification.VERDICT.VIOLATED
+    assert len(ti) == opt.spec_report.step_idx == 1
@@ -37,3 +37,95 @@ def test_synchronous_machine():
 
     # visualize the results
     plot(rs, [0, 1])
+
+
+def test_contraction():
+    from pyrat.geometry import Polytope
+
+    # hexagon around the origin and boxes inside it
+    theta = np.linspace(0, 2 * np.pi, 6, endpoint=False)
+    o = Polytope(np.stack([np.cos(theta), np.sin(theta)], axis=1), np.ones(6))
+    rng = np.random.default_rng(0)
+    c = rng.uniform(-0.6, 0.6, (20, 2))
+    omega = [Interval(x - 0.05, x + 0.05) for x in c]
+
+    results = []
+    for solver in ["highs", "GLPK"]:
+        options = XSE2016CAV.Options()
+        options.lp_solver = solver
+        o_in, bu = XSE2016CAV.contraction(omega, o, options)
+        results.append((o_in.b, bu, XSE2016CAV.get_d(o, options)))
+
+    (b0, bu0, d0), (b1, bu1, d1) = results
+    assert np.isclose(bu0, bu1) and np.allclose(b0, b1) and np.isclose(d0, d1)
+    # some box reaches deepest into the hexagon, the inradius bounds the offset
+    assert -1 <= bu0 < 0 and np.isclose(d0, -1)
+
+
+def test_boundary_back(monkeypatch):
+    import copy
+
+    # init dynamic system
+    system = NonLinSys(Model(synchronous_machine, [2, 1]))
+    system_back = copy.deepcopy(system)
+    system_back.reverse()
+
+    options = XSE2016CAV.Options()
+    options.t_end = 2
+    options.step = 0.3
+    options.epsilon = 0.5
+    options.epsilon_m = 0.1
+    assert options.validation(system.dim)
+
+    options_back = ASB2008CDC.Options()
+    options_back.t_end = options.step
+    options_back.step = options.step / 3
+    options_back.tensor_order = 2
+    options_back.taylor_terms = 4
+    options_back.u = Zonotope.zero(1, 1)
+    options_back.u_trans = np.zeros(1)
+    assert options_back.validation(system.dim)
+
+    # settings for the using geometry
+    Zonotope.REDUCE_METHOD = Zonotope.REDUCE_METHOD.GIRARD
+    Zonotope.ORDER = 50
+
+    # boxes missing from the cache are propagated by one call
+    calls = []
+    reach = ASB2008CDC.reach
+    monkeypatch.setattr(
+        ASB2008CDC, "reach", lambda *args: calls.append(1) or reach(*args)
+    )
+
+    u = Interval([-0.1, 2.9], [0.1, 3.1])
+    # exact boxes are not cached, the snapped ones enclose them
+    options.snap = False
+    exact = XSE2016CAV.boundary_back(system_back, u, options, options_back)
+    assert len(options.boundary_cache) == 0
+    options.snap = True
+    omega = XSE2016CAV.boundary_back(system_back, u, options, options_back)
+    assert len(calls) == 2
+    lo = np.min([x.inf for x in exact], axis=0), np.min([x.inf for x in omega], axis=0)
+    hi = np.max([x.sup for x in exact], axis=0), np.max([x.sup for x in omega], axis=0)
+    assert np.all(lo[1] <= lo[0]) and np.all(hi[0] <= hi[1])
+    num = len(options.boundary_cache)
+    assert num > 0 and len(omega) >= num
+    # boxes are computed once
+    again = XSE2016CAV.boundary_back(system_back, u, options, options_back)
+    assert len(calls) == 2
+    assert len(options.boundary_cache) == num and len(again) == len(omega)
+    for a, b in zip(omega, again):
+        assert np.allclose(a.inf, b.inf) and np.allclose(a.sup, b.sup)
+    # boxes shared with an overlapping set are reused
+    u = Interval([-0.1, 2.9], [0.1, 3.3])
+    XSE2016CAV.boundary_back(system_back, u, options, options_back)
+    assert num < len(options.boundary_cache) < 2 * num and len(calls) == 3
+    monkeypatch.undo()
+
+    # backward sets contain the states the boundary is reached from
+    x0 = np.array([0.1, 3.0])
+    r0 = Zonotope(x0, np.zeros((2, 0)))
+    options_back.r0 = [r0]
+    _, tps, _, _ = ASB2008CDC.reach(system_back, options_back)
+    assert any(np.all(b.inf - 1e-6 <= tps[-1][0].c) and np.all(tps[-1][0].c <= b.sup + 1e-6)
+               for b in omega)
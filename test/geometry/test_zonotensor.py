@@ -62,3 +62,33 @@ def test_zono_mul():
     d = c * a
     print(d.c)
     print(d.gen)
+
+
+def test_zono_stack():
+    from pyrat.geometry import Zonotope
+
+    zonos = [Zonotope.rand(3, 2), Zonotope.rand(3, 5), Zonotope.rand(3, 4)]
+    a = ZonoTensor.stack(zonos)
+    assert a.shape == (3, 3) and a.gen_num == 5
+    for z0, z1 in zip(zonos, a.zonotopes()):
+        assert np.allclose(z0.c, z1.c) and np.allclose(z0.gen, z1.gen)
+
+
+def test_zono_batch_consistency():
+    from pyrat.geometry import Zonotope, Interval
+
+    zonos = [Zonotope.rand(3, 8) for _ in range(4)]
+    a = ZonoTensor.stack(zonos)
+    m = np.random.rand(4, 3, 3)
+    im = Interval.rand(4, 3, 3)
+    q = [np.random.rand(4, 2, 3, 3)]
+    b = (m @ a).enclose(a).reduce(Zonotope.REDUCE_METHOD, 2)
+    c = im * a
+    d = a.quad_map(q)
+    for i, z in enumerate(zonos):
+        e = (m[i] @ z).enclose(z)
+        assert np.allclose(b.c[i], e.c)
+        f = Interval(im.inf[i], im.sup[i]) * z
+        assert np.allclose(c.c[i], f.c) and np.allclose(c.gen[i], f.gen)
+        g = z.quad_map([q[0][i]])
+        assert np.allclose(d.c[i], g.c) and np.allclose(d.gen[i], g.gen)
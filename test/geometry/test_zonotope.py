@@ -180,3 +180,26 @@ def test_temp():
     print(ind)
     print(x)
     print(x[ind])
+
+
+def test_split():
+    z = Zonotope.rand(3, 6)
+    for dim in range(3):
+        z0, z1 = z.split(dim)
+        # halves touch at the center and are enclosed by the zonotope
+        assert np.allclose(z0.c + z1.c, 2 * z.c)
+        ih, ih0, ih1 = [cvt2(x, Geometry.TYPE.INTERVAL) for x in [z, z0, z1]]
+        assert np.all(ih.inf <= np.minimum(ih0.inf, ih1.inf) + 1e-12)
+        assert np.all(ih.sup >= np.maximum(ih0.sup, ih1.sup) - 1e-12)
+        assert np.allclose(np.minimum(ih0.inf, ih1.inf), ih.inf)
+        assert np.allclose(np.maximum(ih0.sup, ih1.sup), ih.sup)
+
+
+def test_contains():
+    z = Zonotope([0, 0], [[1, 0, 1], [0, 1, 1]])
+    assert np.array([1.9, 1.9]) in z and np.array([2, 0.0]) in z
+    assert np.array([2.1, 2.1]) not in z
+    z0, z1 = z.split(0)
+    assert z0 in z and z1 in z and z not in z0
+    assert Zonotope([0.1, 0], 0.5 * np.eye(2)) in z
+    assert z not in Zonotope([0.1, 0], 0.5 * np.eye(2))
@@ -1,4 +1,5 @@
 import inspect
+import os
 
 import numpy as np
 from pyrat.model import Model
@@ -50,3 +51,169 @@ def test_fxu():
     print(temp1.shape)
     print(temp2.shape)
     print(temp3.shape)
+
+
+def test_reverse():
+    import copy
+    from pyrat.model import vanderpol
+
+    model = Model(vanderpol, [2, 1])
+    x, u = np.random.rand(2), np.random.rand(1)
+    f = model.evaluate((x, u), "numpy", 0, 0)
+    jac = model.evaluate((x, u), "numpy", 1, 0)
+
+    # reversed copy owns its derivatives, the original one is left as it is
+    reversed_model = copy.deepcopy(model)
+    reversed_model.reverse()
+    assert np.allclose(reversed_model.evaluate((x, u), "numpy", 0, 0), -f)
+    assert np.allclose(reversed_model.evaluate((x, u), "numpy", 1, 0), -jac)
+    assert np.allclose(model.evaluate((x, u), "numpy", 1, 0), jac)
+
+    # derivatives taken before reversing are not reused after
+    model.reverse()
+    assert np.allclose(model.evaluate((x, u), "numpy", 1, 0), -jac)
+
+
+def test_disk_cache(tmp_path, monkeypatch):
+    import pyrat.model.model as model_module
+    from pyrat.geometry import Interval
+    from pyrat.model import laubloomis
+
+    monkeypatch.setattr(Model, "CACHE_DIR", str(tmp_path))
+    x, u = np.random.rand(7), np.random.rand(1)
+    ix, iu = Interval.rand(7), Interval.rand(1)
+    model = Model(laubloomis, [7, 1])
+    hessian = model.evaluate((x, u), "numpy", 2, 0)
+    hessian_interval = model.evaluate((ix, iu), "interval", 2, 0)
+    assert len(list(tmp_path.iterdir())) == 1
+
+    # a fresh model loads the derivatives and the evaluators from the disk
+    def fail(*args, **kwargs):
+        raise AssertionError("derived or compiled again")
+
+    monkeypatch.setattr(model_module, "derive_by_array", fail)
+    monkeypatch.setattr(model_module, "lambdify", fail)
+    model = Model(laubloomis, [7, 1])
+    assert np.allclose(model.evaluate((x, u), "numpy", 2, 0), hessian)
+    cached_interval = model.evaluate((ix, iu), "interval", 2, 0)
+    assert np.allclose(cached_interval.inf, hessian_interval.inf)
+    assert np.allclose(cached_interval.sup, hessian_interval.sup)
+
+    # reversed model shares the entry, only its evaluators are added
+    monkeypatch.setattr(model_module, "lambdify", lambdify)
+    model.reverse()
+    assert np.allclose(model.evaluate((x, u), "numpy", 2, 0), -hessian)
+    assert len(list(tmp_path.iterdir())) == 1
+    names = {p.name for p in next(tmp_path.iterdir()).iterdir()}
+    assert "2_0_numpy_reversed.py" in names
+
+    # entries not matching their digest are rebuilt instead of being executed
+    entry = next(tmp_path.iterdir()) / "2_0_numpy.py"
+    entry.write_text(entry.read_text().replace("return", "return -1 *", 1))
+    built = []
+    monkeypatch.setattr(
+        model_module, "lambdify", lambda *args: built.append(1) or lambdify(*args)
+    )
+    model = Model(laubloomis, [7, 1])
+    assert np.allclose(model.evaluate((x, u), "numpy", 2, 0), hessian)
+    assert len(built) == 1
+
+    # nothing is loaded from a directory others can write to
+    if os.name == "posix":
+        os.chmod(next(tmp_path.iterdir()), 0o777)
+        monkeypatch.setattr(model_module, "derive_by_array", derive_by_array)
+        model = Model(laubloomis, [7, 1])
+        assert np.allclose(model.evaluate((x, u), "numpy", 2, 0), hessian)
+        assert len(built) == 2
+
+
+def test_reversed_shared(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    import pyrat.model.model as model_module
+    from pyrat.model import laubloomis
+
+    model = Model(laubloomis, [7, 1])
+    xs = np.random.rand(7), np.random.rand(1)
+
+    # threads taking the same derivatives at once all see complete ones
+    def hessian(_):
+        return model.evaluate(xs, "numpy", 2, 0)
+
+    with ThreadPoolExecutor(4) as executor:
+        hessians = list(executor.map(hessian, range(8)))
+    assert all(np.allclose(h, hessians[0]) for h in hessians)
+
+    # both directions are served by the shared derivatives without deriving again
+    def fail(*args, **kwargs):
+        raise AssertionError("derived again")
+
+    monkeypatch.setattr(model_module, "derive_by_array", fail)
+    reversed_model = model.reversed()
+    assert np.allclose(reversed_model.evaluate(xs, "numpy", 2, 0), -hessians[0])
+    assert np.allclose(model.evaluate(xs, "numpy", 2, 0), hessians[0])
+    for _ in range(2):
+        model.reverse()
+    assert np.allclose(model.evaluate(xs, "numpy", 2, 0), hessians[0])
+
+
+def test_cse(tmp_path, monkeypatch):
+    from pyrat.model import tank6eq
+
+    model = Model(tank6eq, [6, 1])
+    cse_model = Model(tank6eq, [6, 1], codegen="cse")
+    x, u = np.random.rand(6) + 0.5, np.random.rand(1)
+    for order in range(4):
+        for v in range(2):
+            expected = model.evaluate((x, u), "numpy", order, v)
+            r = cse_model.evaluate((x, u), "numpy", order, v)
+            assert r.shape == expected.shape
+            assert np.allclose(r, expected)
+
+    # evaluators generated by cse are cached apart from the ones of lambdify
+    monkeypatch.setattr(Model, "CACHE_DIR", str(tmp_path))
+    expected = Model(tank6eq, [6, 1]).evaluate((x, u), "numpy", 2, 0)
+    for _ in range(2):  # generated, then loaded from the disk
+        cse_model = Model(tank6eq, [6, 1], codegen="cse")
+        assert np.allclose(cse_model.evaluate((x, u), "numpy", 2, 0), expected)
+    names = {p.name for p in next(tmp_path.iterdir()).iterdir()}
+    assert {"2_0_numpy.py", "2_0_cse.py"} <= names
+
+
+def test_batch():
+    from pyrat.model import tank6eq
+
+    xs, u = np.random.rand(5, 6) + 0.5, np.random.rand(1)
+    us = np.random.rand(5, 1)
+    for codegen in ["lambdify", "cse"]:
+        model = Model(tank6eq, [6, 1], codegen=codegen)
+        for order in range(3):
+            for v in range(2):
+                # inputs without batch axis are shared by all points
+                r = model.evaluate((xs, u), "numpy", order, v)
+                expected = [model.evaluate((x, u), "numpy", order, v) for x in xs]
+                assert r.shape == (5,) + expected[0].shape
+                assert np.allclose(r, np.stack(expected))
+                r = model.evaluate((xs, us), "numpy", order, v)
+                expected = [
+                    model.evaluate((x, uu), "numpy", order, v) for x, uu in zip(xs, us)
+                ]
+                assert np.allclose(r, np.stack(expected))
+
+
+def test_interval():
+    from pyrat.geometry import Interval
+    from pyrat.model import tank6eq
+
+    model = Model(tank6eq, [6, 1])
+    x, u = Interval.rand(5, 6) + 0.5, Interval.rand(1)
+    for order in range(4):
+        for v in range(2):
+            r = model.evaluate((x, u), "interval", order, v)
+            # bounds of the derivatives at the centers
+            c = model.evaluate((x.c, u.c), "numpy", order, v)
+            assert r.inf.shape == c.shape
+            assert np.all(r.inf <= c + 1e-9) and np.all(c <= r.sup + 1e-9)
+            # points stacked as a batch get the bounds of each of them alone
+            expected = model.evaluate((x[0], u), "interval", order, v)
+            assert np.allclose(r.inf[0], expected.inf)
+            assert np.allclose(r.sup[0], expected.sup)